@@ -0,0 +1,41 @@
+"""Batch throughput for different native thread limits per worker.
+
+Runs the same batch once per ``--threads`` value and prints files per minute
+and audio seconds analyzed per wall-clock second, e.g.::
+
+    python benchmarks/threads_per_worker.py ~/Music/sample --workers 8 --threads 1,2,8
+
+With one worker per core, unlimited native pools (threads = CPU count) typically
+lose throughput to oversubscription, while 1 thread per worker keeps every core
+busy with exactly one runnable thread.
+"""
+
+import os
+import time
+from pathlib import Path
+
+import click
+
+from audio_analyzer.batch import find_audio_files, plan_jobs, run_batch
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option("--workers", type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True)
+@click.option("--threads", default=f"1,{os.cpu_count() or 1}", show_default=True, help="Comma-separated limits to try.")
+def main(paths: tuple[Path, ...], workers: int, threads: str):
+    """Benchmark batch throughput against --threads-per-worker."""
+    jobs = plan_jobs(find_audio_files(paths))
+    audio_seconds = sum(job.duration for job in jobs)
+    click.echo(f"{len(jobs)} files, {audio_seconds / 60:.1f} min of audio, {workers} workers")
+    click.echo(f"{'threads/worker':>14}  {'wall s':>8}  {'files/min':>9}  {'audio s/s':>9}")
+    for limit in (int(t) for t in threads.split(",")):
+        start = time.perf_counter()
+        failures = sum(record["error"] is not None for record in run_batch(jobs, workers, threads_per_worker=limit))
+        wall = time.perf_counter() - start
+        line = f"{limit:>14}  {wall:>8.1f}  {len(jobs) * 60 / wall:>9.1f}  {audio_seconds / wall:>9.1f}"
+        click.echo(line + (f"  ({failures} failed)" if failures else ""))
+
+
+if __name__ == "__main__":
+    main()
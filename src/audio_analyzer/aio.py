@@ -0,0 +1,124 @@
+"""Asyncio API for embedding the analyzer in event-loop based services."""
+
+import asyncio
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from audio_analyzer.main import AnalysisOptions, AnalysisResult, analyze_signal, decoder_for
+from audio_analyzer.metrics import REGISTRY, MetricsRegistry, count_track
+from audio_analyzer.threads import default_threads_per_worker, limit_native_threads
+
+
+class AnalysisLimiter:
+    """Bounded-concurrency runner backed by a decode thread pool and an analysis process pool.
+
+    Decoding is mostly I/O and native code, so it runs on threads; the analysis
+    stages are CPU-bound Python/Essentia code and run in a long-lived process pool,
+    which avoids spawning a process per request. At most ``max_concurrency``
+    analyses are in flight at once per event loop; further callers wait on a
+    semaphore, which gives the caller's event loop natural backpressure. The
+    pools are shared by every loop that uses the limiter (for example
+    successive ``asyncio.run()`` calls). Native thread pools in
+    each worker process are capped at ``threads_per_worker`` (default: CPUs
+    divided evenly between the workers). Metrics recorded in the workers are
+    merged into this process's :data:`~audio_analyzer.metrics.REGISTRY`.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        max_workers: int | None = None,
+        threads_per_worker: int | None = None,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.max_workers
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(self.max_workers)
+        # A semaphore belongs to the loop that first waits on it, so each loop gets its own
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._decode_executor: ThreadPoolExecutor | None = None
+        self._process_executor: ProcessPoolExecutor | None = None
+
+    def _executors(self) -> tuple[ThreadPoolExecutor, ProcessPoolExecutor]:
+        if self._decode_executor is None:
+            self._decode_executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="audio-analyzer-decode"
+            )
+        if self._process_executor is None:
+            self._process_executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=limit_native_threads,
+                initargs=(self.threads_per_worker,),
+            )
+        return self._decode_executor, self._process_executor
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def analyze(self, audio_path: str | Path, options: AnalysisOptions | None = None) -> AnalysisResult:
+        """Analyze one file with ``options``, waiting for a free slot first."""
+        options = options or AnalysisOptions()
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            decode_executor, process_executor = self._executors()
+            try:
+                y = await loop.run_in_executor(decode_executor, decoder_for(options), audio_path)
+                result, metrics = await loop.run_in_executor(process_executor, _analyze_signal_metered, y, options)
+            except Exception as e:
+                count_track(e)
+                raise
+            REGISTRY.merge(metrics)
+            count_track()
+            return result
+
+    def close(self) -> None:
+        """Shut down the worker pools."""
+        if self._decode_executor is not None:
+            self._decode_executor.shutdown(wait=True)
+            self._decode_executor = None
+        if self._process_executor is not None:
+            self._process_executor.shutdown(wait=True)
+            self._process_executor = None
+
+    async def __aenter__(self) -> "AnalysisLimiter":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+def _analyze_signal_metered(y: np.ndarray, options: AnalysisOptions) -> tuple[AnalysisResult, MetricsRegistry]:
+    """Pool entry point: the analysis plus the metrics the worker recorded for it, for the parent to merge."""
+    REGISTRY.take()  # Drop anything left from a failed analysis
+    return analyze_signal(y, options=options), REGISTRY.take()
+
+
+_default_limiter: AnalysisLimiter | None = None
+
+
+def _get_default_limiter() -> AnalysisLimiter:
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = AnalysisLimiter()
+    return _default_limiter
+
+
+async def analyze_file_async(
+    audio_path: str | Path, limiter: AnalysisLimiter | None = None, options: AnalysisOptions | None = None
+) -> AnalysisResult:
+    """Analyze an audio file without blocking the event loop.
+
+    Returns the same structure as the ``analyze`` command for ``options``
+    (defaults as in :func:`~audio_analyzer.main.analyze_file`). Calls share a
+    module-level :class:`AnalysisLimiter` sized to the CPU count unless an
+    explicit ``limiter`` is given.
+    """
+    return await (limiter or _get_default_limiter()).analyze(audio_path, options)
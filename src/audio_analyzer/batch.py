@@ -0,0 +1,540 @@
+"""Parallel analysis of many files with duration-aware scheduling.
+
+Analysis time grows with track duration, so a batch that mixes short clips
+with hour-long mixes is dominated by its longest files. :func:`plan_jobs`
+probes every duration from the file header and orders jobs longest-first;
+:func:`run_batch` keeps exactly one job per worker in flight and hands the
+next job in that order to whichever worker frees up first. Long files start
+early and the short ones fill the gaps at the end, instead of one worker
+finishing a three-hour mix while the rest sit idle.
+
+Files longer than ``split_longer_than`` can also be cut into fixed windows that
+run as independent jobs. Their partial results are merged afterwards: BPM and
+key by a duration- and confidence-weighted vote across windows, energy and
+loudness by merging the windows' :class:`~audio_analyzer.energy.EnergyMeter`
+state, and vocal presence from the first window (the vocal detector only looks
+at the opening frames of a track anyway).
+
+Memory use also grows with duration (the decoded signal plus spectrogram and
+onset temporaries), so with a ``memory_budget`` each job's peak is estimated
+from its duration and jobs are only started while the in-flight estimates fit
+the budget. A file too large to fit on its own is split into windows that do.
+
+Files of at most ``clips_shorter_than`` seconds (samples, one-shots) are not
+worth a job each: they are grouped, ``clip_batch_size`` at a time, into jobs
+that analyze the whole group in one vectorized pass (:mod:`audio_analyzer.clips`)
+and yield one record per clip.
+
+Several machines sharing a library split it without coordination through
+:func:`select_shard`, which assigns each file to one of N shards by a stable
+hash of its path or content; :func:`merge_records` combines their outputs.
+
+A stage that fails leaves its neutral defaults and an error in the result's
+``stage_status`` while the other stages complete. :func:`plan_retries` turns
+an earlier output into jobs that re-run just those stages (or whole files
+that failed outright), so a transient failure does not cost a full re-analysis.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypedDict, cast
+
+from audio_analyzer.clips import DEFAULT_CLIP_BATCH_SIZE, analyze_clips
+from audio_analyzer.energy import EnergyMeter
+from audio_analyzer.main import (
+    SAMPLE_RATE,
+    STAGE_DEFAULTS,
+    STAGES,
+    AnalysisOptions,
+    AnalysisResult,
+    analyze_file,
+    assemble_result,
+    decoder_for,
+    failed_stages,
+    rerun_stages,
+    run_stage_partials,
+)
+from audio_analyzer.metrics import REGISTRY, MetricsRegistry, count_track, stage_timer
+from audio_analyzer.threads import default_threads_per_worker, limit_native_threads
+
+AUDIO_EXTENSIONS = frozenset({".aif", ".aiff", ".flac", ".m4a", ".mp3", ".ogg", ".opus", ".wav"})
+DEFAULT_WINDOW_SECONDS = 600.0
+MIN_WINDOW_SECONDS = 30.0
+
+# Peak memory per decoded sample while analyzing: the float32 signal plus decode
+# buffers and the STFT/mel/onset temporaries of the stages (~27 bytes measured on
+# 44.1 kHz tracks, rounded up). Worker processes also hold a fixed baseline.
+PEAK_BYTES_PER_SAMPLE = 32
+WORKER_BASELINE_BYTES = 400 * 1024**2
+
+logger = logging.getLogger("audio-analyzer")
+
+
+class BatchRecord(TypedDict):
+    """One NDJSON line of ``batch`` output."""
+
+    path: str
+    result: AnalysisResult | None
+    error: str | None
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    """A whole file, one window of a file split into ``windows`` sub-jobs, or a group of short ``clips``."""
+
+    path: Path  # The first clip for a group
+    duration: float  # Seconds of audio this job covers
+    offset: float = 0.0
+    window_index: int = 0
+    windows: int = 1
+    clips: tuple[Path, ...] = ()
+    clip_duration: float = 0.0  # Longest clip of a group: every clip is padded to it
+    stages: tuple[str, ...] = ()  # Re-run only these stages of ``previous`` (see plan_retries)
+    previous: AnalysisResult | None = field(default=None, compare=False)
+
+    @property
+    def peak_memory(self) -> int:
+        """Estimated peak bytes while this job runs (beyond the worker baseline)."""
+        if self.clips:
+            return len(self.clips) * estimate_peak_memory(self.clip_duration)
+        return estimate_peak_memory(self.duration)
+
+
+@dataclass
+class WindowResult:
+    """Stage outputs and energy meter state for one window of a split file."""
+
+    window_index: int
+    duration: float
+    partials: dict[str, Any]
+    meter: EnergyMeter
+
+
+def find_audio_files(paths: Iterable[str | Path]) -> list[Path]:
+    """Expand directories (recursively) into the audio files they contain; files are kept as given."""
+    found: list[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found.extend(sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS))
+        else:
+            found.append(path)
+    return found
+
+
+def probe_duration(path: str | Path) -> float:
+    """Track duration in seconds from the file header, or 0.0 when it cannot be read."""
+    from audio_analyzer.pcm import read_pcm_layout
+
+    layout = read_pcm_layout(path)
+    if layout is not None and layout.sample_rate > 0:
+        return layout.frames / layout.sample_rate
+    try:
+        import soundfile as sf
+
+        return float(sf.info(str(path)).duration)
+    except Exception:
+        pass
+    try:
+        import librosa
+
+        return float(librosa.get_duration(path=str(path)))
+    except Exception:
+        # Unreadable files are scheduled last and report their error from the worker
+        return 0.0
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """Parse ``i/N`` (1 <= i <= N) into ``(i, N)``."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {text!r}; expected i/N, e.g. 2/4") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {text!r}; i must be between 1 and N")
+    return index, count
+
+
+def shard_of(path: str | Path, count: int, by: str = "path") -> int:
+    """Shard (1-based) of a file among ``count``, from a hash that is the same on every machine and run.
+
+    ``by="path"`` hashes the path as listed, so every machine must list the
+    library the same way (same mount point, or the same relative paths);
+    ``by="content"`` hashes the file's bytes, which also sends identical
+    copies to the same shard, at the cost of reading every file.
+    """
+    if by == "content":
+        from audio_analyzer.cache import file_digest
+
+        digest = file_digest(path)
+    else:
+        digest = hashlib.sha256(str(path).encode()).hexdigest()
+    return int(digest[:16], 16) % count + 1
+
+
+def select_shard(paths: Iterable[str | Path], index: int, count: int, by: str = "path") -> list[Path]:
+    """The files of ``paths`` that belong to shard ``index`` of ``count``."""
+    return [Path(path) for path in paths if shard_of(path, count, by) == index]
+
+
+def read_records(path: str | Path) -> Iterator[BatchRecord]:
+    """Records from a ``batch`` NDJSON output file, skipping lines that are not complete records."""
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn last line of an interrupted run
+            if isinstance(record, dict) and "path" in record:
+                yield cast(BatchRecord, record)
+
+
+def merge_records(records: Iterable[BatchRecord]) -> list[BatchRecord]:
+    """One record per path, sorted by path.
+
+    A successful result beats a failure for the same path; otherwise the
+    later record wins, so outputs of re-runs can simply be listed after the
+    originals.
+    """
+    merged: dict[str, BatchRecord] = {}
+    for record in records:
+        previous = merged.get(record["path"])
+        if previous is None or record["error"] is None or previous["error"] is not None:
+            merged[record["path"]] = record
+    return [merged[path] for path in sorted(merged)]
+
+
+def plan_retries(
+    records: Iterable[BatchRecord],
+    split_longer_than: float | None = None,
+    window: float = DEFAULT_WINDOW_SECONDS,
+    memory_budget: int | None = None,
+) -> tuple[list[BatchJob], list[BatchRecord]]:
+    """Jobs that redo what failed in earlier batch output, longest-first, and the records needing nothing redone.
+
+    A file that failed outright is analyzed again in full. A result with
+    failed stages (see ``stage_status``) only re-runs those stages and keeps
+    the outputs of the others. Either way a file is split into windows by
+    the same rules as :func:`plan_jobs`, so a retry needs no more memory
+    than the original run.
+    """
+    jobs: list[BatchJob] = []
+    complete: list[BatchRecord] = []
+    for record in merge_records(records):
+        path = Path(record["path"])
+        result = record["result"]
+        if result is None:
+            jobs += _file_jobs(path, probe_duration(path), split_longer_than, window, memory_budget)
+        elif failed := failed_stages(result):
+            duration = probe_duration(path)
+            jobs += _file_jobs(path, duration, split_longer_than, window, memory_budget, tuple(failed), result)
+        else:
+            complete.append(record)
+    return sorted(jobs, key=lambda job: job.duration, reverse=True), complete
+
+
+def estimate_peak_memory(duration: float, sr: int = SAMPLE_RATE) -> int:
+    """Estimated peak bytes for analyzing ``duration`` seconds of audio at ``sr``."""
+    return int(duration * sr * PEAK_BYTES_PER_SAMPLE)
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte size such as ``512M``, ``8G`` or ``1073741824``."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", text, flags=re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid size: {text!r}")
+    exponent = " KMGT".index(match.group(2).upper() or " ")
+    return int(float(match.group(1)) * 1024**exponent)
+
+
+def available_memory(meminfo: str | Path = "/proc/meminfo") -> int | None:
+    """Bytes the kernel can hand out without swapping (``MemAvailable``, which counts reclaimable cache); None if unknown."""
+    try:
+        with open(meminfo) as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == "MemAvailable":
+                    return int(value.split()[0]) * 1024  # Reported in kB
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def default_memory_budget(workers: int) -> int | None:
+    """Three quarters of available memory, less the baselines of ``workers`` workers.
+
+    None (no limit) if available memory is unknown or nothing would be left.
+    """
+    available = available_memory()
+    if available is None:
+        return None
+    budget = int(available * 0.75) - workers * WORKER_BASELINE_BYTES
+    return budget if budget > 0 else None
+
+
+def memory_budgets(workers: int, memory_budget: int | None = None) -> tuple[int | None, int | None]:
+    """Budgets for admitting jobs and for splitting files, given an explicit ``memory_budget`` or not.
+
+    An explicit budget is used for both. Otherwise admission shares the
+    default budget between ``workers`` workers, while a file is only split
+    when it could not fit even with the other workers idle.
+    """
+    if memory_budget is not None:
+        return memory_budget, memory_budget
+    return default_memory_budget(workers), default_memory_budget(1)
+
+
+def _file_jobs(
+    path: Path,
+    duration: float,
+    split_longer_than: float | None,
+    window: float,
+    memory_budget: int | None,
+    stages: tuple[str, ...] = (),
+    previous: AnalysisResult | None = None,
+) -> list[BatchJob]:
+    """The job for one file, or its window jobs if it is too long or too large for ``memory_budget``."""
+    file_window = window
+    oversized = memory_budget is not None and estimate_peak_memory(duration) > memory_budget
+    if memory_budget is not None and oversized:
+        fitting = memory_budget / (SAMPLE_RATE * PEAK_BYTES_PER_SAMPLE)
+        file_window = max(MIN_WINDOW_SECONDS, min(window, fitting))
+        logger.info(f"{path} is too large for the memory budget; analyzing it in {file_window:.0f} s windows")
+    elif split_longer_than is None or duration <= split_longer_than:
+        return [BatchJob(path, duration, stages=stages, previous=previous)]
+    windows = math.ceil(duration / file_window)
+    jobs = []
+    for index in range(windows):
+        offset = index * file_window
+        length = min(file_window, duration - offset)
+        jobs.append(BatchJob(path, length, offset, index, windows, stages=stages, previous=previous))
+    return jobs
+
+
+def plan_jobs(
+    paths: Iterable[str | Path],
+    split_longer_than: float | None = None,
+    window: float = DEFAULT_WINDOW_SECONDS,
+    memory_budget: int | None = None,
+    clips_shorter_than: float | None = None,
+    clip_batch_size: int = DEFAULT_CLIP_BATCH_SIZE,
+) -> list[BatchJob]:
+    """Probe durations and return the jobs longest-first.
+
+    Files longer than ``split_longer_than``, or estimated to need more than
+    ``memory_budget`` on their own, are split into windows (shortened as
+    needed to fit the budget). Files of at most ``clips_shorter_than``
+    seconds are grouped into jobs of ``clip_batch_size`` clips of similar
+    length.
+    """
+    jobs: list[BatchJob] = []
+    clips: list[tuple[float, Path]] = []
+    for path in map(Path, paths):
+        duration = probe_duration(path)
+        if clips_shorter_than is not None and duration <= clips_shorter_than:
+            clips.append((duration, path))
+            continue
+        jobs += _file_jobs(path, duration, split_longer_than, window, memory_budget)
+    clips.sort()
+    for start in range(0, len(clips), clip_batch_size):
+        group = clips[start : start + clip_batch_size]
+        paths_in_group = tuple(path for _, path in group)
+        jobs.append(
+            BatchJob(paths_in_group[0], sum(d for d, _ in group), clips=paths_in_group, clip_duration=group[-1][0])
+        )
+    return sorted(jobs, key=lambda job: job.duration, reverse=True)
+
+
+def analyze_window(job: BatchJob, options: AnalysisOptions) -> WindowResult:
+    """Decode and analyze one window of a split file (only ``job.stages``, when set)."""
+    y = decoder_for(options)(job.path, offset=job.offset, duration=job.duration)
+    wanted = job.stages or tuple(STAGES)
+    # The vocal detector only looks at the opening frames, so only the first window runs it
+    stages = [
+        name for name in ("bpm", "key", "vocals") if name in wanted and (name != "vocals" or not job.window_index)
+    ]
+    partials = run_stage_partials(y, SAMPLE_RATE, stages, "serial", options)
+    meter = EnergyMeter(SAMPLE_RATE)
+    if "energy" in wanted:
+        block_size = 1 << 18
+        with stage_timer("energy"):
+            for start in range(0, len(y), block_size):
+                meter.update(y[start : start + block_size])
+    return WindowResult(job.window_index, len(y) / SAMPLE_RATE, partials, meter)
+
+
+def _weighted_vote(windows: list[WindowResult], field: str, confidence_field: str) -> tuple[Any, float, WindowResult]:
+    """Value with the most duration x confidence behind it, its mean confidence, and its most confident window."""
+    scores: dict[Any, float] = defaultdict(float)
+    for w in windows:
+        # A floor keeps zero-confidence windows voting by duration
+        scores[w.partials[field]] += w.duration * max(w.partials[confidence_field], 1e-3)
+    winner = max(scores, key=scores.__getitem__)
+    agreeing = [w for w in windows if w.partials[field] == winner]
+    total = sum(w.duration for w in agreeing)
+    confidence = sum(w.duration * w.partials[confidence_field] for w in agreeing) / total if total else 0.0
+    best = max(agreeing, key=lambda w: w.partials[confidence_field])
+    return winner, float(confidence), best
+
+
+def merge_windows(
+    windows: list[WindowResult], previous: AnalysisResult | None = None, stages: Sequence[str] = tuple(STAGES)
+) -> AnalysisResult:
+    """Combine the window results of one split file into a single result.
+
+    When the windows only re-ran ``stages`` of a ``previous`` result (see
+    :func:`plan_retries`), the other stages keep its outputs and status.
+    """
+    windows = sorted(windows, key=lambda w: w.window_index)
+    partials: dict[str, Any] = {}
+    if previous is not None:
+        partials.update(previous)
+        for name, status in previous.get("stage_status", {}).items():
+            if name not in stages:
+                partials[f"_{name}_error"] = status["error"]
+    if "vocals" in stages:
+        partials.update(
+            has_vocals=windows[0].partials["has_vocals"], _vocals_error=windows[0].partials.get("_vocals_error")
+        )
+    if "energy" in stages:
+        meter = windows[0].meter
+        for w in windows[1:]:
+            meter.merge(w.meter)
+        partials.update(meter.summary())
+    # Windows where a stage failed hold its defaults, which must not outvote the others
+    bpm_windows = [w for w in windows if w.partials.get("_bpm_error") is None]
+    if bpm_windows and "bpm" in stages:
+        bpm, bpm_confidence, _ = _weighted_vote(bpm_windows, "bpm", "bpm_confidence")
+        partials.update(bpm=bpm, bpm_confidence=bpm_confidence)
+    elif "bpm" in stages:
+        partials.update(STAGE_DEFAULTS["bpm"], _bpm_error=windows[0].partials["_bpm_error"])
+    key_windows = [w for w in windows if w.partials.get("_key_error") is None]
+    if key_windows and "key" in stages:
+        key, key_confidence, key_window = _weighted_vote(key_windows, "key", "key_confidence")
+        partials.update(
+            key=key,
+            key_raw=key_window.partials["key_raw"],
+            key_confidence=key_confidence,
+            key_profiles=key_window.partials["key_profiles"],
+        )
+    elif "key" in stages:
+        partials.update(STAGE_DEFAULTS["key"], _key_error=windows[0].partials["_key_error"])
+    merged = assemble_result(partials)
+    if previous is not None and "analysis_scope" in previous:
+        merged["analysis_scope"] = {**previous["analysis_scope"], **dict.fromkeys(stages, "full")}
+    return merged
+
+
+def run_job(
+    job: BatchJob, options: AnalysisOptions
+) -> AnalysisResult | WindowResult | list[AnalysisResult | Exception]:
+    """Worker entry point: analyze a whole file, one window of a split file, a group of clips, or re-run stages."""
+    import warnings
+
+    warnings.filterwarnings("ignore")
+
+    if job.clips:
+        return analyze_clips(job.clips, options=options)
+    if job.stages and job.windows == 1:
+        y = decoder_for(options)(job.path)
+        return rerun_stages(cast(AnalysisResult, job.previous), y, SAMPLE_RATE, job.stages, options)
+    if job.windows == 1:
+        return analyze_file(job.path, options=options)
+    return analyze_window(job, options)
+
+
+def run_job_metered(job: BatchJob, options: AnalysisOptions) -> tuple[Any, MetricsRegistry]:
+    """Pool entry point: :func:`run_job` plus the metrics the worker recorded for it, for the parent to merge."""
+    REGISTRY.take()  # Drop anything recorded outside a job (e.g. while warming up)
+    return run_job(job, options), REGISTRY.take()
+
+
+def _admit(queue: deque[BatchJob], memory_in_use: int, memory_budget: int | None, idle: bool) -> BatchJob | None:
+    """Remove and return the first queued job whose estimated peak fits the remaining budget.
+
+    Smaller jobs further down the queue may start while the head waits for
+    memory. When nothing is running the head is admitted regardless, so a job
+    larger than the whole budget still runs (alone) instead of blocking forever.
+    """
+    for index, job in enumerate(queue):
+        if memory_budget is None or idle or memory_in_use + job.peak_memory <= memory_budget:
+            del queue[index]
+            return job
+    return None
+
+
+def run_batch(
+    jobs: list[BatchJob],
+    workers: int,
+    options: AnalysisOptions | None = None,
+    memory_budget: int | None = None,
+    threads_per_worker: int | None = None,
+) -> Iterator[BatchRecord]:
+    """Run ``jobs`` in order on ``workers`` processes, yielding one record per file (or clip) as it completes.
+
+    Only ``workers`` jobs are in flight at a time, so the order of ``jobs``
+    (longest-first from :func:`plan_jobs`) is the order in which idle workers
+    pick up work. With a ``memory_budget`` (bytes), a job also waits until the
+    estimated peaks of the jobs in flight leave room for it (see :func:`_admit`).
+    Native thread pools in each worker are capped at ``threads_per_worker``
+    (default: CPUs divided evenly between the workers).
+    """
+    options = options or AnalysisOptions()
+    queue = deque(jobs)
+    windows: dict[Path, list[WindowResult]] = defaultdict(list)
+    failed: set[Path] = set()
+    in_flight: dict[Future, BatchJob] = {}
+    memory_in_use = 0
+
+    threads = threads_per_worker or default_threads_per_worker(workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=limit_native_threads, initargs=(threads,)) as pool:
+        while queue or in_flight:
+            while queue and len(in_flight) < workers:
+                admitted = _admit(queue, memory_in_use, memory_budget, idle=not in_flight)
+                if admitted is None:
+                    break
+                if admitted.path not in failed:
+                    in_flight[pool.submit(run_job_metered, admitted, options)] = admitted
+                    memory_in_use += admitted.peak_memory
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                memory_in_use -= job.peak_memory
+                if job.path in failed:
+                    continue
+                try:
+                    output, metrics = future.result()
+                except Exception as e:
+                    failed.add(job.path)
+                    windows.pop(job.path, None)
+                    for path in job.clips or (job.path,):
+                        count_track(e)
+                        yield {"path": str(path), "result": None, "error": f"{type(e).__name__}: {e}"}
+                    continue
+                REGISTRY.merge(metrics)
+                if isinstance(output, list):
+                    for path, clip_output in zip(job.clips, output, strict=True):
+                        if isinstance(clip_output, Exception):
+                            count_track(clip_output)
+                            error = f"{type(clip_output).__name__}: {clip_output}"
+                            yield {"path": str(path), "result": None, "error": error}
+                        else:
+                            count_track()
+                            yield {"path": str(path), "result": clip_output, "error": None}
+                    continue
+                if isinstance(output, WindowResult):
+                    windows[job.path].append(output)
+                    if len(windows[job.path]) < job.windows:
+                        continue
+                    output = merge_windows(windows.pop(job.path), job.previous, job.stages or tuple(STAGES))
+                count_track()
+                yield {"path": str(job.path), "result": output, "error": None}
@@ -0,0 +1,235 @@
+"""On-disk cache of analysis results.
+
+Results are keyed by the SHA-256 of the file's bytes, so renamed or copied
+files hit the cache, together with the :class:`~audio_analyzer.main.AnalysisOptions`
+they were computed with. Each cached result can also carry an
+:class:`~audio_analyzer.fingerprint.AudioFingerprint`, which lets re-encodes of
+an already analyzed track (different format or bitrate, so different bytes)
+reuse its result instead of running the full pipeline.
+
+Layout::
+
+    <root>/results/<digest[:2]>/<digest>-<options key>.json
+    <root>/fingerprints.ndjson    (append-only fingerprint index)
+    <root>/stages/<digest[:2]>/<digest>-<stage options key>-<stage>-v<stage version>.json
+
+:class:`PcmCache` separately keeps decoded audio, so re-analysis with other
+options or analyzer versions skips decoding::
+
+    <root>/pcm/<digest[:2]>/<digest>-<sample rate>.npy
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from audio_analyzer import __version__
+from audio_analyzer.fingerprint import (
+    MAX_DURATION_DIFFERENCE,
+    MAX_HAMMING_DISTANCE,
+    AudioFingerprint,
+    hamming_distances,
+)
+from audio_analyzer.main import (
+    SAMPLE_RATE,
+    STAGE_OPTIONS,
+    STAGE_VERSIONS,
+    AnalysisOptions,
+    AnalysisResult,
+    load_audio,
+)
+
+
+def file_digest(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def options_key(options: AnalysisOptions) -> str:
+    """Short stable hash of the analysis options."""
+    encoded = json.dumps(dataclasses.asdict(options), sort_keys=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:12]
+
+
+def stage_options_key(options: AnalysisOptions, stage: str) -> str:
+    """Short stable hash of the options one stage reads (see :data:`~audio_analyzer.main.STAGE_OPTIONS`)."""
+    fields = {name: getattr(options, name) for name in STAGE_OPTIONS[stage]}
+    encoded = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:12]
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class ResultCache:
+    """Directory-backed cache of analysis results, keyed by content digest.
+
+    Whole results written by a different analyzer version are treated as
+    misses. Per-stage outputs are versioned by their stage's
+    :data:`~audio_analyzer.main.STAGE_VERSIONS` entry instead, so they
+    survive releases that leave the stage unchanged.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._index_path = self.root / "fingerprints.ndjson"
+        self._index: list[tuple[str, str, float, str]] | None = None  # (bits, middle, duration, digest)
+
+    def _result_path(self, digest: str, options: AnalysisOptions) -> Path:
+        return self.root / "results" / digest[:2] / f"{digest}-{options_key(options)}.json"
+
+    def get(self, digest: str, options: AnalysisOptions) -> AnalysisResult | None:
+        """Return the cached result for a content digest and options, if any."""
+        try:
+            entry = json.loads(self._result_path(digest, options).read_text())
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != __version__:
+            return None
+        result: AnalysisResult = entry["result"]
+        return result
+
+    def put(
+        self,
+        digest: str,
+        options: AnalysisOptions,
+        result: AnalysisResult,
+        fingerprint: AudioFingerprint | None = None,
+    ) -> None:
+        """Store a result, and index its fingerprint when one is given."""
+        entry = {"version": __version__, "result": result, "fingerprint": fingerprint}
+        _write_atomic(self._result_path(digest, options), json.dumps(entry))
+        if fingerprint is not None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            line = json.dumps({**fingerprint, "digest": digest})
+            with open(self._index_path, "a") as f:
+                f.write(line + "\n")
+            if self._index is not None:
+                self._index.append((fingerprint["bits"], fingerprint["middle"], fingerprint["duration"], digest))
+
+    def _stage_path(self, digest: str, options: AnalysisOptions, stage: str) -> Path:
+        name = f"{digest}-{stage_options_key(options, stage)}-{stage}-v{STAGE_VERSIONS[stage]}.json"
+        return self.root / "stages" / digest[:2] / name
+
+    def get_stage(self, digest: str, options: AnalysisOptions, stage: str) -> dict[str, Any] | None:
+        """Return one stage's cached output at the stage's current version, if any."""
+        try:
+            output: dict[str, Any] = json.loads(self._stage_path(digest, options, stage).read_text())
+        except (OSError, ValueError):
+            return None
+        return output
+
+    def put_stage(self, digest: str, options: AnalysisOptions, stage: str, output: dict[str, Any]) -> None:
+        """Store one stage's output under the stage's current version."""
+        _write_atomic(self._stage_path(digest, options, stage), json.dumps(output))
+
+    def _load_index(self) -> list[tuple[str, str, float, str]]:
+        if self._index is None:
+            self._index = []
+            try:
+                with open(self._index_path) as f:
+                    for line in f:
+                        try:
+                            item = json.loads(line)
+                            entry = (item["bits"], item["middle"], float(item["duration"]), item["digest"])
+                        except (ValueError, KeyError):
+                            continue  # torn line from an interrupted append, or one without a middle excerpt
+                        self._index.append(entry)
+            except FileNotFoundError:
+                pass
+        return self._index
+
+    def find_similar(self, fingerprint: AudioFingerprint, options: AnalysisOptions) -> AnalysisResult | None:
+        """Return the result of the closest fingerprint match (within the distance and duration limits) for ``options``.
+
+        Candidates are ranked by their opening excerpt and must match on the middle excerpt as well.
+        """
+        index = [
+            item for item in self._load_index() if abs(item[2] - fingerprint["duration"]) <= MAX_DURATION_DIFFERENCE
+        ]
+        if not index:
+            return None
+        distances = hamming_distances(fingerprint["bits"], [item[0] for item in index])
+        middle_distances = hamming_distances(fingerprint["middle"], [item[1] for item in index])
+        for i in distances.argsort():
+            if distances[i] > MAX_HAMMING_DISTANCE:
+                break
+            if middle_distances[i] > MAX_HAMMING_DISTANCE:
+                continue
+            result = self.get(index[i][3], options)
+            if result is not None:
+                return result
+        return None
+
+
+class PcmCache:
+    """Directory-backed cache of decoded mono float32 audio, keyed by content digest and sample rate.
+
+    Entries are ``.npy`` files opened as read-only memory maps, so a hit costs
+    a header read rather than a decode. Decoding does not depend on the
+    analyzer version or (beyond the resampling filter of the lite engine's
+    decoder) on analysis options, so entries stay valid across both.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _pcm_path(self, digest: str, sr: int) -> Path:
+        return self.root / "pcm" / digest[:2] / f"{digest}-{sr}.npy"
+
+    def get(self, digest: str, sr: int = SAMPLE_RATE) -> np.ndarray | None:
+        """Return the memory-mapped decoded audio for a content digest, if cached."""
+        try:
+            y: np.ndarray = np.load(self._pcm_path(digest, sr), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return y
+
+    def put(self, digest: str, y: np.ndarray, sr: int = SAMPLE_RATE) -> None:
+        """Store decoded audio."""
+        path = self._pcm_path(digest, sr)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(y, dtype=np.float32))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def load(
+        self,
+        audio_path: str | Path,
+        sr: int = SAMPLE_RATE,
+        digest: str | None = None,
+        decode: Callable[[str | Path, int], np.ndarray] | None = None,
+    ) -> np.ndarray:
+        """Decoded audio for a file: from the cache, or decoded with ``decode`` (default: ``load_audio``) and stored."""
+        digest = digest or file_digest(audio_path)
+        y = self.get(digest, sr)
+        if y is None:
+            self.put(digest, (decode or load_audio)(audio_path, sr), sr)
+            y = self.get(digest, sr)
+            assert y is not None
+        return y
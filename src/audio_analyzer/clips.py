@@ -0,0 +1,387 @@
+"""Vectorized analysis of many short clips (samples, one-shots, loops) at once.
+
+For 1-10 second clips the per-file overhead of the regular pipeline (Essentia
+algorithm construction, framing loops in Python, one FFT plan per call)
+outweighs the signal processing itself. :func:`analyze_clips` instead decodes
+a group of clips, zero-pads them into one ``(clips, samples)`` array and
+computes every measure for the whole group with array operations along the
+last axis, masking out each clip's padding. The results are then split back
+into one :class:`~audio_analyzer.main.AnalysisResult` per clip.
+
+The measures follow the regular pipeline's definitions, with two substitutions
+that have no batched Essentia equivalent: BPM comes from the autocorrelation
+of each clip's onset envelope (:func:`tempo_from_envelopes`), and key from
+template matching of averaged chroma (:mod:`audio_analyzer.tonal`). Energy, loudness and vocal
+ratios use the same frames, gates and thresholds as the regular stages, but
+with exact percentiles instead of the streaming sketches.
+
+:class:`~audio_analyzer.main.AnalysisOptions` apply as in the regular pipeline:
+``key_profiles`` name the templates to vote over, voting is adaptive or
+exhaustive, and the ``lite`` engine decodes and computes chroma and onsets
+with NumPy and SciPy only (one clip at a time) instead of librosa.
+"""
+
+import math
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from audio_analyzer.energy import (
+    ABSOLUTE_GATE_LUFS,
+    ENERGY_FRAME_SIZE,
+    ENERGY_HOP_SIZE,
+    INTEGRATED_RELATIVE_GATE_LU,
+    RANGE_RELATIVE_GATE_LU,
+    EnergyResult,
+    _lufs,
+    k_weighting_filter,
+)
+from audio_analyzer.main import (
+    ONSET_HOP_LENGTH,
+    SAMPLE_RATE,
+    AnalysisOptions,
+    AnalysisResult,
+    assemble_result,
+    decoder_for,
+    fold_bpm,
+    skip_settled_profiles,
+    stage_failure,
+    vote_key,
+)
+from audio_analyzer.metrics import stage_timer
+from audio_analyzer.threads import fft_workers
+from audio_analyzer.tonal import estimate_keys, template_profiles
+
+DEFAULT_CLIP_BATCH_SIZE = 64
+
+# Filters and spectra run on sub-groups of this many clips of similar length, so
+# little padding is processed and the complex STFTs stay small
+LENGTH_GROUP_SIZE = 8
+
+VOCAL_FRAME_SIZE = 4096
+VOCAL_HOP_SIZE = 2048
+VOCAL_MAX_FRAMES = 100
+VOCAL_THRESHOLD = 0.70
+
+TEMPO_MIN_BPM = 30.0
+TEMPO_MAX_BPM = 300.0
+
+CHROMA_FRAME_SIZE = 4096
+CHROMA_HOP_SIZE = 2048
+
+
+def pad_clips(signals: Sequence[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Stack signals into a zero-padded ``(n, max_length)`` float32 array; also return their lengths."""
+    lengths = np.array([len(y) for y in signals], dtype=np.int64)
+    padded = np.zeros((len(signals), int(lengths.max(initial=0))), dtype=np.float32)
+    for row, y in zip(padded, signals, strict=True):
+        row[: len(y)] = y
+    return padded, lengths
+
+
+def _frame_counts(lengths: np.ndarray, frame_size: int, hop_size: int) -> np.ndarray:
+    """Per-clip ``len(range(0, length - frame_size, hop_size))``, the framing of the regular stages."""
+    return np.asarray(np.maximum(0, -(-(lengths - frame_size) // hop_size)))
+
+
+def _window_sums(cumulative: np.ndarray, starts: np.ndarray, size: int) -> np.ndarray:
+    """Sums over ``[start, start + size)`` along the last axis, from a zero-prefixed cumulative sum."""
+    return np.asarray(cumulative[:, starts + size] - cumulative[:, starts])
+
+
+def _masked_percentile(values: np.ndarray, valid: np.ndarray, q: float) -> np.ndarray:
+    """Row-wise ``np.percentile`` of the valid entries (NaN for rows without any)."""
+    ordered = np.sort(np.where(valid, values, np.inf), axis=1)  # Invalid entries sort last
+    counts = valid.sum(axis=1)
+    rank = q / 100 * np.maximum(counts - 1, 0)
+    lower = np.floor(rank).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    rows = np.arange(len(values))
+    low_values = ordered[rows, lower] if ordered.shape[1] else np.zeros(len(values))
+    high_values = ordered[rows, upper] if ordered.shape[1] else np.zeros(len(values))
+    with np.errstate(invalid="ignore"):
+        out = low_values + (high_values - low_values) * (rank - lower)
+    return np.where(counts > 0, out, np.nan)
+
+
+def _gated_loudness(mean_squares: np.ndarray, valid: np.ndarray, relative_gate_lu: float) -> np.ndarray:
+    """Mask of blocks passing the absolute gate and the relative gate below their clip's gated mean."""
+    with np.errstate(divide="ignore"):
+        loudness = _lufs(np.maximum(mean_squares, 0.0))
+    gated = valid & (loudness >= ABSOLUTE_GATE_LUFS)
+    counts = gated.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        threshold = _lufs(np.where(gated, mean_squares, 0.0).sum(axis=1) / counts) + relative_gate_lu
+    return np.asarray(gated & (loudness >= threshold[:, None]))
+
+
+def _length_groups(lengths: np.ndarray) -> list[tuple[np.ndarray, int]]:
+    """Rows in groups of ``LENGTH_GROUP_SIZE`` clips of similar length, with the samples each group spans."""
+    order = np.argsort(lengths, kind="stable")
+    groups = []
+    for start in range(0, len(order), LENGTH_GROUP_SIZE):
+        rows = order[start : start + LENGTH_GROUP_SIZE]
+        groups.append((rows, int(lengths[rows].max())))
+    return groups
+
+
+def clip_energy(padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE) -> list[EnergyResult]:
+    """Energy score, integrated loudness, loudness range and RMS level of every clip."""
+    from scipy.signal import lfilter
+
+    n = len(padded)
+    squares = padded.astype(np.float64) ** 2
+    cumulative = np.concatenate([np.zeros((n, 1)), np.cumsum(squares, axis=1)], axis=1)
+
+    # Energy score: p95 / p99.9 of 2048-sample frame energies
+    frame_counts = _frame_counts(lengths, ENERGY_FRAME_SIZE, ENERGY_HOP_SIZE)
+    frame_starts = np.arange(int(frame_counts.max(initial=0))) * ENERGY_HOP_SIZE
+    energies = _window_sums(cumulative, frame_starts, ENERGY_FRAME_SIZE)
+    frame_valid = np.arange(len(frame_starts)) < frame_counts[:, None]
+    p95 = _masked_percentile(energies, frame_valid, 95)
+    p999 = _masked_percentile(energies, frame_valid, 99.9)
+
+    # Loudness: K-weighted 100 ms sub-blocks; 400 ms momentary and 3 s short-term windows
+    b, a = k_weighting_filter(sr)
+    subblock = int(round(0.1 * sr))
+    subblock_counts = lengths // subblock
+    n_subblocks = int(subblock_counts.max(initial=0))
+    subblock_sums = np.zeros((n, n_subblocks))
+    for rows, n_samples in _length_groups(lengths):
+        # The filter is recursive in time, so skip the group's padding rather than filter it
+        group_subblocks = n_samples // subblock
+        weighted = lfilter(b, a, padded[rows, : group_subblocks * subblock].astype(np.float64), axis=1)
+        subblock_sums[rows, :group_subblocks] = (weighted**2).reshape(len(rows), group_subblocks, subblock).sum(axis=2)
+    subblock_cumulative = np.concatenate([np.zeros((n, 1)), np.cumsum(subblock_sums, axis=1)], axis=1)
+
+    def windows(length: int) -> tuple[np.ndarray, np.ndarray]:
+        starts = np.arange(max(0, n_subblocks - length + 1))
+        mean_squares = _window_sums(subblock_cumulative, starts, length) / (length * subblock)
+        return mean_squares, starts + length <= subblock_counts[:, None]
+
+    momentary, momentary_valid = windows(4)
+    momentary_gated = _gated_loudness(momentary, momentary_valid, INTEGRATED_RELATIVE_GATE_LU)
+    short_term, short_term_valid = windows(30)
+    short_term_gated = _gated_loudness(short_term, short_term_valid, RANGE_RELATIVE_GATE_LU)
+    with np.errstate(divide="ignore"):
+        short_term_lufs = _lufs(np.maximum(short_term, 0.0))
+    range_low = _masked_percentile(short_term_lufs, short_term_gated, 10)
+    range_high = _masked_percentile(short_term_lufs, short_term_gated, 95)
+
+    results: list[EnergyResult] = []
+    for i in range(n):
+        energy = 50 if frame_counts[i] == 0 else int(min(1.0, p95[i] / (p999[i] + 0.001)) * 100)
+        gated = momentary_gated[i]
+        loudness = float(_lufs(np.array([momentary[i][gated].mean()]))[0]) if gated.any() else None
+        loudness_range = None if math.isnan(range_low[i]) else float(range_high[i] - range_low[i])
+        total = float(cumulative[i, lengths[i]])
+        rms = 10 * math.log10(total / lengths[i]) if lengths[i] and total > 0 else None
+        results.append(
+            {
+                "energy": energy,
+                "loudness_lufs": None if loudness is None else round(loudness, 2),
+                "loudness_range": None if loudness_range is None else round(loudness_range, 1),
+                "rms_db": None if rms is None else round(rms, 2),
+            }
+        )
+    return results
+
+
+def clip_vocals(padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Vocal presence per clip: mean 200-4000 Hz share of non-bass energy over the first frames above 0.70."""
+    from scipy.fft import rfft, rfftfreq
+
+    freqs = rfftfreq(VOCAL_FRAME_SIZE, 1 / sr)
+    vocal_mask = (freqs >= 200) & (freqs <= 4000)
+    low_mask = freqs < 200
+
+    frame_counts = _frame_counts(lengths, VOCAL_FRAME_SIZE, VOCAL_HOP_SIZE)
+    ratio_sums = np.zeros(len(padded))
+    ratio_counts = np.zeros(len(padded), dtype=np.int64)
+    # Frames are read in order, VOCAL_MAX_FRAMES at a time, until every clip has
+    # enough valid frames (silent and bass-only frames don't count) or runs out
+    start = 0
+    while start < int(frame_counts.max(initial=0)):
+        active = np.flatnonzero((ratio_counts < VOCAL_MAX_FRAMES) & (frame_counts > start))
+        if not len(active):
+            break
+        stop = min(start + VOCAL_MAX_FRAMES, int(frame_counts[active].max()))
+        span = padded[active, start * VOCAL_HOP_SIZE : (stop - 1) * VOCAL_HOP_SIZE + VOCAL_FRAME_SIZE]
+        frames = np.lib.stride_tricks.sliding_window_view(span, VOCAL_FRAME_SIZE, axis=1)[:, ::VOCAL_HOP_SIZE]
+        power = np.abs(rfft(frames, axis=2, workers=fft_workers())) ** 2
+
+        total = power.sum(axis=2)
+        non_bass = total - power[:, :, low_mask].sum(axis=2)
+        vocal = power[:, :, vocal_mask].sum(axis=2)
+        in_clip = start + np.arange(frames.shape[1]) < frame_counts[active, None]
+        valid = in_clip & (total > 0) & (non_bass > 0)
+        # Only the first VOCAL_MAX_FRAMES valid frames of each clip count
+        valid &= ratio_counts[active, None] + np.cumsum(valid, axis=1) <= VOCAL_MAX_FRAMES
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(valid, vocal / non_bass, 0.0)
+        ratio_sums[active] += ratios.sum(axis=1)
+        ratio_counts[active] += valid.sum(axis=1)
+        start = stop
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.asarray((ratio_counts > 0) & (ratio_sums / ratio_counts > VOCAL_THRESHOLD))
+
+
+def clip_chroma(padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Chroma summed over each clip's frames, shape ``(n, 12)`` (C first)."""
+    import librosa
+
+    chroma = np.zeros((len(padded), 12))
+    for rows, n_samples in _length_groups(lengths):
+        # Tuning fixed at A440: estimating it would pool the clips of the group
+        frames = librosa.feature.chroma_stft(
+            y=padded[rows, :n_samples], sr=sr, n_fft=CHROMA_FRAME_SIZE, hop_length=CHROMA_HOP_SIZE, tuning=0.0
+        )  # (clips, 12, frames)
+        in_clip = np.arange(frames.shape[2]) <= lengths[rows, None] // CHROMA_HOP_SIZE
+        chroma[rows] = (frames * in_clip[:, None, :]).sum(axis=2)
+    return chroma
+
+
+def clip_onset_envelopes(padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Onset strength per clip, shape ``(n, frames)``, zero past each clip's end."""
+    import librosa
+
+    n_frames = 1 + padded.shape[1] // ONSET_HOP_LENGTH
+    envelopes = np.zeros((len(padded), n_frames))
+    for rows, n_samples in _length_groups(lengths):
+        group = librosa.onset.onset_strength(y=padded[rows, :n_samples], sr=sr, hop_length=ONSET_HOP_LENGTH)
+        envelopes[rows, : group.shape[1]] = group
+    return envelopes * (np.arange(n_frames) <= lengths[:, None] // ONSET_HOP_LENGTH)
+
+
+def clip_chroma_lite(padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Chroma per clip as :func:`clip_chroma`, with the lite engine's NumPy chroma instead of librosa."""
+    from audio_analyzer.lite import chroma_lite
+
+    return np.array([chroma_lite(row[:length], sr) for row, length in zip(padded, lengths, strict=True)])
+
+
+def clip_onset_envelopes_lite(padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Onset envelopes as :func:`clip_onset_envelopes`, with the lite engine's spectral flux instead of librosa."""
+    from audio_analyzer.lite import onset_envelope_lite
+
+    envelopes = np.zeros((len(padded), 1 + padded.shape[1] // ONSET_HOP_LENGTH))
+    for row, length, envelope in zip(padded, lengths, envelopes, strict=True):
+        flux = onset_envelope_lite(row[:length], sr)
+        envelope[: len(flux)] = flux
+    return envelopes
+
+
+def tempo_from_envelopes(
+    envelopes: np.ndarray, sr: int = SAMPLE_RATE, hop_length: int = ONSET_HOP_LENGTH
+) -> tuple[np.ndarray, np.ndarray]:
+    """Folded BPM and a 0-1 periodicity confidence for each row of onset envelopes.
+
+    The beat period is the autocorrelation peak of the whole envelope,
+    weighted by a log-normal prior around 120 BPM (librosa's tempo prior) and
+    searched between ``TEMPO_MIN_BPM`` and ``TEMPO_MAX_BPM``; the confidence is
+    the autocorrelation there relative to lag zero. Rows without any onset
+    variation get 0 BPM and 0 confidence.
+    """
+    from scipy.fft import irfft, next_fast_len, rfft
+
+    centered = envelopes - envelopes.mean(axis=1, keepdims=True)
+    n_fft = next_fast_len(2 * centered.shape[1] - 1, real=True)
+    spectrum = rfft(centered, n=n_fft, axis=1, workers=fft_workers())
+    autocorrelation = irfft(np.abs(spectrum) ** 2, n=n_fft, axis=1, workers=fft_workers())[:, : centered.shape[1]]
+
+    frame_rate = sr / hop_length
+    lags = np.arange(autocorrelation.shape[1])
+    with np.errstate(divide="ignore"):
+        lag_bpm = 60 * frame_rate / lags
+    searched = (lag_bpm >= TEMPO_MIN_BPM) & (lag_bpm <= TEMPO_MAX_BPM)
+    prior = np.where(searched, np.exp(-0.5 * np.log2(np.where(searched, lag_bpm, 1.0) / 120.0) ** 2), 0.0)
+    energy = autocorrelation[:, 0]
+    bpm = np.zeros(len(envelopes))
+    confidence = np.zeros(len(envelopes))
+    if not searched.any():
+        return bpm, confidence
+    best = np.argmax(np.maximum(autocorrelation, 0.0) * prior, axis=1)
+    rows = np.flatnonzero((energy > 0) & (autocorrelation[np.arange(len(envelopes)), best] > 0))
+    bpm[rows] = [round(fold_bpm(float(lag_bpm[lag]))) for lag in best[rows]]
+    confidence[rows] = np.clip(autocorrelation[rows, best[rows]] / energy[rows], 0.0, 1.0)
+    return bpm, confidence
+
+
+def analyze_padded(
+    padded: np.ndarray, lengths: np.ndarray, sr: int = SAMPLE_RATE, options: AnalysisOptions | None = None
+) -> list[AnalysisResult]:
+    """Analyze zero-padded clips (see :func:`pad_clips`) with ``options``, one result per row.
+
+    Each stage runs for the whole group at once; a stage that raises gives
+    every clip its defaults and error, as :func:`~audio_analyzer.main.run_stage`
+    does for one track, while the other stages complete.
+    """
+    options = options or AnalysisOptions()
+    lite = options.engine == "lite"
+
+    def bpm() -> list[dict[str, Any]]:
+        envelopes = (clip_onset_envelopes_lite if lite else clip_onset_envelopes)(padded, lengths, sr)
+        bpms, confidences = tempo_from_envelopes(envelopes, sr)
+        return [{"bpm": float(b), "bpm_confidence": float(c)} for b, c in zip(bpms, confidences, strict=True)]
+
+    def key() -> list[dict[str, Any]]:
+        chroma = (clip_chroma_lite if lite else clip_chroma)(padded, lengths, sr)
+        outputs = []
+        for key_results in estimate_keys(chroma, template_profiles(options.key_profiles)):
+            key_results = skip_settled_profiles(key_results, options)
+            final_key, final_key_raw, key_confidence = vote_key(key_results)
+            outputs.append(
+                {
+                    "key": final_key,
+                    "key_raw": final_key_raw,
+                    "key_confidence": float(key_confidence),
+                    "key_profiles": key_results,
+                }
+            )
+        return outputs
+
+    def energy() -> list[dict[str, Any]]:
+        return [dict(result) for result in clip_energy(padded, lengths, sr)]
+
+    def vocals() -> list[dict[str, Any]]:
+        return [{"has_vocals": bool(v)} for v in clip_vocals(padded, lengths, sr)]
+
+    stages: dict[str, Callable[[], list[dict[str, Any]]]] = {
+        "bpm": bpm,
+        "key": key,
+        "energy": energy,
+        "vocals": vocals,
+    }
+    partials: list[dict[str, Any]] = [{} for _ in range(len(padded))]
+    for name, compute in stages.items():
+        try:
+            outputs = compute()
+        except Exception as e:
+            outputs = [stage_failure(name, e)] * len(padded)
+        for clip_partials, output in zip(partials, outputs, strict=True):
+            clip_partials.update(output)
+    return [assemble_result(clip_partials) for clip_partials in partials]
+
+
+def analyze_clips(
+    paths: Sequence[str | Path], sr: int = SAMPLE_RATE, options: AnalysisOptions | None = None
+) -> list[AnalysisResult | Exception]:
+    """Decode and analyze a group of short files together; a clip that fails to decode gets its exception instead."""
+    options = options or AnalysisOptions()
+    decode = decoder_for(options)
+    signals: dict[int, np.ndarray] = {}
+    errors: dict[int, Exception] = {}
+    for index, path in enumerate(paths):
+        try:
+            signals[index] = decode(path, sr)
+        except Exception as e:
+            errors[index] = e
+    results: dict[int, AnalysisResult] = {}
+    if signals:
+        padded, lengths = pad_clips(list(signals.values()))
+        with stage_timer("clips"):
+            results = dict(zip(signals, analyze_padded(padded, lengths, sr, options), strict=True))
+    return [results[index] if index in results else errors[index] for index in range(len(paths))]
@@ -0,0 +1,97 @@
+"""Concurrent scheduling of the independent analysis stages of one track.
+
+Once a track is decoded, the stages in :data:`audio_analyzer.main.STAGES`
+only read the signal, so they can run side by side to cut single-track
+latency on an otherwise idle multi-core machine.
+
+Threads are cheap but only overlap work that releases the GIL (NumPy, SciPy
+FFTs, most of librosa). Essentia's standard-mode algorithms hold the GIL for
+their whole computation, so the ``process`` executor copies the signal once
+into shared memory and runs each stage in a worker process that maps it
+without copying.
+"""
+
+import atexit
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from audio_analyzer.main import STAGES, AnalysisOptions, run_stage
+from audio_analyzer.metrics import REGISTRY, STAGE_SECONDS
+
+_pools: dict[str, Executor] = {}
+
+
+def _pool(kind: str) -> Executor:
+    """Long-lived pool per executor kind, so worker start-up is paid once per process."""
+    if kind not in _pools:
+        if kind == "thread":
+            _pools[kind] = ThreadPoolExecutor(max_workers=len(STAGES), thread_name_prefix="audio-analyzer-stage")
+        elif kind == "process":
+            _pools[kind] = ProcessPoolExecutor(max_workers=len(STAGES))
+        else:
+            raise ValueError(f"Unknown stage executor: {kind}")
+    return _pools[kind]
+
+
+@atexit.register
+def _shutdown_pools() -> None:
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+def _run_stage_shared(stage: str, shm_name: str, length: int, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """Worker entry point: run one stage on the signal held in shared memory."""
+    import warnings
+
+    warnings.filterwarnings("ignore")
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        y = np.ndarray((length,), dtype=np.float32, buffer=shm.buf)
+        try:
+            return run_stage(stage, y, sr, options)
+        finally:
+            # The view must go before the mapping can be closed
+            del y
+    finally:
+        shm.close()
+
+
+def _collect(start: float, futures: dict[Future, str]) -> dict[str, dict[str, Any]]:
+    """Outputs by stage name, recording each stage's latency from ``start`` as it completes.
+
+    Every stage has a worker of its own, so that is the stage's run time.
+    """
+    outputs: dict[str, dict[str, Any]] = {}
+    for future in as_completed(futures):
+        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - start, {"stage": futures[future]})
+        outputs[futures[future]] = future.result()
+    return {stage: outputs[stage] for stage in futures.values()}
+
+
+def run_stages(
+    y: np.ndarray, sr: int, stages: list[str], executor: str, options: AnalysisOptions
+) -> dict[str, dict[str, Any]]:
+    """Run ``stages`` concurrently on ``executor`` (``thread`` or ``process``); return each stage's output by name."""
+    pool = _pool(executor)
+
+    if executor == "thread":
+        return _collect(time.perf_counter(), {pool.submit(run_stage, stage, y, sr, options): stage for stage in stages})
+
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    shm = SharedMemory(create=True, size=max(1, y.nbytes))
+    try:
+        shared = np.ndarray(y.shape, dtype=np.float32, buffer=shm.buf)
+        shared[:] = y
+        del shared
+        start = time.perf_counter()
+        futures = {pool.submit(_run_stage_shared, stage, shm.name, len(y), sr, options): stage for stage in stages}
+        return _collect(start, futures)
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,339 @@
+"""Streaming energy, loudness and dynamics measures.
+
+Everything here is computed in a single pass over blocks of samples with memory
+that does not grow with the input length (apart from the coarse RMS envelope),
+so whole files and live streams share the same code path.
+"""
+
+import math
+from typing import TypedDict
+
+import numpy as np
+
+from audio_analyzer.main import SAMPLE_RATE
+
+# Frame layout of the 0-100 energy score (matches essentia.standard.Energy on 2048/1024 frames)
+ENERGY_FRAME_SIZE = 2048
+ENERGY_HOP_SIZE = 1024
+
+# ITU-R BS.1770 / EBU R128 gating constants
+ABSOLUTE_GATE_LUFS = -70.0
+INTEGRATED_RELATIVE_GATE_LU = -10.0
+RANGE_RELATIVE_GATE_LU = -20.0
+LOUDNESS_HISTOGRAM_MAX_LUFS = 30.0
+LOUDNESS_HISTOGRAM_STEP_LU = 0.1
+
+
+class EnergyResult(TypedDict):
+    """Summary of the energy subsystem as it appears in the analysis result."""
+
+    energy: int  # 0-100 percentile-based score
+    loudness_lufs: float | None  # Integrated loudness (None for silence)
+    loudness_range: float | None  # EBU R128 loudness range in LU
+    rms_db: float | None  # Overall RMS level in dBFS
+
+
+class QuantileSketch:
+    """Fixed-memory quantile sketch for non-negative values.
+
+    Values are counted in logarithmically spaced buckets, so any quantile is
+    returned with a relative error of at most ``relative_accuracy`` regardless
+    of how many values were added. Values at or below ``min_value`` are counted
+    as zero; values above ``max_value`` land in the top bucket.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.005, min_value: float = 1e-12, max_value: float = 1e6):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        n_buckets = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self.counts = np.zeros(n_buckets, dtype=np.int64)
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + int(self.counts.sum())
+
+    def add(self, values: np.ndarray) -> None:
+        """Add a batch of values."""
+        v = np.asarray(values, dtype=np.float64).ravel()
+        positive = v > self.min_value
+        self.zero_count += int(v.size - np.count_nonzero(positive))
+        if not positive.any():
+            return
+        idx = np.ceil(np.log(v[positive]) / self._log_gamma).astype(np.int64) - self._offset
+        np.clip(idx, 0, len(self.counts) - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Fold another sketch with the same parameters into this one."""
+        if len(other.counts) != len(self.counts) or other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different parameters")
+        self.counts += other.counts
+        self.zero_count += other.zero_count
+
+    def _value_at_rank(self, rank: int, cumulative: np.ndarray) -> float:
+        if rank < self.zero_count:
+            return 0.0
+        bucket = int(np.searchsorted(cumulative, rank - self.zero_count, side="right"))
+        return 2 * self.gamma ** (bucket + self._offset) / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Return the approximate ``q``-quantile (0 <= q <= 1), interpolated like ``np.percentile``."""
+        n = self.count
+        if n == 0:
+            raise ValueError("Quantile of an empty sketch")
+        cumulative = np.cumsum(self.counts)
+        rank = q * (n - 1)
+        lower = math.floor(rank)
+        low_value = self._value_at_rank(lower, cumulative)
+        if rank == lower:
+            return low_value
+        high_value = self._value_at_rank(lower + 1, cumulative)
+        return low_value + (high_value - low_value) * (rank - lower)
+
+
+class _LoudnessHistogram:
+    """Gated-loudness histogram with 0.1 LU bins, keeping exact per-bin energy sums."""
+
+    def __init__(self) -> None:
+        n_bins = int(round((LOUDNESS_HISTOGRAM_MAX_LUFS - ABSOLUTE_GATE_LUFS) / LOUDNESS_HISTOGRAM_STEP_LU))
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.sums = np.zeros(n_bins, dtype=np.float64)
+
+    def add(self, mean_squares: np.ndarray) -> None:
+        z = mean_squares[mean_squares > 0]
+        loudness = _lufs(z)
+        keep = loudness >= ABSOLUTE_GATE_LUFS
+        if not keep.any():
+            return
+        idx = ((loudness[keep] - ABSOLUTE_GATE_LUFS) / LOUDNESS_HISTOGRAM_STEP_LU).astype(np.int64)
+        np.clip(idx, 0, len(self.counts) - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+        self.sums += np.bincount(idx, weights=z[keep], minlength=len(self.sums))
+
+    def merge(self, other: "_LoudnessHistogram") -> None:
+        self.counts += other.counts
+        self.sums += other.sums
+
+    def relative_gate_bin(self, gate_lu: float) -> int | None:
+        """Index of the first bin at or above the relative gate, or None when nothing passed the absolute gate."""
+        total = int(self.counts.sum())
+        if total == 0:
+            return None
+        threshold = float(_lufs(np.array([self.sums.sum() / total]))[0]) + gate_lu
+        return max(0, math.ceil((threshold - ABSOLUTE_GATE_LUFS) / LOUDNESS_HISTOGRAM_STEP_LU))
+
+
+def _lufs(mean_squares: np.ndarray) -> np.ndarray:
+    return np.asarray(-0.691 + 10 * np.log10(mean_squares))
+
+
+def k_weighting_filter(sr: int = SAMPLE_RATE) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(b, a)`` of the BS.1770 K-weighting filter (high shelf + RLB high-pass) at ``sr``."""
+    # High shelf ("stage 1"), designed from the analog prototype so any rate works
+    f0 = 1681.974450955533
+    gain_db = 3.999843853973347
+    q = 0.7071752369554196
+    k = math.tan(math.pi * f0 / sr)
+    vh = 10 ** (gain_db / 20)
+    vb = vh**0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = np.array([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0])
+    shelf_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    # RLB high-pass ("stage 2")
+    f0 = 38.13547087602444
+    q = 0.5003270373238773
+    k = math.tan(math.pi * f0 / sr)
+    a0 = 1 + k / q + k * k
+    highpass_b = np.array([1.0, -2.0, 1.0])
+    highpass_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    return np.convolve(shelf_b, highpass_b), np.convolve(shelf_a, highpass_a)
+
+
+class EnergyMeter:
+    """Single-pass meter for the energy score, integrated loudness, loudness range and RMS envelope.
+
+    Feed mono float blocks of any size with :meth:`update`, then read the
+    measures (or :meth:`summary`) at any point; reading does not consume state,
+    so the same meter serves rolling estimates on a stream.
+    """
+
+    def __init__(self, sr: int = SAMPLE_RATE, envelope_resolution: float = 1.0):
+        self.sr = sr
+        self.samples_seen = 0
+
+        # Energy score: per-frame energies into a quantile sketch
+        self.energy_sketch = QuantileSketch()
+        self._frame_buffer = np.zeros(0, dtype=np.float32)
+
+        # Loudness: K-weighted mean square per 100 ms sub-block; 400 ms momentary
+        # blocks are 4 sub-blocks and 3 s short-term windows are 30.
+        self._b, self._a = k_weighting_filter(sr)
+        self._zi = np.zeros(len(self._a) - 1)
+        self._subblock_size = int(round(0.1 * sr))
+        self._subblock_sum = 0.0
+        self._subblock_fill = 0
+        self._recent_subblocks: list[float] = []
+        self._momentary = _LoudnessHistogram()
+        self._short_term = _LoudnessHistogram()
+
+        # RMS envelope at ``envelope_resolution`` seconds per point
+        self._envelope_size = max(1, int(round(envelope_resolution * sr)))
+        self._envelope_sum = 0.0
+        self._envelope_fill = 0
+        self._envelope: list[float] = []
+        self._total_square_sum = 0.0
+
+    def update(self, block: np.ndarray) -> None:
+        """Consume the next block of mono samples."""
+        block = np.asarray(block, dtype=np.float32).ravel()
+        if block.size == 0:
+            return
+        self.samples_seen += block.size
+        self._update_energy(block)
+        self._update_loudness(block)
+        self._update_envelope(block)
+
+    def _update_energy(self, block: np.ndarray) -> None:
+        buffer = np.concatenate([self._frame_buffer, block])
+        # A frame is only counted once a sample exists past its end, which
+        # reproduces ``range(0, len(y) - frame_size, hop_size)`` over the whole signal.
+        n_frames = max(0, -(-(len(buffer) - ENERGY_FRAME_SIZE) // ENERGY_HOP_SIZE))
+        if n_frames:
+            frames = np.lib.stride_tricks.sliding_window_view(
+                buffer[: (n_frames - 1) * ENERGY_HOP_SIZE + ENERGY_FRAME_SIZE], ENERGY_FRAME_SIZE
+            )[::ENERGY_HOP_SIZE]
+            frames64 = frames.astype(np.float64)
+            self.energy_sketch.add(np.einsum("ij,ij->i", frames64, frames64))
+        self._frame_buffer = buffer[n_frames * ENERGY_HOP_SIZE :]
+
+    def _update_loudness(self, block: np.ndarray) -> None:
+        from scipy.signal import lfilter
+
+        weighted, self._zi = lfilter(self._b, self._a, block.astype(np.float64), zi=self._zi)
+        squares = weighted * weighted
+
+        completed: list[float] = []
+        pos = 0
+        while pos < len(squares):
+            take = min(self._subblock_size - self._subblock_fill, len(squares) - pos)
+            self._subblock_sum += float(squares[pos : pos + take].sum())
+            self._subblock_fill += take
+            pos += take
+            if self._subblock_fill == self._subblock_size:
+                completed.append(self._subblock_sum)
+                self._subblock_sum = 0.0
+                self._subblock_fill = 0
+        if not completed:
+            return
+
+        history = self._recent_subblocks + completed
+        window_sums = np.concatenate([[0.0], np.cumsum(history)])
+        # Window end positions (in sub-blocks) that became available with this block
+        ends = np.arange(len(self._recent_subblocks) + 1, len(history) + 1)
+        for histogram, length in ((self._momentary, 4), (self._short_term, 30)):
+            full = ends[ends >= length]
+            histogram.add((window_sums[full] - window_sums[full - length]) / (length * self._subblock_size))
+        self._recent_subblocks = history[-29:]
+
+    def _update_envelope(self, block: np.ndarray) -> None:
+        squares = block.astype(np.float64) ** 2
+        self._total_square_sum += float(squares.sum())
+        pos = 0
+        while pos < len(squares):
+            take = min(self._envelope_size - self._envelope_fill, len(squares) - pos)
+            self._envelope_sum += float(squares[pos : pos + take].sum())
+            self._envelope_fill += take
+            pos += take
+            if self._envelope_fill == self._envelope_size:
+                self._envelope.append(math.sqrt(self._envelope_sum / self._envelope_size))
+                self._envelope_sum = 0.0
+                self._envelope_fill = 0
+
+    def merge(self, other: "EnergyMeter") -> None:
+        """Fold in a meter that measured the audio immediately following this one's.
+
+        Frames, loudness blocks and envelope windows that would have spanned
+        the seam between the two are not counted, so the merged measures are
+        approximate there (a few frames per seam).
+        """
+        if other.sr != self.sr or other._envelope_size != self._envelope_size:
+            raise ValueError("Cannot merge meters with different sample rates or envelope resolutions")
+        self.samples_seen += other.samples_seen
+        self.energy_sketch.merge(other.energy_sketch)
+        self._momentary.merge(other._momentary)
+        self._short_term.merge(other._short_term)
+        self._envelope.extend(other._envelope)
+        self._total_square_sum += other._total_square_sum
+
+    def energy_score(self) -> int:
+        """Percentile-based energy level (0-100); 50 when no full frame has been seen."""
+        if self.energy_sketch.count == 0:
+            return 50
+        p95 = self.energy_sketch.quantile(0.95)
+        p999 = self.energy_sketch.quantile(0.999)
+        raw_energy = min(1.0, p95 / (p999 + 0.001))
+        return int(raw_energy * 100)
+
+    def integrated_loudness(self) -> float | None:
+        """Gated integrated loudness in LUFS, or None if every block is below the absolute gate."""
+        histogram = self._momentary
+        start = histogram.relative_gate_bin(INTEGRATED_RELATIVE_GATE_LU)
+        if start is None:
+            return None
+        count = int(histogram.counts[start:].sum())
+        if count == 0:
+            return None
+        return float(_lufs(np.array([histogram.sums[start:].sum() / count]))[0])
+
+    def loudness_range(self) -> float | None:
+        """EBU Tech 3342 loudness range in LU (p95 - p10 of gated short-term loudness)."""
+        histogram = self._short_term
+        start = histogram.relative_gate_bin(RANGE_RELATIVE_GATE_LU)
+        if start is None:
+            return None
+        counts = histogram.counts[start:]
+        n = int(counts.sum())
+        if n == 0:
+            return None
+        cumulative = np.cumsum(counts)
+        low = int(np.searchsorted(cumulative, 0.10 * (n - 1), side="right"))
+        high = int(np.searchsorted(cumulative, 0.95 * (n - 1), side="right"))
+        return (high - low) * LOUDNESS_HISTOGRAM_STEP_LU
+
+    def rms_db(self) -> float | None:
+        """Overall RMS level in dBFS, or None for digital silence."""
+        if self.samples_seen == 0 or self._total_square_sum <= 0:
+            return None
+        return 10 * math.log10(self._total_square_sum / self.samples_seen)
+
+    @property
+    def rms_envelope(self) -> np.ndarray:
+        """Linear RMS per ``envelope_resolution`` seconds (complete windows only)."""
+        return np.asarray(self._envelope, dtype=np.float32)
+
+    def summary(self) -> EnergyResult:
+        """Return the energy measures in result form."""
+        loudness = self.integrated_loudness()
+        loudness_range = self.loudness_range()
+        rms = self.rms_db()
+        return {
+            "energy": self.energy_score(),
+            "loudness_lufs": None if loudness is None else round(loudness, 2),
+            "loudness_range": None if loudness_range is None else round(loudness_range, 1),
+            "rms_db": None if rms is None else round(rms, 2),
+        }
+
+
+def measure_energy(y: np.ndarray, sr: int = SAMPLE_RATE, block_size: int = 1 << 18) -> EnergyResult:
+    """Run :class:`EnergyMeter` over an in-memory signal in fixed-size blocks."""
+    meter = EnergyMeter(sr)
+    for start in range(0, len(y), block_size):
+        meter.update(y[start : start + block_size])
+    return meter.summary()
@@ -0,0 +1,254 @@
+"""Accuracy and cost of each engine and speed mode on a labeled corpus.
+
+The corpus is synthetic tracks with known key and tempo
+(:func:`audio_analyzer.synth.labeled_track`, one per Camelot key) plus any
+annotated files of your own. Every configuration, an engine with one speed
+mode applied to the default options, analyzes every track. The result is its
+BPM and key accuracy and the CPU seconds it spent per track. A configuration
+is on the Pareto front when no other is at least as cheap and at least as
+accurate on both BPM and key, and better on one of them.
+
+Modes that an engine cannot run are left out. Essentia's rhythm and key
+extractors assume 44.1 kHz, so the reduced sample rate only applies to the
+lite engine. Only the standard engine computes the librosa BPM cross-check.
+"""
+
+import csv
+import dataclasses
+import logging
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TypedDict
+
+from audio_analyzer.main import (
+    ENGINES,
+    EVALUATION_MODES,
+    SAMPLE_RATE,
+    AnalysisOptions,
+    AnalysisResult,
+    analyze_path,
+    analyze_signal,
+    decoder_for,
+    pitch_to_camelot,
+)
+
+logger = logging.getLogger("audio-analyzer")
+
+REDUCED_SAMPLE_RATE = 22050
+
+# Tempos of the synthetic tracks, cycled over the 24 keys
+SYNTHETIC_BPMS = (90, 100, 110, 120, 124, 128, 132, 140, 150, 96, 115, 136)
+# Their chord progression repeats like a song's, so an excerpt hears all of it
+SYNTHETIC_PROGRESSION_SECONDS = 8.0
+
+NATURAL_PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+MODES = tuple(EVALUATION_MODES)
+
+
+@dataclass(frozen=True)
+class LabeledTrack:
+    """An audio file with its known tempo and Camelot key (None where unlabeled)."""
+
+    path: Path
+    bpm: float | None
+    key: str | None
+
+
+@dataclass(frozen=True)
+class Configuration:
+    """An engine with one speed mode: the options it analyzes with and the sample rate it decodes at."""
+
+    engine: str
+    mode: str
+    options: AnalysisOptions
+    sample_rate: int = SAMPLE_RATE
+
+
+class Score(TypedDict):
+    """How one configuration did on the corpus."""
+
+    engine: str
+    mode: str
+    options: dict[str, Any]
+    sample_rate: int
+    tracks: int
+    failures: int  # Tracks whose analysis raised; they count as wrong
+    bpm_accuracy: float | None  # Share of BPM-labeled tracks within the tolerance
+    key_accuracy: float | None  # Share of key-labeled tracks with the exact Camelot key
+    cpu_seconds: float  # Mean process CPU time per track, decoding included
+    pareto: bool
+
+
+def parse_key(text: str) -> str:
+    """Camelot key from Camelot notation ("8A") or a key name ("A minor", "Bb major", "F#m")."""
+    text = text.strip()
+    camelot = text.upper()
+    if camelot[-1:] in ("A", "B") and camelot[:-1].isdigit() and 1 <= int(camelot[:-1]) <= 12:
+        return camelot
+    name, _, scale = text.partition(" ")
+    if not scale and name.endswith("m"):
+        name, scale = name[:-1], "minor"
+    scale = scale.strip().lower() or "major"
+    letter, accidentals = name[:1].upper(), name[1:]
+    if letter not in NATURAL_PITCH_CLASSES or scale not in ("major", "minor") or accidentals.strip("#b"):
+        raise ValueError(f"Unrecognized key: {text!r}")
+    pitch_class = (NATURAL_PITCH_CLASSES[letter] + accidentals.count("#") - accidentals.count("b")) % 12
+    return str(pitch_to_camelot(pitch_class, 1 if scale == "major" else 0))
+
+
+def read_annotations(path: str | Path) -> list[LabeledTrack]:
+    """Tracks listed in a CSV with ``path``, ``bpm`` and ``key`` columns; blank labels are not scored.
+
+    Relative paths are resolved against the CSV's directory.
+    """
+    path = Path(path)
+    tracks = []
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                audio_path = path.parent / row["path"].strip()
+                bpm = row.get("bpm", "").strip()
+                key = row.get("key", "").strip()
+                tracks.append(LabeledTrack(audio_path, float(bpm) if bpm else None, parse_key(key) if key else None))
+            except (KeyError, AttributeError, ValueError) as e:
+                raise ValueError(f"{path}:{line}: {e}") from e
+    return tracks
+
+
+def synthetic_corpus(directory: str | Path, duration: float = 40.0) -> list[LabeledTrack]:
+    """Write one labeled track per Camelot key into ``directory``, tempos cycling through :data:`SYNTHETIC_BPMS`."""
+    import soundfile as sf
+
+    from audio_analyzer.synth import CAMELOT_TO_KEY, labeled_track
+
+    tracks = []
+    for i, camelot in enumerate(CAMELOT_TO_KEY):
+        bpm = SYNTHETIC_BPMS[i % len(SYNTHETIC_BPMS)]
+        path = Path(directory) / f"synthetic_{camelot}_{bpm}bpm.wav"
+        sf.write(path, labeled_track(camelot, bpm, duration, SYNTHETIC_PROGRESSION_SECONDS), SAMPLE_RATE)
+        tracks.append(LabeledTrack(path, float(bpm), camelot))
+    return tracks
+
+
+def configurations(
+    engines: Sequence[str] = ENGINES, modes: Sequence[str] = MODES, excerpt_seconds: float = 15.0
+) -> list[Configuration]:
+    """Every engine in ``engines`` with each of ``modes`` (see :data:`MODES`) that it supports."""
+    configs = []
+    for engine in engines:
+        base = AnalysisOptions(engine=engine)
+        variants = {
+            "full": base,
+            "excerpt": dataclasses.replace(base, excerpt_seconds=excerpt_seconds),
+            # Adaptive voting accepts the first profile alone at any confidence
+            "single-profile": dataclasses.replace(base, key_fast_confidence=0.0),
+            "exhaustive-key": dataclasses.replace(base, key_vote="exhaustive"),
+        }
+        if engine == "standard":
+            variants["no-librosa-bpm"] = dataclasses.replace(base, librosa_bpm=False)
+        configs += [Configuration(engine, mode, options) for mode, options in variants.items() if mode in modes]
+        if engine == "lite" and "reduced-rate" in modes:
+            configs.append(Configuration(engine, "reduced-rate", base, REDUCED_SAMPLE_RATE))
+    return configs
+
+
+def analyze_track(path: Path, config: Configuration) -> AnalysisResult:
+    """Analyze a file as ``config`` would in production (without a cache)."""
+    if config.sample_rate == SAMPLE_RATE:
+        return analyze_path(path, "serial", config.options)
+    y = decoder_for(config.options)(path, sr=config.sample_rate)
+    return analyze_signal(y, config.sample_rate, options=config.options)
+
+
+def score_configuration(tracks: Sequence[LabeledTrack], config: Configuration, bpm_tolerance: float = 1.0) -> Score:
+    """Analyze every track with ``config`` and score its BPM and key against the labels.
+
+    The first track is analyzed once untimed beforehand, so that imports and
+    one-off initialization are not charged to the corpus.
+    """
+    try:
+        analyze_track(tracks[0].path, config)
+    except Exception:
+        pass  # The timed run reports it
+
+    bpm_correct = key_correct = failures = 0
+    cpu_seconds = 0.0
+    for track in tracks:
+        start = time.process_time()
+        try:
+            result: AnalysisResult | None = analyze_track(track.path, config)
+        except Exception as e:
+            logger.warning(f"{config.engine}/{config.mode} failed on {track.path}: {e}")
+            result = None
+            failures += 1
+        cpu_seconds += time.process_time() - start
+        if result is None:
+            continue
+        if track.bpm is not None and abs(result["bpm"] - track.bpm) <= bpm_tolerance:
+            bpm_correct += 1
+        if track.key is not None and result["key"] == track.key:
+            key_correct += 1
+
+    bpm_labeled = sum(track.bpm is not None for track in tracks)
+    key_labeled = sum(track.key is not None for track in tracks)
+    return {
+        "engine": config.engine,
+        "mode": config.mode,
+        "options": dataclasses.asdict(config.options),
+        "sample_rate": config.sample_rate,
+        "tracks": len(tracks),
+        "failures": failures,
+        "bpm_accuracy": bpm_correct / bpm_labeled if bpm_labeled else None,
+        "key_accuracy": key_correct / key_labeled if key_labeled else None,
+        "cpu_seconds": cpu_seconds / len(tracks),
+        "pareto": False,
+    }
+
+
+def mark_pareto_front(scores: list[Score]) -> list[Score]:
+    """Set ``pareto`` on the scores no other score dominates; return them sorted by CPU time."""
+
+    def costs(score: Score) -> tuple[float, float, float]:
+        # Lower is better on every axis; unlabeled accuracies tie
+        return (score["cpu_seconds"], -(score["bpm_accuracy"] or 0.0), -(score["key_accuracy"] or 0.0))
+
+    for score in scores:
+        mine = costs(score)
+        score["pareto"] = not any(
+            all(a <= b for a, b in zip(costs(other), mine, strict=True)) and costs(other) != mine
+            for other in scores
+            if other is not score
+        )
+    return sorted(scores, key=lambda score: score["cpu_seconds"])
+
+
+def run_evaluation(
+    tracks: Sequence[LabeledTrack], configs: Iterable[Configuration], bpm_tolerance: float = 1.0
+) -> list[Score]:
+    """Score every configuration on ``tracks``, cheapest first, with the Pareto front marked."""
+    if not tracks:
+        raise ValueError("The corpus is empty")
+    scores = []
+    for config in configs:
+        logger.info(f"Evaluating {config.engine}/{config.mode} on {len(tracks)} tracks")
+        scores.append(score_configuration(tracks, config, bpm_tolerance))
+    return mark_pareto_front(scores)
+
+
+def format_table(scores: Iterable[Score]) -> str:
+    """The scores as a fixed-width table, Pareto-optimal configurations starred."""
+
+    def percent(value: float | None) -> str:
+        return "-" if value is None else f"{100 * value:.1f}%"
+
+    lines = [f"{'engine':<10} {'mode':<16} {'bpm acc':>8} {'key acc':>8} {'cpu s/track':>12} {'failed':>7}  pareto"]
+    for score in scores:
+        lines.append(
+            f"{score['engine']:<10} {score['mode']:<16} {percent(score['bpm_accuracy']):>8} "
+            f"{percent(score['key_accuracy']):>8} {score['cpu_seconds']:>12.3f} {score['failures']:>7}  "
+            f"{'*' if score['pareto'] else ''}".rstrip()
+        )
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+"""Coarse audio fingerprints for spotting re-encodes of the same track.
+
+A fingerprint is 128 bits computed from 20 seconds of decoded audio: 32 bits
+of energy contour (is the next segment louder than this one?) and 96 bits of
+coarse chroma (which pitch classes are above the segment median), computed with
+NumPy only so every engine produces the same bits. Both survive
+lossy re-encoding and bitrate changes, so an MP3 and a FLAC of the same master
+land within a few bits of each other, while unrelated tracks differ in about
+half of them.
+
+Similar tracks can still land closer than that (intros in the same key and
+tempo), so a file gets two fingerprints: one of its opening seconds, used to
+find candidates, and one of the middle of the track, which a candidate must
+match too before its result is reused.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict, cast
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from audio_analyzer.main import AnalysisOptions
+
+FINGERPRINT_SAMPLE_RATE = 11025
+FINGERPRINT_SECONDS = 20.0
+FINGERPRINT_BITS = 128
+ENERGY_SEGMENTS = 33  # 32 contour bits
+CHROMA_SEGMENTS = 8  # 8 x 12 pitch-class bits
+
+# Matches must agree on at least ~90% of bits and on duration
+MAX_HAMMING_DISTANCE = 10
+MAX_DURATION_DIFFERENCE = 1.0
+
+# Leading audio quieter than this (relative to the excerpt peak) is skipped so
+# that encoder delay and silent padding do not shift the segment grid.
+SILENCE_THRESHOLD = 1e-3
+
+
+class AudioFingerprint(TypedDict):
+    """Fingerprint bits (hex) of the opening and middle excerpts, plus the track duration."""
+
+    bits: str
+    middle: str
+    duration: float
+
+
+def _audio_start(y: np.ndarray) -> int | None:
+    """Index of the first sample above the silence threshold, or None if ``y`` is silent."""
+    peak = float(np.max(np.abs(y))) if len(y) else 0.0
+    if peak <= 0:
+        return None
+    return int(np.argmax(np.abs(y) > SILENCE_THRESHOLD * peak))
+
+
+def _excerpt_bits(y: np.ndarray, sr: int) -> str:
+    from audio_analyzer.lite import chroma_frames_lite
+
+    energy_segments = np.array_split(y.astype(np.float64) ** 2, ENERGY_SEGMENTS)
+    energies = np.array([segment.mean() for segment in energy_segments])
+    energy_bits = energies[1:] > energies[:-1]
+
+    chroma = chroma_frames_lite(y, sr)
+    chroma_segments = np.array([segment.mean(axis=0) for segment in np.array_split(chroma, CHROMA_SEGMENTS)])
+    chroma_bits = chroma_segments > np.median(chroma_segments, axis=1, keepdims=True)
+
+    bits = np.concatenate([energy_bits, chroma_bits.ravel()])
+    return np.packbits(bits).tobytes().hex()
+
+
+def fingerprint_signal(y: np.ndarray, sr: int = FINGERPRINT_SAMPLE_RATE) -> str | None:
+    """Return the 128-bit fingerprint of a mono signal as hex, or None if it is too short or silent."""
+    start = _audio_start(y)
+    if start is None:
+        return None
+    y = y[start : start + int(FINGERPRINT_SECONDS * sr)]
+    if len(y) < int(FINGERPRINT_SECONDS * sr):
+        return None
+    return _excerpt_bits(y, sr)
+
+
+def _decoder(options: "AnalysisOptions | None") -> tuple[Callable[..., np.ndarray], Callable[[str], float]]:
+    """Excerpt decoding and duration probing for ``options.engine``; librosa is only imported outside ``lite``."""
+    if options is not None and options.engine == "lite":
+        from audio_analyzer.lite import _decode, file_duration
+
+        return _decode, file_duration
+
+    import librosa
+
+    def decode(path: str, sr: int, offset: float, duration: float) -> np.ndarray:
+        y, _ = librosa.load(path, sr=sr, mono=True, offset=offset, duration=duration)
+        return np.asarray(y)
+
+    return decode, lambda path: float(librosa.get_duration(path=path))
+
+
+def compute_fingerprint(audio_path: str | Path, options: "AnalysisOptions | None" = None) -> AudioFingerprint | None:
+    """Fingerprint a file by decoding only two excerpts at a low sample rate, with the decoder of ``options.engine``."""
+    import warnings
+
+    warnings.filterwarnings("ignore")
+    sr = FINGERPRINT_SAMPLE_RATE
+    decode, probe_duration = _decoder(options)
+
+    # Decode a little more than needed so leading silence can be skipped
+    y = decode(str(audio_path), sr, 0.0, FINGERPRINT_SECONDS + 10)
+    bits = fingerprint_signal(y, sr)
+    if bits is None:
+        return None
+    duration = probe_duration(str(audio_path))
+
+    # The middle excerpt is placed relative to where the audio starts, so that
+    # encoder padding shifts both copies of a track alike
+    start = cast(int, _audio_start(y)) / sr
+    offset = start + max(0.0, (duration - start - FINGERPRINT_SECONDS) / 2)
+    middle = decode(str(audio_path), sr, offset, FINGERPRINT_SECONDS)
+    return {"bits": bits, "middle": _excerpt_bits(middle, sr), "duration": duration}
+
+
+def hamming_distances(bits: str, candidates: list[str]) -> np.ndarray:
+    """Number of differing bits between ``bits`` and each candidate fingerprint."""
+    if not candidates:
+        return np.zeros(0, dtype=np.int64)
+    target = np.frombuffer(bytes.fromhex(bits), dtype=np.uint8)
+    others = np.frombuffer(bytes.fromhex("".join(candidates)), dtype=np.uint8).reshape(len(candidates), -1)
+    return np.asarray(np.unpackbits(others ^ target, axis=1).sum(axis=1))
@@ -0,0 +1,182 @@
+"""The ``lite`` engine: every stage with NumPy and SciPy only.
+
+Essentia and librosa take seconds to import, which dominates short-lived
+jobs (serverless functions, one-file containers). This engine never imports
+either of them:
+
+* decoding: memory-mapped PCM (:mod:`audio_analyzer.pcm`) or libsndfile
+  through ``soundfile``, resampled with :func:`scipy.signal.resample_poly`
+* BPM: autocorrelation of a spectral-flux onset envelope
+  (:func:`audio_analyzer.clips.tempo_from_envelopes`)
+* key: summed chroma matched against the key templates of
+  :mod:`audio_analyzer.tonal`, one result per template (``key_profiles`` may
+  name templates; the default Essentia profiles select all of them)
+* energy and vocals: the standard engine's stages
+
+The output has the standard engine's structure. BPM and key come from simpler
+estimators, so they can differ from it on hard material.
+"""
+
+import math
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import numpy as np
+
+from audio_analyzer.clips import tempo_from_envelopes
+from audio_analyzer.main import (
+    ONSET_HOP_LENGTH,
+    SAMPLE_RATE,
+    AnalysisOptions,
+    energy_stage,
+    run_stage,
+    skip_settled_profiles,
+    vocals_stage,
+    vote_key,
+)
+from audio_analyzer.metrics import AUDIO_SECONDS, REGISTRY, stage_timer
+from audio_analyzer.threads import fft_workers
+from audio_analyzer.tonal import estimate_keys, template_profiles
+
+ONSET_FRAME_SIZE = 2048
+CHROMA_FRAME_SIZE = 4096
+CHROMA_HOP_SIZE = 2048
+
+# Pitches outside this range are mostly bass rumble or overtones
+CHROMA_MIN_HZ = 55.0
+CHROMA_MAX_HZ = 5000.0
+
+# Frames transformed per FFT call, bounding the spectrogram held in memory
+FRAMES_PER_CHUNK = 512
+
+
+def load_audio_lite(
+    audio_path: str | Path | BinaryIO,
+    sr: int = SAMPLE_RATE,
+    offset: float = 0.0,
+    duration: float | None = None,
+) -> np.ndarray:
+    """Decode to a mono float32 signal at ``sr``, like :func:`~audio_analyzer.main.load_audio` but without librosa.
+
+    Formats are those of the installed libsndfile (WAV, AIFF, FLAC, OGG, and
+    MP3 from libsndfile 1.1).
+    """
+    with stage_timer("decode"):
+        y = _decode(audio_path, sr, offset, duration)
+    REGISTRY.observe(AUDIO_SECONDS, len(y) / sr)
+    return y
+
+
+def _decode(audio_path: str | Path | BinaryIO, sr: int, offset: float, duration: float | None) -> np.ndarray:
+    import soundfile as sf
+
+    if not hasattr(audio_path, "read"):
+        from audio_analyzer.pcm import load_pcm
+
+        pcm = load_pcm(str(audio_path), sr, offset=offset, duration=duration)
+        if pcm is not None:
+            return pcm
+
+    source = audio_path if hasattr(audio_path, "read") else str(audio_path)
+    with sf.SoundFile(source) as f:
+        native_sr = f.samplerate
+        start = min(f.frames, int(round(offset * native_sr))) if offset else 0
+        if start:
+            f.seek(start)
+        frames = -1 if duration is None else int(round(duration * native_sr))
+        data = f.read(frames, dtype="float32", always_2d=True)
+    y = data.mean(axis=1, dtype=np.float32) if data.shape[1] > 1 else data[:, 0]
+    if native_sr != sr:
+        from scipy.signal import resample_poly
+
+        common = math.gcd(sr, native_sr)
+        y = resample_poly(y, sr // common, native_sr // common)
+    return np.ascontiguousarray(y, dtype=np.float32)
+
+
+def file_duration(audio_path: str | Path) -> float:
+    """Duration in seconds from the file header, through libsndfile."""
+    import soundfile as sf
+
+    return float(sf.info(str(audio_path)).duration)
+
+
+def _power_frames(y: np.ndarray, frame_size: int, hop_size: int) -> Iterator[np.ndarray]:
+    """Yield Hann-windowed power spectra of the centered frames of ``y``, ``FRAMES_PER_CHUNK`` frames at a time."""
+    from scipy.fft import rfft
+    from scipy.signal import get_window
+
+    padded = np.pad(y.astype(np.float32, copy=False), frame_size // 2)
+    n_frames = 1 + (len(padded) - frame_size) // hop_size if len(padded) >= frame_size else 0
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame_size)[::hop_size][:n_frames]
+    window = get_window("hann", frame_size).astype(np.float32)
+    for start in range(0, n_frames, FRAMES_PER_CHUNK):
+        yield np.abs(rfft(frames[start : start + FRAMES_PER_CHUNK] * window, axis=1, workers=fft_workers())) ** 2
+
+
+def onset_envelope_lite(y: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Spectral flux: mean rectified increase of log-compressed magnitudes, one value per ``ONSET_HOP_LENGTH``."""
+    flux: list[np.ndarray] = []
+    previous: np.ndarray | None = None
+    for power in _power_frames(y, ONSET_FRAME_SIZE, ONSET_HOP_LENGTH):
+        compressed = np.log1p(1000.0 * np.sqrt(power))
+        # The first frame has nothing before it and gets zero flux
+        stacked = np.vstack([compressed[:1] if previous is None else previous, compressed])
+        flux.append(np.maximum(np.diff(stacked, axis=0), 0.0).mean(axis=1))
+        previous = compressed[-1:]
+    return np.concatenate(flux) if flux else np.zeros(0)
+
+
+def chroma_frames_lite(y: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Spectral power of each frame summed into the 12 pitch classes (C first), tuned to A440; shape ``(frames, 12)``."""
+    freqs = np.fft.rfftfreq(CHROMA_FRAME_SIZE, 1 / sr)
+    in_range = (freqs >= CHROMA_MIN_HZ) & (freqs <= CHROMA_MAX_HZ)
+    pitch_classes = (np.round(12 * np.log2(freqs[in_range] / 440.0)).astype(np.int64) + 9) % 12
+    mapping = np.zeros((len(freqs), 12))
+    mapping[np.flatnonzero(in_range), pitch_classes] = 1.0
+
+    chroma = [power @ mapping for power in _power_frames(y, CHROMA_FRAME_SIZE, CHROMA_HOP_SIZE)]
+    return np.concatenate(chroma) if chroma else np.zeros((0, 12))
+
+
+def chroma_lite(y: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Chroma summed over the whole signal (see :func:`chroma_frames_lite`)."""
+    return np.asarray(chroma_frames_lite(y, sr).sum(axis=0))
+
+
+def bpm_stage_lite(y: np.ndarray, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """BPM and a 0-1 periodicity confidence from the onset-envelope autocorrelation."""
+    [bpm], [confidence] = tempo_from_envelopes(onset_envelope_lite(y, sr)[None, :], sr, ONSET_HOP_LENGTH)
+    return {"bpm": float(bpm), "bpm_confidence": float(confidence), "_librosa_bpm": None}
+
+
+def key_stage_lite(y: np.ndarray, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """Key voted over the template profiles, with the standard engine's adaptive voting."""
+    [key_results] = estimate_keys(chroma_lite(y, sr)[None, :], template_profiles(options.key_profiles))
+    key_results = skip_settled_profiles(key_results, options)
+    final_key, final_key_raw, key_confidence = vote_key(key_results)
+    return {
+        "key": final_key,
+        "key_raw": final_key_raw,
+        "key_confidence": float(key_confidence),
+        "key_profiles": key_results,
+    }
+
+
+# Energy and vocals are NumPy/SciPy already, so the standard stages are shared
+LITE_STAGES = {
+    "bpm": bpm_stage_lite,
+    "key": key_stage_lite,
+    "energy": energy_stage,
+    "vocals": vocals_stage,
+}
+
+
+def run_lite(y: np.ndarray, sr: int, stages: Sequence[str], options: AnalysisOptions) -> dict[str, dict[str, Any]]:
+    """Run the named stages of the lite engine on a decoded signal; return each stage's output by name."""
+    outputs = {}
+    for name in stages:
+        with stage_timer(name):
+            outputs[name] = run_stage(name, y, sr, options, LITE_STAGES)
+    return outputs
@@ -1,12 +1,27 @@
 import json
 import logging
 import sys
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TypedDict, cast
+from typing import TYPE_CHECKING, Any, BinaryIO, TypedDict, cast
 
 import click
 import numpy as np
 
+from audio_analyzer.metrics import (
+    AUDIO_SECONDS,
+    CACHE_HITS,
+    CACHE_MISSES,
+    REGISTRY,
+    count_fallback,
+    stage_timer,
+)
+
+if TYPE_CHECKING:
+    from audio_analyzer.cache import PcmCache, ResultCache
+    from audio_analyzer.energy import EnergyResult
+
 # Configure logging to stderr so stdout is clean for JSON
 logging.basicConfig(level=logging.INFO, stream=sys.stderr, format="%(message)s")
 logger = logging.getLogger("audio-analyzer")
@@ -15,10 +30,11 @@ logger = logging.getLogger("audio-analyzer")
 class KeyResult(TypedDict):
     """Structure for key extraction results."""
 
-    key: str  # Camelot notation (e.g., "8B")
-    key_raw: str  # Raw key (e.g., "C major")
-    confidence: float
+    key: str | None  # Camelot notation (e.g., "8B"); None if skipped
+    key_raw: str | None  # Raw key (e.g., "C major"); None if skipped
+    confidence: float | None
     profile: str | None
+    skipped: bool  # True when adaptive voting decided the key without this profile
 
 
 def pitch_to_camelot(pitch_class: int, mode: int) -> str | None:
@@ -64,250 +80,1024 @@ def pitch_to_camelot(pitch_class: int, mode: int) -> str | None:
     return camelot_map.get((pitch_class, mode))
 
 
-@click.group()
-def cli():
-    """Audio Analyzer CLI - Detect BPM, Key, Energy, and Vocals."""
-    pass
+SAMPLE_RATE = 44100
+ONSET_HOP_LENGTH = 512
+KEY_PROFILES = ("edma", "bgate", "temperley")
 
+# Key name -> pitch class. Essentia spells Eb, Ab and Bb with flats and the
+# other black keys with sharps, so both spellings are listed.
+KEY_PITCH_CLASSES = {
+    "C": 0,
+    "C#": 1,
+    "Db": 1,
+    "D": 2,
+    "D#": 3,
+    "Eb": 3,
+    "E": 4,
+    "F": 5,
+    "F#": 6,
+    "Gb": 6,
+    "G": 7,
+    "G#": 8,
+    "Ab": 8,
+    "A": 9,
+    "A#": 10,
+    "Bb": 10,
+    "B": 11,
+}
 
-@cli.command()
-@click.argument("audio_path", type=click.Path(exists=True, path_type=Path))
-def analyze(audio_path: Path):
-    """Analyze audio file and output JSON results."""
-    try:
-        # Suppress warnings
-        import warnings
 
-        import essentia.standard as es
-        import librosa
-        from scipy.fft import rfft, rfftfreq
-
-        warnings.filterwarnings("ignore")
-
-        # Load audio using librosa
-        # Use 44.1kHz mono for consistent analysis
-        sr = 44100
-        y, _ = librosa.load(str(audio_path), sr=sr, mono=True)
-
-        # Optimizations: Ensure float32 for Essentia
-        y = y.astype(np.float32)
-
-        # 1. BPM Detection ----------------------------------------------------
-        # Librosa BPM (multi-segment for stability)
-        segment_length = min(30 * sr, len(y) // 3)
-        librosa_tempos = []
-
-        for i in range(3):
-            start = i * segment_length
-            end = start + segment_length
-            if end <= len(y):
-                segment = y[start:end]
-                # librosa's type hints can be tricky, cast return to float
-                tempo = librosa.beat.beat_track(y=segment, sr=sr)[0]
-                bpm = float(tempo)
-
-                # Fix octave errors (normalize to 80-160 - typical DJ tempo range)
-                if bpm > 0:
-                    while bpm < 80:
-                        bpm = bpm * 2
-                    while bpm > 160:
-                        bpm = bpm / 2
-                librosa_tempos.append(bpm)
-
-        _librosa_bpm = round(np.median(librosa_tempos)) if librosa_tempos else 120  # noqa: F841
-
-        # Essentia BPM (RhythmExtractor2013 - best for electronic)
-        rhythm_extractor = es.RhythmExtractor2013(method="multifeature")
-        essentia_bpm, _, beats_confidence, _, _ = rhythm_extractor(y)
-        essentia_bpm = float(essentia_bpm)
-
-        # Apply octave correction to Essentia
-        if essentia_bpm > 0:
-            while essentia_bpm < 80:
-                essentia_bpm = essentia_bpm * 2
-            while essentia_bpm > 160:
-                essentia_bpm = essentia_bpm / 2
-        essentia_bpm = round(essentia_bpm)
-
-        # Prefer Essentia
-        final_bpm = float(essentia_bpm)
-        bpm_confidence = min(1.0, float(beats_confidence) / 10.0)
-
-        # 2. Key Detection - Multi-profile Voting ------------------------------
-        from collections import Counter
-
-        key_mapping = {
-            "C": 0,
-            "C#": 1,
-            "D": 2,
-            "D#": 3,
-            "E": 4,
-            "F": 5,
-            "F#": 6,
-            "G": 7,
-            "G#": 8,
-            "A": 9,
-            "A#": 10,
-            "B": 11,
-        }
-
-        profiles = ["edma", "bgate", "temperley"]
-        key_results: list[KeyResult] = []
-
-        if hasattr(es, "KeyExtractor"):
-            # Standard Essentia builds might only support default or require specific config
-            # We try multiple profileTypes. If profileType is not supported in the
-            # installed python bindings (depends on version), we might need fallback.
-            # However, standard KeyExtractor(profileType=...) is common.
-
-            for profile in profiles:
-                try:
-                    extractor = es.KeyExtractor(profileType=profile)
-                    key_name, scale, strength = extractor(y)
-
-                    pitch = key_mapping.get(key_name, 0)
-                    mode = 1 if scale == "major" else 0
-                    camelot = pitch_to_camelot(pitch, mode) or "8A"
-                    key_raw = f"{key_name} {scale}"
-
-                    key_results.append(
-                        {
-                            "profile": profile,
-                            "key": camelot,
-                            "key_raw": key_raw,
-                            "confidence": float(strength),
-                        }
-                    )
-                except Exception as e:
-                    logger.warning(f"Key profile {profile} failed: {e}")
-
-        # If no results (e.g. all failed), use default
-        if not key_results:
+class _AnalysisScope(TypedDict, total=False):
+    # Only present for excerpt-first analysis: stage name -> "excerpt" or "full"
+    analysis_scope: dict[str, str]
+
+
+class StageStatus(TypedDict):
+    """Outcome of one stage in a result."""
+
+    status: str  # "ok" or "failed"
+    error: str | None  # "ExceptionType: message" when failed; the stage's fields then hold neutral defaults
+
+
+class AnalysisResult(_AnalysisScope):
+    """Structure of the JSON document emitted by ``analyze``."""
+
+    bpm: float
+    key: str
+    key_raw: str
+    energy: int
+    has_vocals: bool
+    bpm_confidence: float
+    key_confidence: float
+    key_profiles: list[KeyResult]
+    loudness_lufs: float | None
+    loudness_range: float | None
+    rms_db: float | None
+    stage_status: dict[str, StageStatus]  # By stage name: "bpm", "key", "energy", "vocals"
+
+
+def load_audio(
+    audio_path: str | Path | BinaryIO,
+    sr: int = SAMPLE_RATE,
+    offset: float = 0.0,
+    duration: float | None = None,
+) -> np.ndarray:
+    """Decode an audio file (path or binary file object) to a mono float32 signal at ``sr``.
+
+    ``offset`` and ``duration`` (seconds) decode only part of the file.
+    """
+    with stage_timer("decode"):
+        y = _decode(audio_path, sr, offset, duration)
+    REGISTRY.observe(AUDIO_SECONDS, len(y) / sr)
+    return y
+
+
+def _decode(audio_path: str | Path | BinaryIO, sr: int, offset: float, duration: float | None) -> np.ndarray:
+    import warnings
+
+    import librosa
+
+    warnings.filterwarnings("ignore")
+
+    if not hasattr(audio_path, "read"):
+        from audio_analyzer.pcm import load_pcm
+
+        # Uncompressed WAV/AIFF already at the analysis rate is memory-mapped instead of decoded
+        pcm = load_pcm(cast(str | Path, audio_path), sr, offset=offset, duration=duration)
+        if pcm is not None:
+            return pcm
+
+    # Use 44.1kHz mono for consistent analysis
+    source = audio_path if hasattr(audio_path, "read") else str(audio_path)
+    y, _ = librosa.load(source, sr=sr, mono=True, offset=offset, duration=duration)
+
+    # Optimizations: Ensure float32 for Essentia
+    return y.astype(np.float32)
+
+
+def fold_bpm(bpm: float) -> float:
+    """Fix octave errors by folding the tempo into 80-160 (typical DJ tempo range)."""
+    if bpm > 0:
+        while bpm < 80:
+            bpm = bpm * 2
+        while bpm > 160:
+            bpm = bpm / 2
+    return bpm
+
+
+def onset_envelope(y: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Compute the onset strength envelope of the whole signal (one frame per ``ONSET_HOP_LENGTH`` samples)."""
+    import librosa
+
+    return librosa.onset.onset_strength(y=y, sr=sr, hop_length=ONSET_HOP_LENGTH)
+
+
+def detect_bpm(
+    y: np.ndarray, sr: int = SAMPLE_RATE, onset_env: np.ndarray | None = None, cross_check: bool = True
+) -> tuple[float, float, float | None]:
+    """Return ``(bpm, confidence, librosa_bpm)`` for the signal.
+
+    ``bpm`` comes from Essentia; ``librosa_bpm`` is an independent estimate
+    (median over up to three segments, None for very short signals) used as a
+    cross-check. Without ``cross_check`` it is not computed and is None.
+
+    ``onset_env`` may be passed in when the caller already computed it with
+    :func:`onset_envelope`; otherwise it is computed here.
+    """
+    import essentia.standard as es
+
+    librosa_bpm = librosa_segment_bpm(y, sr, onset_env) if cross_check else None
+
+    # Essentia BPM (RhythmExtractor2013 - best for electronic)
+    rhythm_extractor = es.RhythmExtractor2013(method="multifeature")
+    essentia_bpm, _, beats_confidence, _, _ = rhythm_extractor(y)
+
+    # Apply octave correction to Essentia
+    essentia_bpm = round(fold_bpm(float(essentia_bpm)))
+
+    # Prefer Essentia
+    final_bpm = float(essentia_bpm)
+    bpm_confidence = min(1.0, float(beats_confidence) / 10.0)
+    return final_bpm, bpm_confidence, librosa_bpm
+
+
+def librosa_segment_bpm(y: np.ndarray, sr: int = SAMPLE_RATE, onset_env: np.ndarray | None = None) -> float | None:
+    """Median librosa tempo over up to three segments of up to 30 s (None for very short signals)."""
+    import librosa
+
+    # One onset envelope for the whole signal; each segment's tempo is estimated
+    # from a slice of it instead of re-running the mel spectrogram per segment.
+    if onset_env is None:
+        onset_env = onset_envelope(y, sr)
+    segment_length = min(30 * sr, len(y) // 3)
+    segment_frames = segment_length // ONSET_HOP_LENGTH
+    librosa_tempos = []
+
+    for i in range(3):
+        start = i * segment_length
+        end = start + segment_length
+        if end <= len(y) and segment_frames > 0:
+            segment_env = onset_env[i * segment_frames : (i + 1) * segment_frames]
+            # librosa returns a one-element array
+            tempo = librosa.feature.tempo(onset_envelope=segment_env, sr=sr, hop_length=ONSET_HOP_LENGTH)
+            librosa_tempos.append(fold_bpm(float(tempo[0])))
+
+    return float(round(np.median(librosa_tempos))) if librosa_tempos else None
+
+
+def key_to_camelot(key_name: str, scale: str) -> tuple[str, str]:
+    """Convert an Essentia ``(key, scale)`` pair to ``(camelot, key_raw)``."""
+    pitch = KEY_PITCH_CLASSES.get(key_name, 0)
+    mode = 1 if scale == "major" else 0
+    camelot = pitch_to_camelot(pitch, mode) or "8A"
+    return camelot, f"{key_name} {scale}"
+
+
+def vote_key(key_results: list[KeyResult]) -> tuple[str, str, float]:
+    """Combine per-profile key results into ``(camelot, key_raw, confidence)``.
+
+    Skipped profiles, and profiles that found no key, do not vote; without any
+    votes the key is "8A" with zero confidence.
+    """
+    from collections import Counter
+
+    key_results = [r for r in key_results if r["key"] is not None]
+
+    # Voting Logic
+    # 1. Count occurrences
+    counts = Counter(r["key"] for r in key_results)
+    most_common = counts.most_common()  # [(key, count), ...]
+
+    final_key = "8A"
+    final_key_raw = "A minor"
+    key_confidence = 0.0
+
+    if most_common:
+        # Cast for mypy since most_common can return Generic types
+        top_key = cast(str, most_common[0][0])
+        count = cast(int, most_common[0][1])
+
+        # Case A: Majority (2 or 3 agree)
+        if count >= 2:
+            final_key = top_key
+            # Avg confidence of matching results
+            matches = [r for r in key_results if r["key"] == top_key]
+            key_confidence = sum(float(cast(float, r["confidence"])) for r in matches) / len(matches)
+            # Use raw key from first matching profile
+            final_key_raw = cast(str, matches[0]["key_raw"])
+
+        # Case B: All differ (1, 1, 1) -> Take highest confidence
+        else:
+            best_result = max(key_results, key=lambda x: float(cast(float, x["confidence"])))
+            final_key = cast(str, best_result["key"])
+            final_key_raw = cast(str, best_result["key_raw"])
+            key_confidence = float(cast(float, best_result["confidence"]))
+
+    return final_key, final_key_raw, key_confidence
+
+
+def key_vote_decided(key_results: list[KeyResult], remaining: int, fast_confidence: float | None = None) -> bool:
+    """Whether the voted key can no longer change, whatever the ``remaining`` profiles return.
+
+    A key backed by 2+ profiles wins outright, so once its lead exceeds the
+    number of profiles still to run the vote is settled. With
+    ``fast_confidence``, a first profile at least that confident is accepted alone.
+    """
+    from collections import Counter
+
+    evaluated = [r for r in key_results if r["key"] is not None]
+    if not evaluated:
+        return False
+    if (
+        fast_confidence is not None
+        and len(evaluated) == 1
+        and cast(float, evaluated[0]["confidence"]) >= fast_confidence
+    ):
+        return True
+    counts = [count for _, count in Counter(r["key"] for r in evaluated).most_common()]
+    leader = counts[0]
+    runner_up = counts[1] if len(counts) > 1 else 0
+    return leader >= 2 and leader > runner_up + remaining
+
+
+def skip_settled_profiles(key_results: list[KeyResult], options: "AnalysisOptions") -> list[KeyResult]:
+    """Mark the profiles an adaptive vote would not have run as skipped.
+
+    For engines that compute every profile at once: results are voted on in
+    order, as in :func:`detect_key`, so the reported profiles match.
+    """
+    if options.key_vote != "adaptive":
+        return key_results
+    voted: list[KeyResult] = []
+    decided = False
+    for index, result in enumerate(key_results):
+        if decided:
+            voted.append(
+                {"profile": result["profile"], "key": None, "key_raw": None, "confidence": None, "skipped": True}
+            )
+            continue
+        voted.append(result)
+        decided = key_vote_decided(voted, len(key_results) - index - 1, options.key_fast_confidence)
+    return voted
+
+
+def detect_key(
+    y: np.ndarray,
+    profiles: Sequence[str] = KEY_PROFILES,
+    adaptive: bool = True,
+    fast_confidence: float | None = None,
+    strict: bool = False,
+) -> tuple[str, str, float, list[KeyResult]]:
+    """Return ``(camelot, key_raw, confidence, per_profile_results)`` using multi-profile voting.
+
+    Profiles run in the given order. With ``adaptive`` voting, profiles left
+    once the vote is settled (see :func:`key_vote_decided`) are not run and
+    are reported with ``skipped: True``. When no profile (nor the default
+    extractor) succeeds, the key is "8A" with zero confidence, or with
+    ``strict`` the last error is raised.
+    """
+    import essentia.standard as es
+
+    key_results: list[KeyResult] = []
+
+    if hasattr(es, "KeyExtractor"):
+        # Standard Essentia builds might only support default or require specific config
+        # We try multiple profileTypes. If profileType is not supported in the
+        # installed python bindings (depends on version), we might need fallback.
+        # However, standard KeyExtractor(profileType=...) is common.
+
+        decided = False
+        for index, profile in enumerate(profiles):
+            if decided:
+                key_results.append(
+                    {"profile": profile, "key": None, "key_raw": None, "confidence": None, "skipped": True}
+                )
+                continue
             try:
-                extractor = es.KeyExtractor()
+                extractor = es.KeyExtractor(profileType=profile)
                 key_name, scale, strength = extractor(y)
-                pitch = key_mapping.get(key_name, 0)
-                mode = 1 if scale == "major" else 0
-                camelot = pitch_to_camelot(pitch, mode) or "8A"
-                key_raw = f"{key_name} {scale}"
+
+                camelot, key_raw = key_to_camelot(key_name, scale)
+
                 key_results.append(
                     {
+                        "profile": profile,
                         "key": camelot,
                         "key_raw": key_raw,
                         "confidence": float(strength),
-                        "profile": None,
-                    }
-                )
-            except Exception:
-                key_results.append(
-                    {
-                        "key": "8A",
-                        "key_raw": "A minor",
-                        "confidence": 0.0,
-                        "profile": None,
+                        "skipped": False,
                     }
                 )
+            except Exception as e:
+                logger.warning(f"Key profile {profile} failed: {e}")
+                count_fallback("key", e)
+            if adaptive:
+                decided = key_vote_decided(key_results, len(profiles) - index - 1, fast_confidence)
 
-        # Voting Logic
-        # 1. Count occurrences
-        counts = Counter(r["key"] for r in key_results)
-        most_common = counts.most_common()  # [(key, count), ...]
-
-        final_key = "8A"
-        final_key_raw = "A minor"
-        key_confidence = 0.0
-
-        if most_common:
-            # Cast for mypy since most_common can return Generic types
-            top_key = cast(str, most_common[0][0])
-            count = cast(int, most_common[0][1])
-
-            # Case A: Majority (2 or 3 agree)
-            if count >= 2:
-                final_key = top_key
-                # Avg confidence of matching results
-                matches = [r for r in key_results if r["key"] == top_key]
-                key_confidence = sum(float(r["confidence"]) for r in matches) / len(matches)
-                # Use raw key from first matching profile
-                final_key_raw = cast(str, matches[0]["key_raw"])
-
-            # Case B: All differ (1, 1, 1) -> Take highest confidence
-            else:
-                best_result = max(key_results, key=lambda x: float(x["confidence"]))
-                final_key = cast(str, best_result["key"])
-                final_key_raw = cast(str, best_result["key_raw"])
-                key_confidence = float(best_result["confidence"])
-
-        # 3. Energy Detection -------------------------------------------------
+    # If no results (e.g. all failed), use default
+    if not any(not r["skipped"] for r in key_results):
         try:
-            energy_extractor = es.Energy()
-            energy_values = []
-            frame_size = 2048
-            hop_size = 1024
-
-            for i in range(0, len(y) - frame_size, hop_size):
-                frame = y[i : i + frame_size]
-                energy_values.append(energy_extractor(frame))
-
-            if energy_values:
-                # Percentile-based normalization
-                p95 = np.percentile(energy_values, 95)
-                p999 = np.percentile(energy_values, 99.9)
-                raw_energy = min(1.0, p95 / (p999 + 0.001))
-                final_energy = int(raw_energy * 100)
-            else:
-                final_energy = 50
-        except Exception:
-            final_energy = 50
-
-        # 4. Vocals Detection -------------------------------------------------
+            extractor = es.KeyExtractor()
+            key_name, scale, strength = extractor(y)
+            camelot, key_raw = key_to_camelot(key_name, scale)
+            key_results.append(
+                {
+                    "key": camelot,
+                    "key_raw": key_raw,
+                    "confidence": float(strength),
+                    "profile": None,
+                    "skipped": False,
+                }
+            )
+        except Exception as e:
+            if strict:
+                raise
+            count_fallback("key", e)
+            key_results.append(
+                {
+                    "key": "8A",
+                    "key_raw": "A minor",
+                    "confidence": 0.0,
+                    "profile": None,
+                    "skipped": False,
+                }
+            )
+
+    final_key, final_key_raw, key_confidence = vote_key(key_results)
+    return final_key, final_key_raw, key_confidence, key_results
+
+
+def detect_energy(y: np.ndarray, sr: int = SAMPLE_RATE, strict: bool = False) -> "EnergyResult":
+    """Return the energy score (0-100) plus loudness and dynamics measures, in one pass.
+
+    On failure the score is a neutral 50 without measures, or with ``strict`` the error is raised.
+    """
+    from audio_analyzer.energy import measure_energy
+
+    try:
+        return measure_energy(y, sr)
+    except Exception as e:
+        if strict:
+            raise
+        count_fallback("energy", e)
+        return {"energy": 50, "loudness_lufs": None, "loudness_range": None, "rms_db": None}
+
+
+def detect_vocals(y: np.ndarray, sr: int = SAMPLE_RATE, strict: bool = False) -> bool:
+    """Return whether the signal's spectrum suggests vocal presence (False on failure, unless ``strict``)."""
+    from scipy.fft import rfft, rfftfreq
+
+    from audio_analyzer.threads import fft_workers
+
+    try:
+        frame_size = 4096
+        hop_size = 2048
+        max_frames = 100  # Decide from the first frames with non-bass energy
+        chunk_frames = 128  # Frames per batched FFT
+        freqs = rfftfreq(frame_size, 1 / sr)
+
+        vocal_low = 200
+        vocal_high = 4000
+        vocal_mask = (freqs >= vocal_low) & (freqs <= vocal_high)
+        low_mask = freqs < vocal_low
+
+        n_frames = len(range(0, len(y) - frame_size, hop_size))
+        if n_frames == 0:
+            return False
+        frames = np.lib.stride_tricks.sliding_window_view(y, frame_size)[::hop_size][:n_frames]
+
+        vocal_ratios: list[float] = []
+        # Batched FFTs (parallel across ``fft_workers``), stopping once enough frames are in
+        for start in range(0, n_frames, chunk_frames):
+            power = np.abs(rfft(frames[start : start + chunk_frames], axis=1, workers=fft_workers())) ** 2
+
+            vocal_energy = power[:, vocal_mask].sum(axis=1)
+            total_energy = power.sum(axis=1)
+            low_energy = power[:, low_mask].sum(axis=1)
+            non_bass_energy = total_energy - low_energy
+
+            valid = (total_energy > 0) & (non_bass_energy > 0)
+            ratios = vocal_energy[valid] / non_bass_energy[valid]
+            vocal_ratios.extend(ratios[: max_frames - len(vocal_ratios)].tolist())
+            if len(vocal_ratios) >= max_frames:
+                break
+
+        if vocal_ratios:
+            avg_vocal_ratio = sum(vocal_ratios) / len(vocal_ratios)
+            return bool(avg_vocal_ratio > 0.70)
+        return False
+
+    except Exception as e:
+        if strict:
+            raise
+        count_fallback("vocals", e)
+        return False
+
+
+@dataclass(frozen=True)
+class AnalysisOptions:
+    """Settings that change analysis results, passed to every stage (and pickled to worker processes)."""
+
+    key_profiles: tuple[str, ...] = KEY_PROFILES  # Evaluation order for key voting
+    key_vote: str = "adaptive"  # "adaptive" stops once the vote is settled; "exhaustive" runs every profile
+    key_fast_confidence: float | None = None  # Accept the first profile alone at or above this confidence
+    excerpt_seconds: float | None = None  # Analyze this much from the middle first; None analyzes the full track
+    refine_bpm_confidence: float = 0.15  # Below this, BPM is re-run on the full track (excerpt mode only)
+    refine_key_confidence: float = 0.6  # Below this, key is re-run on the full track (excerpt mode only)
+    engine: str = "standard"  # "standard" stage by stage; "streaming" one Essentia network; "lite" NumPy/SciPy only
+    librosa_bpm: bool = True  # Cross-check Essentia's BPM with librosa's (standard engine only)
+
+
+def bpm_stage(y: np.ndarray, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """Stage 1: BPM and its confidence."""
+    final_bpm, bpm_confidence, librosa_bpm = detect_bpm(y, sr, cross_check=options.librosa_bpm)
+    # "_librosa_bpm" is only read by excerpt-first refinement; assemble_result drops it
+    return {"bpm": final_bpm, "bpm_confidence": float(bpm_confidence), "_librosa_bpm": librosa_bpm}
+
+
+def key_stage(y: np.ndarray, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """Stage 2: key via multi-profile voting, plus the per-profile results."""
+    final_key, final_key_raw, key_confidence, key_results = detect_key(
+        y,
+        profiles=options.key_profiles,
+        adaptive=options.key_vote == "adaptive",
+        fast_confidence=options.key_fast_confidence,
+        strict=True,
+    )
+    return {
+        "key": final_key,
+        "key_raw": final_key_raw,
+        "key_confidence": float(key_confidence),
+        "key_profiles": key_results,
+    }
+
+
+def energy_stage(y: np.ndarray, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """Stage 3: energy score, loudness and dynamics."""
+    return dict(detect_energy(y, sr, strict=True))
+
+
+def vocals_stage(y: np.ndarray, sr: int, options: AnalysisOptions) -> dict[str, Any]:
+    """Stage 4: vocal presence."""
+    return {"has_vocals": bool(detect_vocals(y, sr, strict=True))}
+
+
+# Independent stages: each reads only the decoded signal and returns its slice of the result
+STAGES: dict[str, Callable[[np.ndarray, int, AnalysisOptions], dict[str, Any]]] = {
+    "bpm": bpm_stage,
+    "key": key_stage,
+    "energy": energy_stage,
+    "vocals": vocals_stage,
+}
+
+# Bump a stage's version whenever its output for the same audio and options can
+# change; cached outputs of the other stages stay valid (see ResultCache.get_stage)
+STAGE_VERSIONS = {
+    "bpm": 1,
+    "key": 1,
+    "energy": 1,
+    "vocals": 1,
+}
+
+# The AnalysisOptions fields each stage reads; its cached outputs are keyed on
+# these alone, so changing another stage's options keeps them valid. Add a field
+# here when a stage starts reading it.
+STAGE_OPTIONS: dict[str, tuple[str, ...]] = {
+    "bpm": ("engine", "librosa_bpm"),
+    "key": ("engine", "key_profiles", "key_vote", "key_fast_confidence"),
+    "energy": ("engine",),
+    "vocals": ("engine",),
+}
+
+# Output of a stage that failed, alongside its "_<stage>_error" (see run_stage)
+STAGE_DEFAULTS: dict[str, dict[str, Any]] = {
+    "bpm": {"bpm": 0.0, "bpm_confidence": 0.0, "_librosa_bpm": None},
+    "key": {"key": "8A", "key_raw": "A minor", "key_confidence": 0.0, "key_profiles": []},
+    "energy": {"energy": 50, "loudness_lufs": None, "loudness_range": None, "rms_db": None},
+    "vocals": {"has_vocals": False},
+}
+
+STAGE_EXECUTORS = ["serial", "thread", "process"]
+
+# "streaming" is implemented in audio_analyzer.network, "lite" in audio_analyzer.lite
+ENGINES = ["standard", "streaming", "lite"]
+
+# Speed modes of the evaluate command (see audio_analyzer.evaluate)
+EVALUATION_MODES = ["full", "excerpt", "single-profile", "exhaustive-key", "no-librosa-bpm", "reduced-rate"]
+
+# Excerpt BPM estimates further apart than this count as disagreeing
+BPM_AGREEMENT_TOLERANCE = 2.0
+
+
+def run_stage(
+    name: str,
+    y: np.ndarray,
+    sr: int,
+    options: AnalysisOptions,
+    stages: Mapping[str, Callable[[np.ndarray, int, AnalysisOptions], dict[str, Any]]] = STAGES,
+) -> dict[str, Any]:
+    """Run one stage; a stage that raises returns :data:`STAGE_DEFAULTS` plus ``_<name>_error`` instead.
+
+    The rest of the track is still analyzed, and the error surfaces in the
+    result's ``stage_status`` rather than as a plausible-looking value.
+    """
+    try:
+        return stages[name](y, sr, options)
+    except Exception as e:
+        return stage_failure(name, e)
+
+
+def stage_failure(name: str, error: Exception) -> dict[str, Any]:
+    """Log and count a stage's exception; return its :data:`STAGE_DEFAULTS` plus ``_<name>_error``.
+
+    For engines that compute stages without :func:`run_stage`.
+    """
+    message = f"{type(error).__name__}: {error}"
+    logger.warning(f"Stage {name} failed: {message}")
+    count_fallback(name, error)
+    return {**STAGE_DEFAULTS[name], f"_{name}_error": message}
+
+
+def stage_status(partials: dict[str, Any]) -> dict[str, StageStatus]:
+    """Status of every stage from merged outputs: failed where a ``_<stage>_error`` is set."""
+    status: dict[str, StageStatus] = {}
+    for name in STAGES:
+        error = partials.get(f"_{name}_error")
+        status[name] = {"status": "ok" if error is None else "failed", "error": error}
+    return status
+
+
+def failed_stages(result: AnalysisResult) -> list[str]:
+    """Stages a result reports as failed (none for results without ``stage_status``)."""
+    return [name for name, status in result.get("stage_status", {}).items() if status["status"] == "failed"]
+
+
+def assemble_result(partials: dict[str, Any]) -> AnalysisResult:
+    """Order merged stage outputs as the ``analyze`` JSON document."""
+    return {
+        "bpm": partials["bpm"],
+        "key": partials["key"],
+        "key_raw": partials["key_raw"],
+        "energy": partials["energy"],
+        "has_vocals": partials["has_vocals"],
+        "bpm_confidence": partials["bpm_confidence"],
+        "key_confidence": partials["key_confidence"],
+        "key_profiles": partials["key_profiles"],
+        "loudness_lufs": partials["loudness_lufs"],
+        "loudness_range": partials["loudness_range"],
+        "rms_db": partials["rms_db"],
+        "stage_status": stage_status(partials),
+    }
+
+
+def run_stage_outputs(
+    y: np.ndarray, sr: int, stages: Sequence[str], stage_executor: str, options: AnalysisOptions
+) -> dict[str, dict[str, Any]]:
+    """Run the named stages on a decoded signal; return each stage's output by name.
+
+    The streaming engine runs all of them in one network and the lite engine
+    one after another, so ``stage_executor`` does not apply to either.
+    """
+    if options.engine == "streaming":
+        from audio_analyzer.network import run_network
+
+        return run_network(y, sr, stages, options)
+    if options.engine == "lite":
+        from audio_analyzer.lite import run_lite
+
+        return run_lite(y, sr, stages, options)
+    if stage_executor == "serial":
+        outputs = {}
+        for name in stages:
+            with stage_timer(name):
+                outputs[name] = run_stage(name, y, sr, options)
+        return outputs
+
+    from audio_analyzer.concurrency import run_stages
+
+    return run_stages(y, sr, list(stages), stage_executor, options)
+
+
+def run_stage_partials(
+    y: np.ndarray, sr: int, stages: Sequence[str], stage_executor: str, options: AnalysisOptions
+) -> dict[str, Any]:
+    """Run the named stages on a decoded signal and merge their outputs."""
+    return _merge_outputs(run_stage_outputs(y, sr, stages, stage_executor, options))
+
+
+def _merge_outputs(outputs: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    partials: dict[str, Any] = {}
+    for output in outputs.values():
+        partials.update(output)
+    return partials
+
+
+def decoder_for(options: AnalysisOptions) -> Callable[..., np.ndarray]:
+    """The decoding function for ``options.engine``, called like :func:`load_audio`.
+
+    The lite engine decodes through libsndfile so that librosa is never imported.
+    """
+    if options.engine == "lite":
+        from audio_analyzer.lite import load_audio_lite
+
+        return load_audio_lite
+    return load_audio
+
+
+def run_file_outputs(
+    audio_path: str | Path, stages: Sequence[str], options: AnalysisOptions
+) -> dict[str, dict[str, Any]]:
+    """Run the named stages of the streaming engine straight from a file, which its loader decodes block by block."""
+    from audio_analyzer.network import run_network
+
+    return run_network(audio_path, SAMPLE_RATE, stages, options)
+
+
+def analyze_signal(
+    y: np.ndarray,
+    sr: int = SAMPLE_RATE,
+    stage_executor: str = "serial",
+    options: AnalysisOptions | None = None,
+) -> AnalysisResult:
+    """Run every analysis stage on a decoded mono signal.
+
+    ``stage_executor`` selects how the independent stages are scheduled:
+    ``serial`` runs them one after another, ``thread`` on a thread pool, and
+    ``process`` on a process pool reading the signal from shared memory (use
+    this one for Essentia stages, which hold the GIL).
+    """
+    import warnings
+
+    warnings.filterwarnings("ignore")
+    options = options or AnalysisOptions()
+
+    if options.excerpt_seconds is not None:
+        duration = len(y) / sr
+        return analyze_progressive(
+            lambda offset, length: y[int(offset * sr) : int((offset + length) * sr) if length else None],
+            duration,
+            sr,
+            stage_executor,
+            options,
+        )
+
+    return assemble_result(run_stage_partials(y, sr, list(STAGES), stage_executor, options))
+
+
+def stages_to_refine(partials: dict[str, Any], options: AnalysisOptions) -> list[str]:
+    """Stages whose excerpt estimate is too uncertain to keep.
+
+    BPM is refined when its confidence is below ``refine_bpm_confidence`` or
+    when Essentia and librosa disagree on the excerpt; key when its
+    confidence is below ``refine_key_confidence`` or the profiles that ran
+    did not all agree.
+    """
+    refine = []
+    librosa_bpm = partials.get("_librosa_bpm")
+    if partials["bpm_confidence"] < options.refine_bpm_confidence or (
+        librosa_bpm is not None and abs(librosa_bpm - partials["bpm"]) > BPM_AGREEMENT_TOLERANCE
+    ):
+        refine.append("bpm")
+    evaluated = {r["key"] for r in partials["key_profiles"] if not r["skipped"]}
+    if partials["key_confidence"] < options.refine_key_confidence or len(evaluated) > 1:
+        refine.append("key")
+    return refine
+
+
+def analyze_progressive(
+    decode: Callable[[float, float | None], np.ndarray],
+    duration: float,
+    sr: int,
+    stage_executor: str,
+    options: AnalysisOptions,
+) -> AnalysisResult:
+    """Analyze an excerpt from the middle of the track, escalating to the full track only where needed.
+
+    ``decode(offset, length)`` returns the signal from ``offset`` seconds for
+    ``length`` seconds (``None``: to the end). Tracks shorter than twice the
+    excerpt are analyzed in full straight away. When BPM or key needs
+    refining (see :func:`stages_to_refine`), the full track is decoded and
+    those stages re-run on it, along with the cheap energy and vocal stages.
+    The result's ``analysis_scope`` records which signal each stage saw.
+    """
+    excerpt_seconds = cast(float, options.excerpt_seconds)
+    scope = dict.fromkeys(STAGES, "full")
+    if duration < 2 * excerpt_seconds:
+        partials = run_stage_partials(decode(0.0, None), sr, list(STAGES), stage_executor, options)
+    else:
+        # The middle of a track is the least likely part to be a beatless intro or outro
+        offset = (duration - excerpt_seconds) / 2
+        partials = run_stage_partials(decode(offset, excerpt_seconds), sr, list(STAGES), stage_executor, options)
+        refine = stages_to_refine(partials, options)
+        if refine:
+            logger.info(f"Refining {', '.join(refine)} on the full track")
+            full_stages = [*refine, "energy", "vocals"]
+            partials.update(run_stage_partials(decode(0.0, None), sr, full_stages, stage_executor, options))
+            scope = {name: "full" if name in full_stages else "excerpt" for name in STAGES}
+        else:
+            scope = dict.fromkeys(STAGES, "excerpt")
+
+    result = assemble_result(partials)
+    result["analysis_scope"] = scope
+    return result
+
+
+def analyze_path(
+    audio_path: str | Path,
+    stage_executor: str,
+    options: AnalysisOptions,
+    pcm_cache: "PcmCache | None" = None,
+    digest: str | None = None,
+) -> AnalysisResult:
+    """Decode and analyze a file, decoding only an excerpt first when ``options.excerpt_seconds`` is set.
+
+    With a ``pcm_cache`` the whole file is decoded once and later runs read the
+    cached signal (``digest`` is the file's content digest, if already known).
+    """
+    if pcm_cache is not None:
+        y = pcm_cache.load(audio_path, SAMPLE_RATE, digest, decoder_for(options))
+        return analyze_signal(y, stage_executor=stage_executor, options=options)
+    if options.excerpt_seconds is None:
+        if options.engine == "streaming":
+            return assemble_result(_merge_outputs(run_file_outputs(audio_path, list(STAGES), options)))
+        return analyze_signal(decoder_for(options)(audio_path), stage_executor=stage_executor, options=options)
+
+    decode = decoder_for(options)
+    if options.engine == "lite":
+        from audio_analyzer.lite import file_duration
+
+        duration = file_duration(audio_path)
+    else:
+        import librosa
+
+        duration = float(librosa.get_duration(path=str(audio_path)))
+    return analyze_progressive(
+        lambda offset, length: decode(audio_path, offset=offset, duration=length),
+        duration,
+        SAMPLE_RATE,
+        stage_executor,
+        options,
+    )
+
+
+def analyze_file(
+    audio_path: str | Path,
+    cache: "ResultCache | None" = None,
+    stage_executor: str = "serial",
+    options: AnalysisOptions | None = None,
+    pcm_cache: "PcmCache | None" = None,
+) -> AnalysisResult:
+    """Decode and analyze an audio file, returning the ``analyze`` result structure.
+
+    With a ``cache``, an identical file (same bytes) returns its stored result,
+    and a re-encode of an already analyzed track is recognized by its
+    fingerprint and reuses that track's result; only misses run the pipeline.
+    With a ``pcm_cache``, misses read previously decoded audio instead of decoding again.
+    Misses also reuse per-stage outputs (see :func:`analyze_stages_cached`), so
+    an upgrade that changes one stage only re-runs that stage. Results with a
+    failed stage, and failed stage outputs, are not stored.
+    """
+    options = options or AnalysisOptions()
+    if cache is None:
+        return analyze_path(audio_path, stage_executor, options, pcm_cache)
+
+    from audio_analyzer.cache import file_digest
+    from audio_analyzer.fingerprint import compute_fingerprint
+
+    digest = file_digest(audio_path)
+    cached = cache.get(digest, options)
+    if cached is not None:
+        REGISTRY.inc(CACHE_HITS, {"kind": "result"})
+        return cached
+
+    fingerprint = compute_fingerprint(audio_path, options)
+    if fingerprint is not None:
+        similar = cache.find_similar(fingerprint, options)
+        if similar is not None:
+            # Store under this file's digest too so the next lookup is an exact hit
+            cache.put(digest, options, similar)
+            REGISTRY.inc(CACHE_HITS, {"kind": "fingerprint"})
+            return similar
+
+    REGISTRY.inc(CACHE_MISSES, {"kind": "result"})
+
+    if options.excerpt_seconds is None:
+        result = analyze_stages_cached(audio_path, cache, digest, stage_executor, options, pcm_cache)
+    else:
+        # Excerpt-first outputs depend on which stages escalated, so they are cached whole only
+        result = analyze_path(audio_path, stage_executor, options, pcm_cache, digest)
+    if not failed_stages(result):
+        cache.put(digest, options, result, fingerprint)
+    return result
+
+
+def analyze_stages_cached(
+    audio_path: str | Path,
+    cache: "ResultCache",
+    digest: str,
+    stage_executor: str,
+    options: AnalysisOptions,
+    pcm_cache: "PcmCache | None" = None,
+) -> AnalysisResult:
+    """Analyze a file, reusing each stage's cached output at its current :data:`STAGE_VERSIONS` entry.
+
+    Only stages without a cached output run (the file is not decoded at all
+    when every stage hits), and their outputs are stored for next time.
+    """
+    outputs: dict[str, dict[str, Any]] = {}
+    for name in STAGES:
+        cached = cache.get_stage(digest, options, name)
+        if cached is not None:
+            outputs[name] = cached
+            REGISTRY.inc(CACHE_HITS, {"kind": "stage"})
+    missing = [name for name in STAGES if name not in outputs]
+    REGISTRY.inc(CACHE_MISSES, {"kind": "stage"}, len(missing))
+    if missing:
+        if pcm_cache is not None:
+            y = pcm_cache.load(audio_path, SAMPLE_RATE, digest, decoder_for(options))
+            computed = run_stage_outputs(y, SAMPLE_RATE, missing, stage_executor, options)
+        elif options.engine == "streaming":
+            computed = run_file_outputs(audio_path, missing, options)
+        else:
+            y = decoder_for(options)(audio_path)
+            computed = run_stage_outputs(y, SAMPLE_RATE, missing, stage_executor, options)
+        for name, output in computed.items():
+            if f"_{name}_error" not in output:
+                cache.put_stage(digest, options, name, output)
+        outputs.update(computed)
+
+    return assemble_result(_merge_outputs({name: outputs[name] for name in STAGES}))
+
+
+def rerun_stages(
+    result: AnalysisResult, y: np.ndarray, sr: int, stages: Sequence[str], options: AnalysisOptions
+) -> AnalysisResult:
+    """Re-run ``stages`` of a previous result on the decoded track, keeping the other stages' outputs and status."""
+    partials: dict[str, Any] = dict(result)
+    for name, status in result.get("stage_status", {}).items():
+        if name not in stages:
+            partials[f"_{name}_error"] = status["error"]
+    partials.update(run_stage_partials(y, sr, stages, "serial", options))
+    rerun = assemble_result(partials)
+    if "analysis_scope" in result:
+        rerun["analysis_scope"] = {**result["analysis_scope"], **dict.fromkeys(stages, "full")}
+    return rerun
+
+
+@click.group()
+def cli():
+    """Audio Analyzer CLI - Detect BPM, Key, Energy, and Vocals."""
+    pass
+
+
+def analysis_option_flags(command: Callable[..., Any]) -> Callable[..., Any]:
+    """Click options shared by every command that runs the analysis pipeline."""
+    flags = [
+        click.option(
+            "--key-profiles",
+            default=",".join(KEY_PROFILES),
+            show_default=True,
+            help="Comma-separated Essentia key profiles, in evaluation order.",
+        ),
+        click.option(
+            "--key-vote",
+            type=click.Choice(["adaptive", "exhaustive"]),
+            default="adaptive",
+            show_default=True,
+            help="Stop running key profiles once the vote is settled, or always run all of them.",
+        ),
+        click.option(
+            "--key-fast-confidence",
+            type=click.FloatRange(0.0, 1.0),
+            default=None,
+            help="Accept the first key profile alone when its confidence reaches this value.",
+        ),
+        click.option(
+            "--excerpt",
+            "excerpt_seconds",
+            type=click.FloatRange(min=5.0),
+            default=None,
+            help="Analyze this many seconds from the middle first; re-run BPM/key on the full track only if unsure.",
+        ),
+        click.option(
+            "--refine-bpm-confidence",
+            type=click.FloatRange(0.0, 1.0),
+            default=AnalysisOptions.refine_bpm_confidence,
+            show_default=True,
+            help="With --excerpt, re-run BPM on the full track below this confidence.",
+        ),
+        click.option(
+            "--refine-key-confidence",
+            type=click.FloatRange(0.0, 1.0),
+            default=AnalysisOptions.refine_key_confidence,
+            show_default=True,
+            help="With --excerpt, re-run key on the full track below this confidence.",
+        ),
+        click.option(
+            "--engine",
+            type=click.Choice(ENGINES),
+            default=AnalysisOptions.engine,
+            show_default=True,
+            help="Run each stage's Essentia algorithms on the decoded array, all stages as one streaming network, "
+            "or NumPy/SciPy-only estimators that skip the Essentia and librosa imports.",
+        ),
+        click.option(
+            "--librosa-bpm/--no-librosa-bpm",
+            default=AnalysisOptions.librosa_bpm,
+            show_default=True,
+            help="Cross-check Essentia's BPM with librosa's; with --excerpt, disagreement re-runs BPM on the full track.",
+        ),
+    ]
+    for flag in reversed(flags):
+        command = flag(command)
+    return command
+
+
+def metrics_flags(command: Callable[..., Any]) -> Callable[..., Any]:
+    """Click options that export operational metrics from long-running commands."""
+    flags = [
+        click.option(
+            "--metrics-file",
+            type=click.Path(dir_okay=False, path_type=Path),
+            default=None,
+            help="Keep Prometheus metrics (tracks, failures, cache hits, stage latencies) in this file.",
+        ),
+        click.option(
+            "--metrics-port",
+            type=click.IntRange(0, 65535),
+            default=None,
+            help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics.",
+        ),
+    ]
+    for flag in reversed(flags):
+        command = flag(command)
+    return command
+
+
+def options_from_flags(key_profiles: str, **flags: Any) -> AnalysisOptions:
+    """Build :class:`AnalysisOptions` from the values of :func:`analysis_option_flags`."""
+    profiles = tuple(p.strip() for p in key_profiles.split(",") if p.strip())
+    if not profiles:
+        raise click.BadParameter("at least one key profile is required", param_hint="--key-profiles")
+    if flags.get("engine") == "lite":
+        from audio_analyzer.tonal import template_profiles
+
         try:
-            frame_size = 4096
-            hop_size = 2048
-            freqs = rfftfreq(frame_size, 1 / sr)
-
-            vocal_low = 200
-            vocal_high = 4000
-            vocal_mask = (freqs >= vocal_low) & (freqs <= vocal_high)
-            low_mask = freqs < vocal_low
-
-            vocal_ratios: list[float] = []
-
-            for i in range(0, len(y) - frame_size, hop_size):
-                frame = y[i : i + frame_size]
-                spectrum = np.abs(rfft(frame))
-
-                vocal_energy = np.sum(spectrum[vocal_mask] ** 2)
-                total_energy = np.sum(spectrum**2)
-                low_energy = np.sum(spectrum[low_mask] ** 2)
-
-                if total_energy > 0:
-                    non_bass_energy = total_energy - low_energy
-                    if non_bass_energy > 0:
-                        vocal_ratio = vocal_energy / non_bass_energy
-                        if len(vocal_ratios) < 100:
-                            vocal_ratios.append(vocal_ratio)
-
-            if vocal_ratios:
-                avg_vocal_ratio = sum(vocal_ratios) / len(vocal_ratios)
-                has_vocals = avg_vocal_ratio > 0.70
-            else:
-                has_vocals = False
-
-        except Exception:
-            has_vocals = False
-
-        # Output JSON
-        result = {
-            "bpm": final_bpm,
-            "key": final_key,
-            "key_raw": final_key_raw,
-            "energy": final_energy,
-            "has_vocals": bool(has_vocals),
-            "bpm_confidence": float(bpm_confidence),
-            "key_confidence": float(key_confidence),
-            "key_profiles": key_results,
-        }
+            template_profiles(profiles)  # The lite engine matches key templates, not Essentia profiles
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--key-profiles") from e
+    return AnalysisOptions(key_profiles=profiles, **flags)
+
+
+@cli.command()
+@click.argument("audio_path", type=click.Path(exists=True, allow_dash=True, path_type=Path))
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Reuse and store results here, matching identical files and re-encodes of analyzed tracks.",
+)
+@click.option(
+    "--stage-executor",
+    type=click.Choice(STAGE_EXECUTORS),
+    default="serial",
+    show_default=True,
+    help="Run the BPM, key, energy and vocal stages one after another, on threads, or on processes.",
+)
+@click.option(
+    "--pcm-cache",
+    "pcm_cache_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Keep decoded audio here so re-analysis of the same file skips decoding.",
+)
+@analysis_option_flags
+def analyze(audio_path: Path, cache_dir: Path | None, stage_executor: str, pcm_cache_dir: Path | None, **flags: Any):
+    """Analyze audio file and output JSON results.
+
+    Pass ``-`` to read an encoded file from stdin.
+    """
+    options = options_from_flags(**flags)
+    try:
+        if str(audio_path) == "-":
+            import io
+
+            y = decoder_for(options)(io.BytesIO(sys.stdin.buffer.read()))
+            result = analyze_signal(y, stage_executor=stage_executor, options=options)
+        else:
+            cache = None
+            if cache_dir is not None:
+                from audio_analyzer.cache import ResultCache
+
+                cache = ResultCache(cache_dir)
+            pcm_cache = None
+            if pcm_cache_dir is not None:
+                from audio_analyzer.cache import PcmCache
+
+                pcm_cache = PcmCache(pcm_cache_dir)
+            result = analyze_file(
+                audio_path, cache=cache, stage_executor=stage_executor, options=options, pcm_cache=pcm_cache
+            )
         click.echo(json.dumps(result))
 
     except Exception as e:
@@ -317,6 +1107,404 @@ def analyze(audio_path: Path):
         sys.exit(1)
 
 
+@cli.command()
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, path_type=Path))
+@click.option("--workers", type=click.IntRange(min=1), default=None, help="Worker processes [default: CPU count].")
+@click.option(
+    "--split-longer-than",
+    type=click.FloatRange(min=60.0),
+    default=None,
+    help="Split files longer than this many seconds into windows analyzed in parallel and merged.",
+)
+@click.option(
+    "--split-window",
+    type=click.FloatRange(min=30.0),
+    default=600.0,
+    show_default=True,
+    help="Window length in seconds for split files.",
+)
+@click.option(
+    "--clips-shorter-than",
+    type=click.FloatRange(min=0.0),
+    default=None,
+    help="Analyze files of at most this many seconds in vectorized groups (for samples and one-shots).",
+)
+@click.option(
+    "--clip-batch-size",
+    type=click.IntRange(min=1),
+    default=64,
+    show_default=True,
+    help="Clips per vectorized group.",
+)
+@click.option(
+    "--shard", default=None, help="Only analyze shard i of N (e.g. 2/4), for splitting a library across machines."
+)
+@click.option(
+    "--shard-by",
+    type=click.Choice(["path", "content"]),
+    default="path",
+    show_default=True,
+    help="Assign files to shards by a hash of their path or of their bytes.",
+)
+@click.option(
+    "--threads-per-worker",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Native (BLAS, OpenMP, FFT) threads per worker [default: CPU count / workers].",
+)
+@click.option(
+    "--memory-budget",
+    default=None,
+    help="Memory for audio in flight across workers, e.g. 8G [default: 3/4 of available memory].",
+)
+@click.option(
+    "--retry-failed-stages",
+    "retry_file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Instead of PATHS, re-run only the failed stages and files of this earlier batch output.",
+)
+@analysis_option_flags
+@metrics_flags
+def batch(
+    paths: tuple[Path, ...],
+    workers: int | None,
+    split_longer_than: float | None,
+    split_window: float,
+    clips_shorter_than: float | None,
+    clip_batch_size: int,
+    shard: str | None,
+    shard_by: str,
+    threads_per_worker: int | None,
+    memory_budget: str | None,
+    retry_file: Path | None,
+    metrics_file: Path | None,
+    metrics_port: int | None,
+    **flags: Any,
+):
+    """Analyze files and directories of audio in parallel, longest first, writing one NDJSON line per file.
+
+    Exits non-zero if any file failed; failures are reported on their own line.
+    With --retry-failed-stages the output is the earlier output with its
+    failures re-run, one line per file.
+    """
+    import os
+
+    from audio_analyzer.batch import (
+        find_audio_files,
+        memory_budgets,
+        parse_shard,
+        parse_size,
+        plan_jobs,
+        plan_retries,
+        read_records,
+        run_batch,
+        select_shard,
+    )
+
+    if (retry_file is None) == (not paths):
+        raise click.UsageError("Pass either PATHS or --retry-failed-stages.")
+    options = options_from_flags(**flags)
+    if clips_shorter_than is not None:
+        from audio_analyzer.tonal import template_profiles
+
+        try:
+            template_profiles(options.key_profiles)  # Clip groups match key templates, not Essentia profiles
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--key-profiles") from e
+    workers = workers or os.cpu_count() or 1
+    try:
+        budget, split_budget = memory_budgets(workers, parse_size(memory_budget) if memory_budget is not None else None)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--memory-budget") from e
+    try:
+        shard_index, shard_count = parse_shard(shard) if shard is not None else (1, 1)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--shard") from e
+
+    from audio_analyzer.metrics import MetricsExporter
+
+    failures = 0
+    exporter = MetricsExporter(metrics_file, metrics_port)
+    try:
+        if retry_file is not None:
+            jobs, complete = plan_retries(read_records(retry_file), split_longer_than, split_window, split_budget)
+            for record in complete:
+                click.echo(json.dumps(record))
+        else:
+            files = find_audio_files(paths)
+            if shard_count > 1:
+                files = select_shard(files, shard_index, shard_count, shard_by)
+            jobs = plan_jobs(files, split_longer_than, split_window, split_budget, clips_shorter_than, clip_batch_size)
+        for record in run_batch(jobs, workers, options, budget, threads_per_worker):
+            if record["error"] is not None:
+                failures += 1
+                logger.error(f"Analysis failed for {record['path']}: {record['error']}")
+            elif failed := failed_stages(cast(AnalysisResult, record["result"])):
+                logger.warning(f"Stages failed for {record['path']}: {', '.join(failed)}")
+            click.echo(json.dumps(record))
+            sys.stdout.flush()
+            exporter.update()
+
+    except Exception as e:
+        logger.error(f"Batch analysis failed: {e}")
+        sys.exit(1)
+    finally:
+        exporter.close()
+    if failures:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Append NDJSON records to this file instead of stdout.",
+)
+@click.option("--workers", type=click.IntRange(min=1), default=1, show_default=True, help="Worker processes.")
+@click.option(
+    "--settle",
+    type=click.FloatRange(min=0.0),
+    default=2.0,
+    show_default=True,
+    help="Seconds a file must stay unchanged after its last write before it is analyzed.",
+)
+@click.option("--poll", is_flag=True, help="Rescan the directory instead of using inotify.")
+@click.option(
+    "--poll-interval", type=click.FloatRange(min=0.1), default=1.0, show_default=True, help="Seconds between rescans."
+)
+@click.option("--existing", is_flag=True, help="Also analyze files already in the directory at start-up.")
+@analysis_option_flags
+@metrics_flags
+def watch(
+    directory: Path,
+    output: Path | None,
+    workers: int,
+    settle: float,
+    poll: bool,
+    poll_interval: float,
+    existing: bool,
+    metrics_file: Path | None,
+    metrics_port: int | None,
+    **flags: Any,
+):
+    """Analyze audio files as they are written to DIRECTORY, appending one NDJSON line per file.
+
+    Runs until interrupted. Files are picked up once their writes complete
+    (inotify where available, otherwise polling) and analyzed on warm worker
+    processes.
+    """
+    from audio_analyzer.metrics import MetricsExporter
+    from audio_analyzer.watch import watch_folder
+
+    options = options_from_flags(**flags)
+    try:
+        sink = open(output, "a") if output is not None else sys.stdout
+        # Files arrive sporadically, so the metrics file is rewritten after every record
+        exporter = MetricsExporter(metrics_file, metrics_port, interval=0.0)
+        exporter.update()
+        try:
+            watch_folder(
+                directory,
+                sink,
+                workers,
+                options,
+                settle,
+                poll_interval,
+                poll,
+                existing,
+                on_record=lambda record: exporter.update(),
+            )
+        finally:
+            exporter.close()
+            if output is not None:
+                sink.close()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.error(f"Watch failed: {e}")
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("result_files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def merge(result_files: tuple[Path, ...]):
+    """Combine batch NDJSON outputs (e.g. one per shard) into one line per file, sorted by path.
+
+    Duplicate paths keep a successful result over a failure, otherwise the
+    record from the file listed last.
+    """
+    from audio_analyzer.batch import merge_records, read_records
+
+    try:
+        for record in merge_records(record for path in result_files for record in read_records(path)):
+            click.echo(json.dumps(record))
+    except Exception as e:
+        logger.error(f"Merge failed: {e}")
+        sys.exit(1)
+
+
+@cli.command()
+@click.option(
+    "--annotations",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    multiple=True,
+    help="CSV of path,bpm,key for your own files (key as 8A or A minor; paths relative to the CSV). Repeatable.",
+)
+@click.option(
+    "--synthetic/--no-synthetic",
+    default=True,
+    show_default=True,
+    help="Include generated chord-and-click tracks, one per Camelot key.",
+)
+@click.option(
+    "--synthetic-duration",
+    type=click.FloatRange(min=10.0),
+    default=40.0,
+    show_default=True,
+    help="Seconds per synthetic track.",
+)
+@click.option(
+    "--engine",
+    "engines",
+    type=click.Choice(ENGINES),
+    multiple=True,
+    help="Engine to evaluate; repeatable [default: all].",
+)
+@click.option(
+    "--mode",
+    "modes",
+    type=click.Choice(EVALUATION_MODES),
+    multiple=True,
+    help="Speed mode to evaluate; repeatable [default: all].",
+)
+@click.option(
+    "--excerpt",
+    "excerpt_seconds",
+    type=click.FloatRange(min=5.0),
+    default=15.0,
+    show_default=True,
+    help="Excerpt length of the excerpt mode.",
+)
+@click.option(
+    "--bpm-tolerance",
+    type=click.FloatRange(min=0.0),
+    default=1.0,
+    show_default=True,
+    help="Largest BPM error that counts as correct.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print one JSON line per configuration instead of a table.")
+def evaluate(
+    annotations: tuple[Path, ...],
+    synthetic: bool,
+    synthetic_duration: float,
+    engines: tuple[str, ...],
+    modes: tuple[str, ...],
+    excerpt_seconds: float,
+    bpm_tolerance: float,
+    as_json: bool,
+):
+    """Measure BPM and key accuracy against CPU time per track for every engine and speed mode.
+
+    Runs a labeled corpus through each configuration and prints them cheapest
+    first; a * marks the Pareto front (no configuration is both cheaper and
+    at least as accurate).
+    """
+    import tempfile
+
+    from audio_analyzer.evaluate import (
+        configurations,
+        format_table,
+        read_annotations,
+        run_evaluation,
+        synthetic_corpus,
+    )
+
+    try:
+        tracks = [track for path in annotations for track in read_annotations(path)]
+        with tempfile.TemporaryDirectory(prefix="audio-analyzer-eval-") as directory:
+            if synthetic:
+                tracks += synthetic_corpus(directory, synthetic_duration)
+            configs = configurations(engines or ENGINES, modes or EVALUATION_MODES, excerpt_seconds)
+            scores = run_evaluation(tracks, configs, bpm_tolerance)
+    except Exception as e:
+        logger.error(f"Evaluation failed: {e}")
+        sys.exit(1)
+
+    if as_json:
+        for score in scores:
+            click.echo(json.dumps(score))
+    else:
+        click.echo(format_table(scores))
+
+
+@cli.command()
+@click.option(
+    "--format",
+    "input_format",
+    type=click.Choice(["encoded", "s16le", "s32le", "f32le"]),
+    default="encoded",
+    show_default=True,
+    help="Encoded audio (decoded with ffmpeg) or raw interleaved PCM.",
+)
+@click.option(
+    "--sample-rate",
+    type=click.IntRange(min=1),
+    default=SAMPLE_RATE,
+    show_default=True,
+    help="Sample rate of raw PCM input.",
+)
+@click.option(
+    "--channels", type=click.IntRange(min=1), default=1, show_default=True, help="Channel count of raw PCM input."
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5.0,
+    show_default=True,
+    help="Seconds of audio between estimates.",
+)
+@click.option(
+    "--window",
+    type=click.FloatRange(min=0, min_open=True),
+    default=30.0,
+    show_default=True,
+    help="Seconds of audio BPM and key look back over.",
+)
+def stream(input_format: str, sample_rate: int, channels: int, interval: float, window: float):
+    """Analyze audio from stdin incrementally, emitting rolling estimates as NDJSON."""
+    try:
+        from audio_analyzer.stream import RAW_FORMATS, StreamAnalyzer, decode_stream_blocks, read_raw_blocks
+
+        block_frames = 8192
+        if input_format == "encoded":
+            sample_rate = SAMPLE_RATE
+            blocks = decode_stream_blocks(sys.stdin.buffer, sample_rate, block_frames)
+        else:
+            blocks = read_raw_blocks(sys.stdin.buffer, RAW_FORMATS[input_format], channels, block_frames)
+
+        analyzer = StreamAnalyzer(sr=sample_rate, window=window)
+        next_emit = interval
+        emitted_at = 0
+        for block in blocks:
+            analyzer.update(block)
+            if analyzer.samples_seen >= next_emit * sample_rate:
+                click.echo(json.dumps(analyzer.snapshot()))
+                sys.stdout.flush()
+                emitted_at = analyzer.samples_seen
+                while next_emit * sample_rate <= analyzer.samples_seen:
+                    next_emit += interval
+
+        if analyzer.samples_seen != emitted_at:
+            click.echo(json.dumps(analyzer.snapshot()))
+
+    except Exception as e:
+        logger.error(f"Stream analysis failed: {e}")
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     cli()
 # Trigger CI
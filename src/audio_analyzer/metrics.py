@@ -0,0 +1,276 @@
+"""Operational metrics in the Prometheus text exposition format.
+
+Every process keeps its counters and histograms in :data:`REGISTRY`. The
+analysis code records into it as it runs: decode and stage latencies, audio
+seconds decoded, cache hits and misses, and exceptions that a stage swallowed
+in favour of a default value. Batch and watch workers hand what they recorded
+back with each job (see :meth:`MetricsRegistry.take`), and the parent merges
+it and counts analyzed and failed tracks, so the parent's registry covers the
+whole run.
+
+:class:`MetricsExporter` publishes the parent's registry as a file (for the
+node_exporter textfile collector or any scraper that reads files), on a local
+HTTP endpoint, or both. Only the standard library is used.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+TRACKS_ANALYZED = "audio_analyzer_tracks_analyzed_total"
+TRACK_FAILURES = "audio_analyzer_track_failures_total"
+STAGE_FALLBACKS = "audio_analyzer_stage_fallbacks_total"
+CACHE_HITS = "audio_analyzer_cache_hits_total"
+CACHE_MISSES = "audio_analyzer_cache_misses_total"
+STAGE_SECONDS = "audio_analyzer_stage_duration_seconds"
+AUDIO_SECONDS = "audio_analyzer_decoded_audio_seconds"
+
+STAGE_SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+AUDIO_SECONDS_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 3600.0, 7200.0)
+
+# name -> (type, help, histogram buckets)
+METRICS: dict[str, tuple[str, str, tuple[float, ...]]] = {
+    TRACKS_ANALYZED: ("counter", "Tracks (or clips) analyzed successfully.", ()),
+    TRACK_FAILURES: ("counter", "Tracks (or clips) that failed, by exception type.", ()),
+    STAGE_FALLBACKS: ("counter", "Exceptions a stage replaced with its default output, by stage and type.", ()),
+    CACHE_HITS: ("counter", "Result-cache hits: whole results by digest or fingerprint, and single stages.", ()),
+    CACHE_MISSES: ("counter", "Result-cache misses that ran the pipeline.", ()),
+    STAGE_SECONDS: ("histogram", "Wall time of decoding and of each analysis stage.", STAGE_SECONDS_BUCKETS),
+    AUDIO_SECONDS: ("histogram", "Seconds of audio per decode.", AUDIO_SECONDS_BUCKETS),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass
+class _Histogram:
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)  # Per bucket, not cumulative; last entry is +Inf
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def copy(self) -> "_Histogram":
+        return _Histogram(self.buckets, list(self.counts), self.total, self.count)
+
+    def merge(self, other: "_Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts, strict=True)]
+        self.total += other.total
+        self.count += other.count
+
+
+def _labels(labels: dict[str, str] | None) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = ((key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Counters and histograms of the metrics in :data:`METRICS`, keyed by label set; safe to use from threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], _Histogram] = {}
+
+    def inc(self, name: str, labels: dict[str, str] | None = None, value: float = 1.0) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = _Histogram(METRICS[name][2])
+            self._histograms[key].observe(value)
+
+    def value(self, name: str, labels: dict[str, str] | None = None) -> float:
+        """Current value of a counter, or the observation count of a histogram."""
+        key = (name, _labels(labels))
+        with self._lock:
+            if key in self._histograms:
+                return float(self._histograms[key].count)
+            return self._counters.get(key, 0.0)
+
+    def merge(self, other: "MetricsRegistry") -> None:
+        """Add another registry's counts (e.g. one returned by a worker) to this one."""
+        with other._lock:
+            counters = dict(other._counters)
+            histograms = {key: h.copy() for key, h in other._histograms.items()}
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0.0) + value
+            for key, histogram in histograms.items():
+                if key in self._histograms:
+                    self._histograms[key].merge(histogram)
+                else:
+                    self._histograms[key] = histogram
+
+    def take(self) -> "MetricsRegistry":
+        """Move everything recorded so far into a new registry, leaving this one empty."""
+        taken = MetricsRegistry()
+        with self._lock:
+            taken._counters, self._counters = self._counters, {}
+            taken._histograms, self._histograms = self._histograms, {}
+        return taken
+
+    def __getstate__(self) -> tuple[dict, dict]:
+        # Locks don't pickle; workers send their registries to the parent
+        with self._lock:
+            return dict(self._counters), dict(self._histograms)
+
+    def __setstate__(self, state: tuple[dict, dict]) -> None:
+        self._lock = threading.Lock()
+        self._counters, self._histograms = state
+
+    def render(self) -> str:
+        """The registry in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, h.copy()) for key, h in self._histograms.items())
+        lines: list[str] = []
+        for name, (kind, help_text, _) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (metric, labels), value in counters:
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (metric, labels), histogram in histograms:
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip([*histogram.buckets, float("inf")], histogram.counts, strict=True):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels((*labels, ('le', le)))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# This process's metrics
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Record the wall time of the enclosed block as ``stage``'s latency (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - start, {"stage": stage})
+
+
+def count_fallback(stage: str, error: BaseException) -> None:
+    """Count an exception that ``stage`` replaced with its default output."""
+    REGISTRY.inc(STAGE_FALLBACKS, {"stage": stage, "exception": type(error).__name__})
+
+
+def count_track(error: BaseException | None = None) -> None:
+    """Count one analyzed track, or one failed track by the type of ``error``."""
+    if error is None:
+        REGISTRY.inc(TRACKS_ANALYZED)
+    else:
+        REGISTRY.inc(TRACK_FAILURES, {"exception": type(error).__name__})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:  # noqa: N802 (BaseHTTPRequestHandler's method name)
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # Keep scrapes out of the stderr log
+
+
+class MetricsExporter:
+    """Publish a registry to ``path`` (rewritten atomically) and/or on ``http://host:port/metrics``.
+
+    :meth:`update` rewrites the file at most every ``interval`` seconds;
+    :meth:`close` writes it a final time and stops the server.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        port: int | None = None,
+        host: str = "127.0.0.1",
+        interval: float = 1.0,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.interval = interval
+        self.registry = registry
+        self._written = 0.0
+        self._server: ThreadingHTTPServer | None = None
+        if port is not None:
+            handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+            self._server = ThreadingHTTPServer((host, port), handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="audio-analyzer-metrics", daemon=True).start()
+
+    @property
+    def port(self) -> int | None:
+        """The port being served (useful with ``port=0``)."""
+        return None if self._server is None else int(self._server.server_address[1])
+
+    def update(self, force: bool = False) -> None:
+        if self.path is None or (not force and time.monotonic() - self._written < self.interval):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.registry.render())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._written = time.monotonic()
+
+    def close(self) -> None:
+        self.update(force=True)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MetricsExporter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,272 @@
+"""The ``streaming`` engine: every stage as one ``essentia.streaming`` network.
+
+The standard engine calls ``essentia.standard`` algorithms one at a time on
+the whole decoded array, so the signal is traversed (and framed, windowed and
+transformed) once per extractor, and once per key profile. Here a single
+loader feeds every stage's branch, and
+Essentia's scheduler pushes blocks through all of them in one pass:
+
+* key: one streaming KeyExtractor per profile (the algorithm behind the
+  standard engine's, so keys and strengths are identical)
+* BPM: RhythmExtractor2013 on the signal
+* energy: FrameCutter(2048/1024) -> Energy, LoudnessEBUR128 on the signal,
+  and block energies for the RMS level (with the Duration node's length)
+* vocals: FrameCutter(4096/2048) -> Spectrum -> band energies
+
+The framing and key branches hold one frame at a time and their per-frame
+outputs are small. RhythmExtractor2013, however, buffers the whole signal
+before estimating the tempo, so with BPM in the network peak memory still
+grows with track length (about 1.8x that of the other stages alone on a
+10-minute file). A signal that is already decoded is written to a temporary
+WAV for the loader, so it is held in memory in full as well. Outputs are
+post-processed into the same stage outputs as the standard engine.
+"""
+
+import math
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from audio_analyzer.energy import ABSOLUTE_GATE_LUFS, ENERGY_FRAME_SIZE, ENERGY_HOP_SIZE
+from audio_analyzer.main import (
+    AnalysisOptions,
+    KeyResult,
+    fold_bpm,
+    key_to_camelot,
+    skip_settled_profiles,
+    stage_failure,
+    vote_key,
+)
+from audio_analyzer.metrics import AUDIO_SECONDS, REGISTRY, stage_timer
+
+VOCAL_FRAME_SIZE = 4096
+VOCAL_HOP_SIZE = 2048
+VOCAL_MAX_FRAMES = 100
+
+# Non-overlapping blocks whose energies sum to the signal's total energy
+RMS_FRAME_SIZE = 1 << 16
+
+# LoudnessEBUR128 takes stereo; a mono signal on both channels reads 10*log10(2) LU louder
+DUAL_MONO_OFFSET_LU = 10 * math.log10(2)
+
+
+def _key_branch(signal: Any, pool: Any, profiles: Sequence[str]) -> None:
+    import essentia.streaming as ess
+
+    for profile in profiles:
+        key = ess.KeyExtractor(profileType=profile)
+        signal >> key.audio
+        key.key >> (pool, f"key.{profile}.key")
+        key.scale >> (pool, f"key.{profile}.scale")
+        key.strength >> (pool, f"key.{profile}.strength")
+
+
+def _bpm_branch(signal: Any, pool: Any) -> None:
+    import essentia.streaming as ess
+
+    rhythm = ess.RhythmExtractor2013(method="multifeature")
+    signal >> rhythm.signal
+    rhythm.bpm >> (pool, "bpm.bpm")
+    rhythm.confidence >> (pool, "bpm.confidence")
+    for unused in (rhythm.ticks, rhythm.estimates, rhythm.bpmIntervals):
+        unused >> None
+
+
+def _frames_branch(signal: Any, frame_size: int, hop_size: int) -> Any:
+    """Connect a FrameCutter for the standard engine's grid (frames from sample 0); return its frame output.
+
+    The cutter runs with its default centered first frame, which makes frame
+    ``k`` start at sample ``(k - 1) * hop_size`` for these sizes (hop is half
+    the frame); :func:`_full_frames` drops the leading half frame and the
+    zero-padded frames at the end. (Several ``startFromZero`` cutters of
+    different sizes in one network corrupt memory on teardown in Essentia
+    2.1b6.)
+    """
+    import essentia.streaming as ess
+
+    cutter = ess.FrameCutter(frameSize=frame_size, hopSize=hop_size, silentFrames="keep")
+    signal >> cutter.signal
+    return cutter.frame
+
+
+def _full_frames(values: np.ndarray, n_samples: int, frame_size: int, hop_size: int) -> np.ndarray:
+    """Per-frame values of the frames in ``range(0, n_samples - frame_size, hop_size)``, from a centered cutter."""
+    return values[1 : 1 + len(range(0, n_samples - frame_size, hop_size))]
+
+
+def _energy_branch(signal: Any, pool: Any, sr: int) -> None:
+    import essentia.streaming as ess
+
+    energy = ess.Energy()
+    _frames_branch(signal, ENERGY_FRAME_SIZE, ENERGY_HOP_SIZE) >> energy.array
+    energy.energy >> (pool, "energy.frames")
+
+    # Contiguous zero-padded blocks, so their energies add up to the total
+    blocks = ess.Energy()
+    _frames_branch(signal, RMS_FRAME_SIZE, RMS_FRAME_SIZE) >> blocks.array
+    blocks.energy >> (pool, "energy.blocks")
+
+    muxer = ess.StereoMuxer()
+    loudness = ess.LoudnessEBUR128(sampleRate=sr, startAtZero=True)
+    signal >> muxer.left
+    signal >> muxer.right
+    muxer.audio >> loudness.signal
+    loudness.integratedLoudness >> (pool, "energy.integrated")
+    loudness.loudnessRange >> (pool, "energy.range")
+    loudness.momentaryLoudness >> None
+    loudness.shortTermLoudness >> None
+
+
+def _vocals_branch(signal: Any, pool: Any, sr: int) -> None:
+    import essentia.streaming as ess
+
+    # Rectangular frames, as in detect_vocals
+    spectrum = ess.Spectrum(size=VOCAL_FRAME_SIZE)
+    _frames_branch(signal, VOCAL_FRAME_SIZE, VOCAL_HOP_SIZE) >> spectrum.frame
+    bands = {"total": (0.0, sr / 2), "low": (0.0, 200.0), "vocal": (200.0, 4000.0)}
+    for name, (low, high) in bands.items():
+        band = ess.EnergyBand(sampleRate=sr, startCutoffFrequency=low, stopCutoffFrequency=high)
+        spectrum.spectrum >> band.spectrum
+        band.energyBand >> (pool, f"vocals.{name}")
+
+
+def _key_output(pool: Any, options: AnalysisOptions) -> dict[str, Any]:
+    # Every profile was computed in the shared pass; replaying the vote in order
+    # reports the same results as the standard engine
+    key_results: list[KeyResult] = []
+    for profile in options.key_profiles:
+        camelot, key_raw = key_to_camelot(pool[f"key.{profile}.key"], pool[f"key.{profile}.scale"])
+        key_results.append(
+            {
+                "profile": profile,
+                "key": camelot,
+                "key_raw": key_raw,
+                "confidence": float(pool[f"key.{profile}.strength"]),
+                "skipped": False,
+            }
+        )
+    key_results = skip_settled_profiles(key_results, options)
+    final_key, final_key_raw, key_confidence = vote_key(key_results)
+    return {
+        "key": final_key,
+        "key_raw": final_key_raw,
+        "key_confidence": float(key_confidence),
+        "key_profiles": key_results,
+    }
+
+
+def _bpm_output(pool: Any) -> dict[str, Any]:
+    bpm = float(round(fold_bpm(float(pool["bpm.bpm"]))))
+    # No librosa cross-check on this engine, so excerpt refinement relies on confidence alone
+    return {"bpm": bpm, "bpm_confidence": min(1.0, float(pool["bpm.confidence"]) / 10.0), "_librosa_bpm": None}
+
+
+def _values(pool: Any, name: str) -> np.ndarray:
+    return np.asarray(pool[name], dtype=np.float64) if name in pool.descriptorNames() else np.zeros(0)
+
+
+def _energy_output(pool: Any, n_samples: int) -> dict[str, Any]:
+    frames = _full_frames(_values(pool, "energy.frames"), n_samples, ENERGY_FRAME_SIZE, ENERGY_HOP_SIZE)
+    energy = 50
+    if len(frames):
+        p95, p999 = np.percentile(frames, [95, 99.9])
+        energy = int(min(1.0, p95 / (p999 + 0.001)) * 100)
+
+    integrated = float(pool["energy.integrated"]) - DUAL_MONO_OFFSET_LU
+    loudness_range = float(pool["energy.range"])
+    total = float(_values(pool, "energy.blocks").sum())
+    rms = 10 * math.log10(total / n_samples) if n_samples > 0 and total > 0 else None
+    silent = not math.isfinite(integrated) or integrated < ABSOLUTE_GATE_LUFS
+    return {
+        "energy": energy,
+        "loudness_lufs": None if silent else round(integrated, 2),
+        "loudness_range": None if silent else round(loudness_range, 1),
+        "rms_db": None if rms is None else round(rms, 2),
+    }
+
+
+def _vocals_output(pool: Any, n_samples: int) -> dict[str, Any]:
+    def band(name: str) -> np.ndarray:
+        return _full_frames(_values(pool, f"vocals.{name}"), n_samples, VOCAL_FRAME_SIZE, VOCAL_HOP_SIZE)
+
+    total = band("total")
+    non_bass = total - band("low")
+    valid = (total > 0) & (non_bass > 0)
+    ratios = (band("vocal")[valid] / non_bass[valid])[:VOCAL_MAX_FRAMES]
+    return {"has_vocals": bool(len(ratios) and ratios.mean() > 0.70)}
+
+
+def run_network(
+    source: np.ndarray | str | Path, sr: int, stages: Sequence[str], options: AnalysisOptions
+) -> dict[str, dict[str, Any]]:
+    """Run the named stages as one streaming network; return each stage's output by name.
+
+    ``source`` is a file path, which Essentia's loader decodes (and resamples
+    to ``sr``) block by block, or an already decoded mono signal at ``sr``.
+    Decoding happens inside the network, so its latency is recorded as the
+    single ``network`` stage.
+    """
+    if isinstance(source, np.ndarray):
+        import tempfile
+
+        import soundfile as sf
+
+        # VectorInput feeds a network one sample per scheduler step, orders of
+        # magnitude slower than the loader's blocks, so hand the loader a float WAV.
+        # The file is closed before the loader opens it by name (Windows cannot
+        # reopen an open temporary file).
+        with tempfile.TemporaryDirectory(prefix="audio-analyzer-") as directory:
+            path = Path(directory) / "signal.wav"
+            sf.write(path, source, sr, subtype="FLOAT")
+            with stage_timer("network"):
+                outputs, _ = _run_file(path, sr, stages, options)
+            return outputs
+
+    with stage_timer("network"):
+        outputs, n_samples = _run_file(source, sr, stages, options)
+    REGISTRY.observe(AUDIO_SECONDS, n_samples / sr)
+    return outputs
+
+
+def _run_file(
+    path: str | Path, sr: int, stages: Sequence[str], options: AnalysisOptions
+) -> tuple[dict[str, dict[str, Any]], int]:
+    """Stage outputs of the network on a file, and the number of samples it decoded."""
+    import essentia
+    import essentia.streaming as ess
+
+    loader = ess.MonoLoader(filename=str(path), sampleRate=sr)
+    signal = loader.audio
+    pool = essentia.Pool()
+
+    if "key" in stages:
+        _key_branch(signal, pool, options.key_profiles)
+    if "bpm" in stages:
+        _bpm_branch(signal, pool)
+    duration = ess.Duration(sampleRate=sr)
+    signal >> duration.signal
+    duration.duration >> (pool, "duration")
+    if "energy" in stages:
+        _energy_branch(signal, pool, sr)
+    if "vocals" in stages:
+        _vocals_branch(signal, pool, sr)
+    essentia.run(loader)
+
+    n_samples = round(float(pool["duration"]) * sr)
+    outputs: dict[str, dict[str, Any]] = {}
+    for name in stages:
+        # As in run_stage, a stage whose outputs cannot be post-processed falls back alone
+        try:
+            if name == "key":
+                outputs[name] = _key_output(pool, options)
+            elif name == "bpm":
+                outputs[name] = _bpm_output(pool)
+            elif name == "energy":
+                outputs[name] = _energy_output(pool, n_samples)
+            elif name == "vocals":
+                outputs[name] = _vocals_output(pool, n_samples)
+        except Exception as e:
+            outputs[name] = stage_failure(name, e)
+    return outputs, n_samples
@@ -0,0 +1,188 @@
+"""Memory-mapped reading of uncompressed WAV and AIFF files.
+
+For PCM already at the analysis sample rate, decoding is just scaling and
+downmixing, so :func:`load_pcm` maps the sample data with :class:`numpy.memmap`
+and converts it to mono float32 block by block. No full-size multichannel copy
+is made, which is where the generic decode path spends its time and memory on
+large 24-bit masters. Anything else (compressed audio, other sample rates,
+unusual encodings) returns None so the caller falls back to ``librosa.load``.
+"""
+
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+# Frames converted per block: bounds the temporary multichannel float buffer
+PCM_BLOCK_FRAMES = 1 << 16
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Placeholder data chunk sizes written by encoders that cannot seek back
+WAV_UNSET_DATA_SIZES = (0, 0xFFFFFFFF)
+
+
+@dataclass(frozen=True)
+class PcmLayout:
+    """Where and how the interleaved samples of an uncompressed file are stored."""
+
+    data_offset: int  # Byte offset of the first sample
+    frames: int
+    channels: int
+    sample_rate: int
+    sample_width: int  # Bytes per sample
+    kind: str  # "i" signed int, "u" unsigned int (8-bit WAV), "f" float
+    byteorder: str  # "<" or ">"
+
+
+def _read_wav_layout(f, size: int) -> PcmLayout | None:
+    fmt: tuple[int, int, int, int] | None = None  # (format tag, channels, rate, bits)
+    position = 12
+    while position + 8 <= size:
+        f.seek(position)
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"fmt ":
+            body = f.read(chunk_size)
+            tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                tag = struct.unpack("<H", body[24:26])[0]  # First two bytes of the sub-format GUID
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            tag, channels, rate, bits = fmt
+            if tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32):
+                kind = "u" if bits == 8 else "i"
+            elif tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+                kind = "f"
+            else:
+                return None
+            width = bits // 8
+            data_size = min(chunk_size, size - position - 8)  # A truncated file ends early
+            if chunk_size in WAV_UNSET_DATA_SIZES:
+                data_size = size - position - 8  # Streaming writers leave the size unset
+            return PcmLayout(position + 8, data_size // (width * channels), channels, rate, width, kind, "<")
+        position += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _extended_to_float(data: bytes) -> float:
+    """Decode an 80-bit IEEE 754 extended float (AIFF sample rate)."""
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1.0 if exponent & 0x8000 else 1.0
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return float(sign * mantissa * 2.0 ** (exponent - 16383 - 63))
+
+
+def _read_aiff_layout(f, size: int, compressed: bool) -> PcmLayout | None:
+    comm: tuple[int, int, int, float, bytes] | None = None  # (channels, frames, bits, rate, compression)
+    position = 12
+    while position + 8 <= size:
+        f.seek(position)
+        chunk_id, chunk_size = struct.unpack(">4sI", f.read(8))
+        if chunk_id == b"COMM":
+            body = f.read(chunk_size)
+            channels, frames, bits = struct.unpack(">hIh", body[:8])
+            rate = _extended_to_float(body[8:18])
+            compression = body[18:22] if compressed else b"NONE"
+            comm = (channels, frames, bits, rate, compression)
+        elif chunk_id == b"SSND":
+            if comm is None:
+                return None
+            channels, frames, bits, rate, compression = comm
+            ssnd_offset = struct.unpack(">I", f.read(4))[0]
+            byteorder = ">"
+            if compression == b"NONE" and bits in (8, 16, 24, 32):
+                kind = "i"
+            elif compression == b"sowt" and bits in (16, 24, 32):
+                kind, byteorder = "i", "<"
+            elif compression in (b"fl32", b"FL32") and bits == 32:
+                kind = "f"
+            else:
+                return None
+            width = (bits + 7) // 8
+            data_offset = position + 16 + ssnd_offset
+            frames = min(frames, (size - data_offset) // (width * channels))
+            if rate != int(rate):
+                return None
+            return PcmLayout(data_offset, frames, channels, int(rate), width, kind, byteorder)
+        position += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def read_pcm_layout(path: str | Path) -> PcmLayout | None:
+    """Parse a WAV or AIFF header, or return None if the file is not uncompressed PCM we can map."""
+    try:
+        size = Path(path).stat().st_size
+        with open(path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12:
+                return None
+            if header[:4] == b"RIFF" and header[8:] == b"WAVE":
+                return _read_wav_layout(f, size)
+            if header[:4] == b"FORM" and header[8:] in (b"AIFF", b"AIFC"):
+                return _read_aiff_layout(f, size, compressed=header[8:] == b"AIFC")
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+def _to_float(samples: np.ndarray, layout: PcmLayout) -> np.ndarray:
+    """Scale a ``(frames, channels, width)`` byte block or ``(frames, channels)`` sample block to float32."""
+    out: np.ndarray
+    if layout.sample_width == 3:
+        # Assemble 24-bit samples in the top three bytes of an int32, then scale as 32-bit
+        low, mid, high = (0, 1, 2) if layout.byteorder == "<" else (2, 1, 0)
+        ints = (
+            (samples[..., high].astype(np.int32) << 24)
+            | (samples[..., mid].astype(np.int32) << 16)
+            | (samples[..., low].astype(np.int32) << 8)
+        )
+        out = ints.astype(np.float32) / np.float32(2**31)
+    elif layout.kind == "f":
+        out = samples.astype(np.float32)
+    elif layout.kind == "u":
+        out = (samples.astype(np.float32) - 128.0) / np.float32(128.0)
+    else:
+        out = samples.astype(np.float32) / np.float32(2 ** (8 * layout.sample_width - 1))
+    return out
+
+
+def load_pcm(
+    path: str | Path,
+    sr: int,
+    offset: float = 0.0,
+    duration: float | None = None,
+    block_frames: int = PCM_BLOCK_FRAMES,
+) -> np.ndarray | None:
+    """Mono float32 samples of an uncompressed WAV/AIFF file at ``sr``, or None to fall back to decoding.
+
+    ``offset`` and ``duration`` (seconds) select part of the file, as in ``librosa.load``.
+    """
+    layout = read_pcm_layout(path)
+    if layout is None or layout.sample_rate != sr or layout.channels < 1:
+        return None
+    if layout.frames == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    start = min(layout.frames, int(round(offset * sr)))
+    stop = layout.frames if duration is None else min(layout.frames, start + int(round(duration * sr)))
+    if layout.sample_width == 3:
+        data = np.memmap(
+            path, dtype=np.uint8, mode="r", offset=layout.data_offset, shape=(layout.frames, layout.channels, 3)
+        )
+    else:
+        dtype = np.dtype(f"{layout.byteorder}{layout.kind}{layout.sample_width}")
+        data = np.memmap(path, dtype=dtype, mode="r", offset=layout.data_offset, shape=(layout.frames, layout.channels))
+
+    y = np.empty(stop - start, dtype=np.float32)
+    for block_start in range(start, stop, block_frames):
+        block_stop = min(stop, block_start + block_frames)
+        block = _to_float(np.asarray(data[block_start:block_stop]), layout)
+        y[block_start - start : block_stop - start] = block[:, 0] if layout.channels == 1 else block.mean(axis=1)
+    del data
+    return y
@@ -0,0 +1,242 @@
+"""Incremental analysis of audio arriving in blocks (stdin, pipes, live streams).
+
+:class:`StreamAnalyzer` keeps running state per stage instead of re-analyzing
+a growing buffer: a sliding window of onset-strength values for tempo, a
+sliding window of HPCP frames (kept as a running sum) for key, and an
+:class:`~audio_analyzer.energy.EnergyMeter` for energy and loudness.
+"""
+
+import shutil
+import subprocess
+from collections import deque
+from collections.abc import Iterator
+from typing import IO, TypedDict
+
+import numpy as np
+
+from audio_analyzer.energy import EnergyMeter
+from audio_analyzer.main import (
+    KEY_PROFILES,
+    ONSET_HOP_LENGTH,
+    SAMPLE_RATE,
+    KeyResult,
+    fold_bpm,
+    key_to_camelot,
+    vote_key,
+)
+
+# Raw PCM sample formats accepted on stdin -> NumPy dtype
+RAW_FORMATS: dict[str, np.dtype] = {
+    "s16le": np.dtype("<i2"),
+    "s32le": np.dtype("<i4"),
+    "f32le": np.dtype("<f4"),
+}
+
+# Key frames match essentia.standard.KeyExtractor's defaults
+KEY_FRAME_SIZE = 4096
+ONSET_FRAME_SIZE = 2048
+
+
+class StreamSnapshot(TypedDict):
+    """Rolling estimate emitted by the ``stream`` command (one NDJSON line)."""
+
+    time: float  # Seconds of audio consumed so far
+    bpm: float | None
+    key: str | None
+    key_raw: str | None
+    key_confidence: float | None
+    energy: int
+    loudness_lufs: float | None
+    loudness_range: float | None
+    rms_db: float | None
+
+
+class StreamAnalyzer:
+    """Rolling BPM, key and energy estimates over a mono block stream.
+
+    BPM and key describe the last ``window`` seconds so they follow tempo and
+    key changes in a live set; energy and loudness are integrated over
+    everything seen so far, like a programme loudness meter.
+    """
+
+    def __init__(self, sr: int = SAMPLE_RATE, window: float = 30.0):
+        import essentia.standard as es
+        import librosa
+
+        self.sr = sr
+        self.window = window
+        self.samples_seen = 0
+
+        self._energy = EnergyMeter(sr)
+
+        # Tempo: spectral-flux onset strength over log-mel frames
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=ONSET_FRAME_SIZE)
+        self._onset_window = np.hanning(ONSET_FRAME_SIZE + 1)[:-1].astype(np.float32)
+        self._onset_buffer = np.zeros(0, dtype=np.float32)
+        self._previous_log_mel: np.ndarray | None = None
+        self._onsets: deque[float] = deque(maxlen=max(1, int(window * sr / ONSET_HOP_LENGTH)))
+
+        # Key: HPCP per non-overlapping 4096-sample frame, summed over the window
+        self._windowing = es.Windowing(type="hann")
+        self._spectrum = es.Spectrum(size=KEY_FRAME_SIZE)
+        self._peaks = es.SpectralPeaks(
+            orderBy="magnitude",
+            magnitudeThreshold=0.0001,
+            minFrequency=25,
+            maxFrequency=3500,
+            maxPeaks=60,
+            sampleRate=sr,
+        )
+        self._hpcp = es.HPCP(
+            size=12,
+            referenceFrequency=440,
+            bandPreset=False,
+            minFrequency=25,
+            maxFrequency=3500,
+            weightType="cosine",
+            nonLinear=False,
+            windowSize=1.0,
+            sampleRate=sr,
+        )
+        self._keys = {profile: es.Key(profileType=profile, pcpSize=12) for profile in KEY_PROFILES}
+        self._key_buffer = np.zeros(0, dtype=np.float32)
+        self._hpcp_frames: deque[np.ndarray] = deque(maxlen=max(1, int(window * sr / KEY_FRAME_SIZE)))
+        self._hpcp_sum = np.zeros(12, dtype=np.float64)
+
+    def update(self, block: np.ndarray) -> None:
+        """Consume the next block of mono float samples."""
+        block = np.asarray(block, dtype=np.float32).ravel()
+        if block.size == 0:
+            return
+        self.samples_seen += block.size
+        self._energy.update(block)
+        self._update_onsets(block)
+        self._update_hpcp(block)
+
+    def _update_onsets(self, block: np.ndarray) -> None:
+        buffer = np.concatenate([self._onset_buffer, block])
+        n_frames = 0 if len(buffer) < ONSET_FRAME_SIZE else 1 + (len(buffer) - ONSET_FRAME_SIZE) // ONSET_HOP_LENGTH
+        if n_frames:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, ONSET_FRAME_SIZE)[::ONSET_HOP_LENGTH][:n_frames]
+            power = np.abs(np.fft.rfft(frames * self._onset_window, axis=1)) ** 2
+            log_mel = 10 * np.log10(np.maximum(self._mel_basis @ power.T, 1e-10))
+            if self._previous_log_mel is not None:
+                log_mel = np.concatenate([self._previous_log_mel, log_mel], axis=1)
+            flux = np.maximum(0.0, np.diff(log_mel, axis=1)).mean(axis=0)
+            self._onsets.extend(flux.tolist())
+            self._previous_log_mel = log_mel[:, -1:]
+        self._onset_buffer = buffer[n_frames * ONSET_HOP_LENGTH :]
+
+    def _update_hpcp(self, block: np.ndarray) -> None:
+        buffer = np.concatenate([self._key_buffer, block])
+        n_frames = len(buffer) // KEY_FRAME_SIZE
+        for i in range(n_frames):
+            frame = buffer[i * KEY_FRAME_SIZE : (i + 1) * KEY_FRAME_SIZE]
+            frequencies, magnitudes = self._peaks(self._spectrum(self._windowing(frame)))
+            hpcp = np.asarray(self._hpcp(frequencies, magnitudes), dtype=np.float64)
+            if len(self._hpcp_frames) == self._hpcp_frames.maxlen:
+                self._hpcp_sum -= self._hpcp_frames[0]
+            self._hpcp_frames.append(hpcp)
+            self._hpcp_sum += hpcp
+        self._key_buffer = buffer[n_frames * KEY_FRAME_SIZE :]
+
+    def bpm(self) -> float | None:
+        """Tempo over the current window, or None until a few seconds have been seen."""
+        import librosa
+
+        if len(self._onsets) * ONSET_HOP_LENGTH < 4 * self.sr:
+            return None
+        envelope = np.fromiter(self._onsets, dtype=np.float32)
+        tempo = librosa.feature.tempo(onset_envelope=envelope, sr=self.sr, hop_length=ONSET_HOP_LENGTH)
+        return float(round(fold_bpm(float(tempo[0]))))
+
+    def key(self) -> tuple[str, str, float] | None:
+        """Voted ``(camelot, key_raw, confidence)`` over the current window, or None before any tonal content."""
+        if not self._hpcp_frames or not self._hpcp_sum.any():
+            return None
+        pcp = (self._hpcp_sum / self._hpcp_sum.max()).astype(np.float32)
+        key_results: list[KeyResult] = []
+        for profile, key_algorithm in self._keys.items():
+            key_name, scale, strength, _ = key_algorithm(pcp)
+            camelot, key_raw = key_to_camelot(key_name, scale)
+            key_results.append(
+                {
+                    "profile": profile,
+                    "key": camelot,
+                    "key_raw": key_raw,
+                    "confidence": float(strength),
+                    "skipped": False,
+                }
+            )
+        return vote_key(key_results)
+
+    def snapshot(self) -> StreamSnapshot:
+        """Current rolling estimates; does not consume state."""
+        energy = self._energy.summary()
+        key = self.key()
+        return {
+            "time": round(self.samples_seen / self.sr, 3),
+            "bpm": self.bpm(),
+            "key": key[0] if key else None,
+            "key_raw": key[1] if key else None,
+            "key_confidence": key[2] if key else None,
+            "energy": energy["energy"],
+            "loudness_lufs": energy["loudness_lufs"],
+            "loudness_range": energy["loudness_range"],
+            "rms_db": energy["rms_db"],
+        }
+
+
+def read_raw_blocks(stream: IO[bytes], dtype: np.dtype, channels: int, block_frames: int) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks from interleaved raw PCM on ``stream``."""
+    frame_bytes = dtype.itemsize * channels
+    # read1 returns whatever is available, so estimates keep up with a slow live source
+    read = getattr(stream, "read1", stream.read)
+    pending = b""
+    while True:
+        chunk = read(block_frames * frame_bytes)
+        if not chunk:
+            break
+        data = pending + chunk
+        usable = len(data) - len(data) % frame_bytes
+        pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=dtype).reshape(-1, channels)
+        if dtype.kind == "i":
+            mono = samples.mean(axis=1, dtype=np.float64) / float(np.iinfo(dtype).max + 1)
+        else:
+            mono = samples.mean(axis=1, dtype=np.float64)
+        yield mono.astype(np.float32)
+
+
+def decode_stream_blocks(stream: IO[bytes], sr: int, block_frames: int) -> Iterator[np.ndarray]:
+    """Decode an encoded stream (MP3, FLAC, WAV, ...) on ``stream`` to mono float32 blocks.
+
+    Pipes are not seekable, which most decoders need, so the stream is passed
+    through ``ffmpeg`` as it arrives.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("Decoding an encoded stream requires ffmpeg on PATH; use --format with raw PCM instead")
+    cmd = [
+        ffmpeg,
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sr),
+        "pipe:1",
+    ]
+    process = subprocess.Popen(cmd, stdin=stream, stdout=subprocess.PIPE)
+    assert process.stdout is not None
+    try:
+        yield from read_raw_blocks(process.stdout, RAW_FORMATS["f32le"], 1, block_frames)
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {process.returncode}")
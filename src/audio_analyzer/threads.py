@@ -0,0 +1,53 @@
+"""Native thread-pool limits for worker processes.
+
+NumPy's BLAS, OpenMP-based libraries and ``scipy.fft`` can each start a pool
+with one thread per core. With one analysis worker per core that multiplies
+into cores x cores runnable threads, which costs throughput in context
+switches and cache thrash. Pools passed :func:`limit_native_threads` as their
+initializer cap every native pool in the worker instead.
+"""
+
+import os
+
+# Read by the respective runtimes when they create their pools
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "NUMBA_NUM_THREADS",
+)
+
+_fft_workers = 1
+
+
+def limit_native_threads(threads: int) -> None:
+    """Cap native thread pools in this process at ``threads`` (use as a pool initializer).
+
+    The environment variables cover pools created from now on (including in
+    child processes); ``threadpoolctl``, when installed, also resizes BLAS and
+    OpenMP pools that already exist, as they do in forked workers.
+    """
+    global _fft_workers
+
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        pass
+    else:
+        threadpool_limits(limits=threads)
+    _fft_workers = threads
+
+
+def fft_workers() -> int:
+    """Worker count for ``scipy.fft`` calls in this process (1 unless raised by :func:`limit_native_threads`)."""
+    return _fft_workers
+
+
+def default_threads_per_worker(workers: int) -> int:
+    """Split the CPUs evenly between ``workers`` processes, at least one thread each."""
+    return max(1, (os.cpu_count() or 1) // workers)
@@ -0,0 +1,96 @@
+"""Key estimation by key-template matching on chroma, vectorized over many signals.
+
+Essentia's key extractors take one signal at a time. For many short clips it
+is much cheaper to compute an averaged chroma vector per clip in one batched
+NumPy pass and correlate all of them at once with the 24 rotations of a key
+profile. Each profile here is a published key-template pair (major, minor)
+indexed from the tonic; the per-profile results are combined with the same
+vote as the Essentia path (:func:`audio_analyzer.main.vote_key`).
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+from audio_analyzer.main import KEY_PROFILES, KeyResult, key_to_camelot
+
+# Pitch-class names, spelled with sharps; key_to_camelot accepts these and Essentia's flats alike
+PITCH_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+KEY_TEMPLATES: dict[str, tuple[tuple[float, ...], tuple[float, ...]]] = {
+    # Krumhansl & Kessler (1982) probe-tone ratings
+    "krumhansl": (
+        (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88),
+        (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17),
+    ),
+    # Temperley's Kostka-Payne corpus profiles (2007)
+    "temperley": (
+        (0.748, 0.060, 0.488, 0.082, 0.670, 0.460, 0.096, 0.715, 0.104, 0.366, 0.057, 0.400),
+        (0.712, 0.084, 0.474, 0.618, 0.049, 0.460, 0.105, 0.747, 0.404, 0.067, 0.133, 0.330),
+    ),
+}
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    centered = x - x.mean(axis=-1, keepdims=True)
+    norm = np.linalg.norm(centered, axis=-1, keepdims=True)
+    return np.asarray(centered / np.where(norm > 0, norm, 1.0))
+
+
+def template_matrix(profile: str) -> np.ndarray:
+    """Normalized templates of the 24 keys, shape ``(24, 12)``: rows 0-11 major, 12-23 minor, by tonic."""
+    major, minor = (np.asarray(t, dtype=np.float64) for t in KEY_TEMPLATES[profile])
+    rows = [np.roll(major, tonic) for tonic in range(12)] + [np.roll(minor, tonic) for tonic in range(12)]
+    return _zscore(np.stack(rows))
+
+
+def template_profiles(profiles: Sequence[str]) -> tuple[str, ...]:
+    """The key templates to vote over for the requested ``--key-profiles``.
+
+    The default Essentia profiles (:data:`~audio_analyzer.main.KEY_PROFILES`)
+    select every template; otherwise each profile must name a template.
+    Raises ValueError for profiles that have none.
+    """
+    if tuple(profiles) == KEY_PROFILES:
+        return tuple(KEY_TEMPLATES)
+    unknown = [profile for profile in profiles if profile not in KEY_TEMPLATES]
+    if unknown:
+        raise ValueError(
+            f"no key template for {', '.join(unknown)}; template key estimation supports {', '.join(KEY_TEMPLATES)}"
+        )
+    return tuple(profiles)
+
+
+def estimate_keys(chroma: np.ndarray, profiles: tuple[str, ...] = tuple(KEY_TEMPLATES)) -> list[list[KeyResult]]:
+    """Per-profile key results for each row of ``chroma`` (shape ``(n, 12)``, any non-negative scale).
+
+    The confidence is the Pearson correlation between the clip's chroma and
+    the winning key template. Rows without any pitch-class variation (silent
+    clips) have no key: their results have key None and zero confidence.
+    """
+    chroma = np.asarray(chroma, dtype=np.float64)
+    keyless = np.ptp(chroma, axis=1) == 0 if chroma.size else np.zeros(len(chroma), dtype=bool)
+    normalized = _zscore(chroma)
+    results: list[list[KeyResult]] = [[] for _ in range(len(normalized))]
+    for profile in profiles:
+        correlations = normalized @ template_matrix(profile).T  # (n, 24)
+        best = correlations.argmax(axis=1)
+        for i, index in enumerate(best):
+            if keyless[i]:
+                results[i].append(
+                    {"profile": profile, "key": None, "key_raw": None, "confidence": 0.0, "skipped": False}
+                )
+                continue
+            key_name = PITCH_NAMES[index % 12]
+            scale = "major" if index < 12 else "minor"
+            camelot, key_raw = key_to_camelot(key_name, scale)
+            results[i].append(
+                {
+                    "profile": profile,
+                    "key": camelot,
+                    "key_raw": key_raw,
+                    "confidence": max(0.0, float(correlations[i, index])),
+                    "skipped": False,
+                }
+            )
+    return results
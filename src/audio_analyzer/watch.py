@@ -0,0 +1,274 @@
+"""Watch-folder ingestion: analyze audio files as they land in a directory tree.
+
+:class:`FolderWatcher` reports files once their writes have completed. On
+Linux it listens to inotify (through ``ctypes``, no extra dependency): a file
+becomes a candidate when a writer closes it or it is moved into the tree.
+Elsewhere, or with ``poll=True``, the tree is rescanned every
+``poll_interval`` seconds and any file whose size or modification time changed
+becomes a candidate. Either way a candidate is only reported after ``settle``
+seconds without further changes, so slow copies and writers that reopen the
+file are not picked up half-written.
+
+:func:`watch_folder` feeds those files to a process pool whose workers have
+already imported Essentia and librosa, and appends one ``batch``-style NDJSON
+record per file to a sink.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, cast
+
+from audio_analyzer.batch import AUDIO_EXTENSIONS, BatchJob, BatchRecord, run_job_metered
+from audio_analyzer.main import AnalysisOptions, AnalysisResult
+from audio_analyzer.metrics import REGISTRY, count_track
+from audio_analyzer.threads import default_threads_per_worker, limit_native_threads
+
+logger = logging.getLogger("audio-analyzer")
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+FileSignature = tuple[int, int]  # (size, mtime_ns)
+
+
+def _signature(path: Path) -> FileSignature | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _is_audio(path: Path) -> bool:
+    # Hidden files are usually temporaries of an in-progress copy (rsync, editors)
+    return path.suffix.lower() in AUDIO_EXTENSIONS and not path.name.startswith(".")
+
+
+class _Inotify:
+    """Minimal recursive inotify watch over a directory tree."""
+
+    def __init__(self, root: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, Path] = {}
+        self.add_tree(root)
+
+    def add_tree(self, root: Path) -> list[Path]:
+        """Watch ``root`` and its subdirectories; return the files already in them."""
+        files: list[Path] = []
+        for dirpath, _, filenames in os.walk(root):
+            wd = self._add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd >= 0:
+                self._dirs[wd] = Path(dirpath)
+            files.extend(Path(dirpath) / name for name in filenames)
+        return files
+
+    def read(self, timeout: float) -> list[tuple[int, Path | None]]:
+        """Events ``(mask, path)`` available within ``timeout`` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._dirs.get(wd)
+            events.append((mask, directory / os.fsdecode(name) if directory is not None and name else None))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """Reports audio files under ``root`` once their writes have completed and settled."""
+
+    def __init__(
+        self,
+        root: str | Path,
+        settle: float = 2.0,
+        poll_interval: float = 1.0,
+        poll: bool = False,
+        include_existing: bool = False,
+    ):
+        self.root = Path(root)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._pending: dict[Path, tuple[FileSignature | None, float]] = {}  # path -> (signature, last change)
+        self._reported: dict[Path, FileSignature] = {}
+        self._inotify: _Inotify | None = None
+        if not poll:
+            try:
+                self._inotify = _Inotify(self.root)
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable ({e}); polling every {poll_interval} s")
+        existing = self._scan()
+        for path, signature in existing.items():
+            if include_existing:
+                self._pending[path] = (signature, time.monotonic())
+            else:
+                self._reported[path] = signature
+        self._next_scan = time.monotonic() + poll_interval
+
+    @property
+    def polling(self) -> bool:
+        return self._inotify is None
+
+    def _scan(self) -> dict[Path, FileSignature]:
+        found = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = Path(dirpath) / name
+                signature = _signature(path) if _is_audio(path) else None
+                if signature is not None:
+                    found[path] = signature
+        return found
+
+    def _touch(self, path: Path, now: float) -> None:
+        self._pending[path] = (_signature(path), now)
+
+    def _collect(self, timeout: float) -> None:
+        now = time.monotonic()
+        if self._inotify is None:
+            time.sleep(max(0.0, min(timeout, self._next_scan - now)))
+            now = time.monotonic()
+            if now >= self._next_scan:
+                self._rescan(now)
+            return
+        for mask, path in self._inotify.read(timeout):
+            now = time.monotonic()
+            if mask & IN_Q_OVERFLOW:
+                self._rescan(now)  # Events were dropped; fall back to comparing signatures
+            elif path is None:
+                continue
+            elif mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for file in self._inotify.add_tree(path):
+                        if _is_audio(file):
+                            self._touch(file, now)
+            elif _is_audio(path):
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    self._touch(path, now)
+                elif mask & IN_MODIFY and path in self._pending:
+                    self._touch(path, now)  # Written again before settling
+
+    def _rescan(self, now: float) -> None:
+        self._next_scan = now + self.poll_interval
+        for path, signature in self._scan().items():
+            if self._reported.get(path) != signature and self._pending.get(path, (None, 0.0))[0] != signature:
+                self._pending[path] = (signature, now)
+
+    def ready_files(self, timeout: float = 1.0) -> list[Path]:
+        """Wait up to ``timeout`` seconds for events; return files that have now settled."""
+        self._collect(timeout)
+        now = time.monotonic()
+        ready = []
+        for path, (signature, changed_at) in list(self._pending.items()):
+            if now - changed_at < self.settle:
+                continue
+            current = _signature(path)
+            if current is None:
+                del self._pending[path]  # Deleted or renamed away before settling
+            elif current != signature:
+                self._pending[path] = (current, now)  # Still changing without events (e.g. network mounts)
+            else:
+                del self._pending[path]
+                self._reported[path] = current
+                ready.append(path)
+        return sorted(ready)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def _warm_worker(threads: int, engine: str) -> None:
+    """Worker initializer: cap native threads and pay the heavy imports before the first file arrives."""
+    limit_native_threads(threads)
+    if engine == "lite":
+        import audio_analyzer.lite  # noqa: F401
+
+        return
+    import essentia.standard  # noqa: F401
+    import librosa  # noqa: F401
+
+
+def watch_folder(
+    root: str | Path,
+    sink: IO[str],
+    workers: int = 1,
+    options: AnalysisOptions | None = None,
+    settle: float = 2.0,
+    poll_interval: float = 1.0,
+    poll: bool = False,
+    include_existing: bool = False,
+    threads_per_worker: int | None = None,
+    stop: threading.Event | None = None,
+    on_record: Callable[[BatchRecord], None] | None = None,
+) -> None:
+    """Analyze files as they settle under ``root``, appending one NDJSON record per file to ``sink``.
+
+    Runs until ``stop`` is set (or forever). A file modified again after
+    being analyzed is analyzed again.
+    """
+    options = options or AnalysisOptions()
+    stop = stop or threading.Event()
+    watcher = FolderWatcher(root, settle, poll_interval, poll, include_existing)
+    threads = threads_per_worker or default_threads_per_worker(workers)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker, initargs=(threads, options.engine))
+    in_flight: dict[Future, Path] = {}
+    try:
+        # Start every worker now rather than when the first file arrives
+        for warm_up in [pool.submit(int) for _ in range(workers)]:
+            warm_up.result()
+        logger.info(f"Watching {watcher.root} ({'polling' if watcher.polling else 'inotify'})")
+
+        while not stop.is_set():
+            for path in watcher.ready_files(timeout=min(0.5, poll_interval)):
+                in_flight[pool.submit(run_job_metered, BatchJob(path, 0.0), options)] = path
+            for future in [f for f in in_flight if f.done()]:
+                path = in_flight.pop(future)
+                try:
+                    output, metrics = future.result()
+                    REGISTRY.merge(metrics)
+                    count_track()
+                    record: BatchRecord = {"path": str(path), "result": cast(AnalysisResult, output), "error": None}
+                except Exception as e:
+                    count_track(e)
+                    record = {"path": str(path), "result": None, "error": f"{type(e).__name__}: {e}"}
+                    logger.error(f"Analysis failed for {path}: {record['error']}")
+                sink.write(json.dumps(record) + "\n")
+                sink.flush()
+                if on_record is not None:
+                    on_record(record)
+    finally:
+        watcher.close()
+        pool.shutdown(wait=False, cancel_futures=True)
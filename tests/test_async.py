@@ -0,0 +1,76 @@
+"""Tests for the asyncio API."""
+
+import asyncio
+
+import pytest
+
+from audio_analyzer import aio
+from audio_analyzer.aio import AnalysisLimiter, analyze_file_async
+from audio_analyzer.main import AnalysisOptions, analyze_file
+
+
+class TestAnalyzeFileAsync:
+    """Test analyze_file_async and the concurrency limiter."""
+
+    def test_matches_sync_result(self, generated_audio_file):
+        """Verify the async API returns the same structure as analyze."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+
+        async def run():
+            async with AnalysisLimiter(max_concurrency=1, max_workers=1) as limiter:
+                return await analyze_file_async(path, limiter=limiter)
+
+        result = asyncio.run(run())
+        assert result == analyze_file(path)
+
+    @pytest.mark.slow
+    def test_gather_more_files_than_slots(self, generated_audio_file):
+        """Verify callers beyond max_concurrency wait for a slot and still complete."""
+        paths = [generated_audio_file(camelot="8B", bpm=bpm, duration=5.0) for bpm in (100, 120, 140)]
+        limiter = AnalysisLimiter(max_concurrency=2, max_workers=2)
+
+        async def run():
+            async with limiter:
+                return await asyncio.gather(*(analyze_file_async(p, limiter=limiter) for p in paths))
+
+        results = asyncio.run(run())
+        assert len(results) == 3
+        assert all("bpm" in r for r in results)
+
+    def test_missing_file_raises(self):
+        """Verify decode errors propagate to the awaiting caller."""
+
+        async def run():
+            async with AnalysisLimiter(max_concurrency=1, max_workers=1) as limiter:
+                await analyze_file_async("/nonexistent/path/to/audio.wav", limiter=limiter)
+
+        with pytest.raises(Exception):
+            asyncio.run(run())
+
+    def test_options_are_applied(self, generated_audio_file):
+        """Verify options reach the analysis, as with analyze_file."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+        options = AnalysisOptions(engine="lite")
+
+        async def run():
+            async with AnalysisLimiter(max_concurrency=1, max_workers=1) as limiter:
+                return await analyze_file_async(path, limiter=limiter, options=options)
+
+        assert asyncio.run(run()) == analyze_file(path, options=options)
+
+    def test_default_limiter_across_event_loops(self, generated_audio_file, monkeypatch):
+        """Verify the default limiter keeps working in a second asyncio.run()."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+        limiter = AnalysisLimiter(max_concurrency=1, max_workers=1)
+        monkeypatch.setattr(aio, "_default_limiter", limiter)
+
+        async def run():
+            # Two calls contend for the one slot, so the second waits on the semaphore
+            return await asyncio.gather(analyze_file_async(path), analyze_file_async(path))
+
+        try:
+            first = asyncio.run(run())
+            second = asyncio.run(run())
+        finally:
+            limiter.close()
+        assert first == second
@@ -0,0 +1,319 @@
+"""Tests for batch planning, scheduling and windowed sub-jobs."""
+
+import json
+import subprocess
+import sys
+from collections import deque
+from pathlib import Path
+
+import pytest
+
+from audio_analyzer import batch as batch_module
+from audio_analyzer.batch import (
+    WORKER_BASELINE_BYTES,
+    BatchJob,
+    _admit,
+    available_memory,
+    default_memory_budget,
+    estimate_peak_memory,
+    find_audio_files,
+    memory_budgets,
+    merge_records,
+    parse_shard,
+    parse_size,
+    plan_jobs,
+    plan_retries,
+    probe_duration,
+    run_batch,
+    select_shard,
+)
+from audio_analyzer.main import AnalysisOptions
+
+
+def run_cli(args: list[str]) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI with the given arguments."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", *args]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+class TestPlanJobs:
+    """Test duration probing and job ordering."""
+
+    def test_longest_first(self, generated_audio_file):
+        """Verify jobs are ordered by probed duration, longest first."""
+        paths = [generated_audio_file(camelot="8B", bpm=120, duration=d) for d in (3.0, 9.0, 6.0)]
+        jobs = plan_jobs(paths)
+
+        assert [round(job.duration) for job in jobs] == [9, 6, 3]
+        assert probe_duration(paths[0]) == 3.0
+
+    def test_split_into_windows(self, generated_audio_file):
+        """Verify long files become window sub-jobs that cover the whole track."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=25.0)
+        jobs = plan_jobs([path], split_longer_than=20.0, window=10.0)
+
+        assert sorted((job.offset, job.duration) for job in jobs) == [(0.0, 10.0), (10.0, 10.0), (20.0, 5.0)]
+        assert {job.windows for job in jobs} == {3}
+
+    def test_directories_are_expanded(self, generated_audio_file, tmp_path):
+        """Verify directories contribute their audio files only."""
+        (tmp_path / "notes.txt").write_text("not audio")
+        (tmp_path / "a.wav").write_bytes(open(generated_audio_file(camelot="8B", bpm=120, duration=2.0), "rb").read())
+
+        assert find_audio_files([tmp_path]) == [tmp_path / "a.wav"]
+
+
+class TestMemoryAdmission:
+    """Test memory estimates and budget-driven admission."""
+
+    @pytest.mark.parametrize("text, expected", [("1024", 1024), ("512M", 512 * 1024**2), ("1.5g", 3 * 1024**3 // 2)])
+    def test_parse_size(self, text, expected):
+        """Verify byte sizes with binary suffixes."""
+        assert parse_size(text) == expected
+
+    def test_available_memory_reads_memavailable(self, tmp_path):
+        """Verify available memory is MemAvailable (which includes reclaimable cache), not MemFree."""
+        meminfo = tmp_path / "meminfo"
+        meminfo.write_text("MemTotal:       16000000 kB\nMemFree:          200000 kB\nMemAvailable:   9000000 kB\n")
+
+        assert available_memory(meminfo) == 9000000 * 1024
+        assert available_memory(tmp_path / "missing") is None
+
+    def test_default_budget_without_room_is_unlimited(self, monkeypatch):
+        """Verify a budget the worker baselines would use up means no limit rather than zero."""
+        monkeypatch.setattr(batch_module, "available_memory", lambda: 8 * WORKER_BASELINE_BYTES)
+
+        assert default_memory_budget(1) == 5 * WORKER_BASELINE_BYTES
+        assert default_memory_budget(6) is None
+
+    def test_default_budget_only_splits_files_that_cannot_fit(self, generated_audio_file, monkeypatch):
+        """Verify without an explicit budget a file stays whole when it fits with the other workers idle."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=40.0)
+        # Four workers' baselines leave room for half the file; one worker's leaves plenty
+        available = int((4 * WORKER_BASELINE_BYTES + estimate_peak_memory(40.0) / 2) / 0.75)
+        monkeypatch.setattr(batch_module, "available_memory", lambda: available)
+        budget, split_budget = memory_budgets(workers=4)
+
+        assert budget is not None and 0 < budget < estimate_peak_memory(40.0)
+        assert plan_jobs([path], memory_budget=split_budget)[0].windows == 1
+        assert memory_budgets(4, estimate_peak_memory(20.0)) == (estimate_peak_memory(20.0),) * 2
+
+    def test_oversized_file_is_split_to_fit(self, generated_audio_file):
+        """Verify a file estimated above the budget becomes windows that fit it."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=90.0)
+        budget = estimate_peak_memory(40.0)
+        jobs = plan_jobs([path], memory_budget=budget)
+
+        assert len(jobs) == 3
+        assert all(job.peak_memory <= budget for job in jobs)
+        assert plan_jobs([path], memory_budget=estimate_peak_memory(100.0))[0].windows == 1
+
+    def test_admission_backfills_smaller_jobs(self):
+        """Verify a job that does not fit waits while smaller ones behind it start."""
+        big, small = BatchJob(Path("big"), 60.0), BatchJob(Path("small"), 10.0)
+        budget = estimate_peak_memory(70.0)
+        queue = deque([big, small])
+
+        assert _admit(queue, estimate_peak_memory(30.0), budget, idle=False) is small
+        assert _admit(queue, estimate_peak_memory(30.0), budget, idle=False) is None
+        # Nothing running: the head always starts, even if it exceeds the budget
+        assert _admit(deque([big]), 0, estimate_peak_memory(5.0), idle=True) is big
+
+    def test_tight_budget_still_completes(self, generated_audio_file):
+        """Verify every file is analyzed when the budget only admits one job at a time."""
+        paths = [generated_audio_file(camelot="8B", bpm=120, duration=4.0) for _ in range(3)]
+        records = list(run_batch(plan_jobs(paths), workers=3, memory_budget=estimate_peak_memory(5.0)))
+
+        assert sorted(r["path"] for r in records) == sorted(paths)
+        assert all(r["error"] is None for r in records)
+
+
+class TestSharding:
+    """Test shard assignment and merging of shard outputs."""
+
+    def test_shards_partition_the_input(self):
+        """Verify every file lands in exactly one shard, the same one on every call."""
+        paths = [f"library/track_{i:03d}.mp3" for i in range(200)]
+        shards = [select_shard(paths, i, 4) for i in range(1, 5)]
+
+        assert sorted(str(p) for shard in shards for p in shard) == sorted(paths)
+        assert all(30 < len(shard) < 70 for shard in shards)
+        assert select_shard(paths, 2, 4) == shards[1]
+
+    def test_content_sharding_groups_copies(self, generated_audio_file, tmp_path):
+        """Verify identical files go to the same shard when sharding by content."""
+        data = open(generated_audio_file(camelot="8B", bpm=120, duration=2.0), "rb").read()
+        copies = [tmp_path / f"copy_{i}.wav" for i in range(8)]
+        for copy in copies:
+            copy.write_bytes(data)
+
+        assert sum(len(select_shard(copies, i, 3, by="content")) == len(copies) for i in range(1, 4)) == 1
+
+    @pytest.mark.parametrize("text", ["0/4", "5/4", "2", "a/b"])
+    def test_invalid_shard(self, text):
+        """Verify malformed or out-of-range shards are rejected."""
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+    def test_merge_dedupes(self):
+        """Verify one record per path, preferring successes and then later records."""
+        records = [
+            {"path": "b.mp3", "result": {"bpm": 120.0}, "error": None},
+            {"path": "a.mp3", "result": None, "error": "RuntimeError: decode"},
+            {"path": "b.mp3", "result": None, "error": "RuntimeError: decode"},
+            {"path": "a.mp3", "result": {"bpm": 128.0}, "error": None},
+            {"path": "c.mp3", "result": {"bpm": 100.0}, "error": None},
+            {"path": "c.mp3", "result": {"bpm": 101.0}, "error": None},
+        ]
+
+        assert merge_records(records) == [
+            {"path": "a.mp3", "result": {"bpm": 128.0}, "error": None},
+            {"path": "b.mp3", "result": {"bpm": 120.0}, "error": None},
+            {"path": "c.mp3", "result": {"bpm": 101.0}, "error": None},
+        ]
+
+
+class TestRunBatch:
+    """Test batch execution and merging of split files."""
+
+    def test_windowed_file_matches_whole_file(self, generated_audio_file):
+        """Verify merged window results agree with analyzing the file in one piece."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=40.0)
+        [whole] = run_batch(plan_jobs([path]), workers=2)
+        [split] = run_batch(plan_jobs([path], split_longer_than=30.0, window=15.0), workers=2)
+
+        assert split["error"] is None
+        assert abs(split["result"]["bpm"] - 128) <= 1
+        assert split["result"]["key"] == whole["result"]["key"] == "5A"
+        assert split["result"]["has_vocals"] == whole["result"]["has_vocals"]
+        assert abs(split["result"]["energy"] - whole["result"]["energy"]) <= 2
+        assert abs(split["result"]["loudness_lufs"] - whole["result"]["loudness_lufs"]) <= 0.1
+
+
+class TestRetries:
+    """Test re-running the failed stages and files of earlier output."""
+
+    @staticmethod
+    def with_failed_key(result: dict) -> dict:
+        """A copy of ``result`` whose key stage failed."""
+        failed = {**result, "key": "8A", "key_raw": "A minor", "key_confidence": 0.0, "key_profiles": []}
+        failed["stage_status"] = {**result["stage_status"], "key": {"status": "failed", "error": "OSError: busy"}}
+        return failed
+
+    def test_only_failed_stages_rerun(self, generated_audio_file, tmp_path):
+        """Verify a failed stage is recomputed, the other stages are kept and failed files are redone."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=5.0)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+        options = AnalysisOptions(engine="lite")
+        [previous] = run_batch(plan_jobs([path]), workers=1, options=options)
+        kept = {**self.with_failed_key(previous["result"]), "bpm": 99.0}
+
+        jobs, complete = plan_retries(
+            [{"path": path, "result": kept, "error": None}, {"path": str(broken), "result": None, "error": "x"}]
+        )
+        assert complete == []
+        assert [(job.path, job.stages) for job in jobs] == [(Path(path), ("key",)), (broken, ())]
+
+        records = {r["path"]: r for r in run_batch(jobs, workers=1, options=options)}
+        assert records[path]["result"]["key"] == "5A"
+        assert records[path]["result"]["bpm"] == 99.0
+        assert records[path]["result"]["stage_status"]["key"] == {"status": "ok", "error": None}
+        assert records[str(broken)]["error"]
+
+    def test_split_files_rerun_by_window(self, generated_audio_file):
+        """Verify a long file's failed stages are re-run window by window and merged with the kept stages."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=40.0)
+        options = AnalysisOptions(engine="lite")
+        [previous] = run_batch(plan_jobs([path]), workers=1, options=options)
+        kept = {**self.with_failed_key(previous["result"]), "bpm": 99.0, "energy": 3}
+
+        jobs, _ = plan_retries([{"path": path, "result": kept, "error": None}], split_longer_than=30.0, window=15.0)
+        assert [(job.windows, job.stages) for job in jobs] == [(3, ("key",))] * 3
+
+        [record] = run_batch(jobs, workers=2, options=options)
+        assert record["result"]["key"] == "5A"
+        assert (record["result"]["bpm"], record["result"]["energy"]) == (99.0, 3)
+        assert record["result"]["stage_status"]["key"] == {"status": "ok", "error": None}
+
+    def test_failed_windows_do_not_vote(self):
+        """Verify a window whose key stage failed is left out of the key vote."""
+        import numpy as np
+
+        from audio_analyzer.batch import WindowResult, merge_windows
+        from audio_analyzer.energy import EnergyMeter
+        from audio_analyzer.main import STAGE_DEFAULTS
+
+        windows = []
+        # The failed window is longer, so its default key would outvote the other
+        for index, (key, duration) in enumerate([("5A", 5.0), (None, 50.0)]):
+            meter = EnergyMeter(44100)
+            meter.update(np.random.default_rng(index).normal(0, 0.1, 44100 * 5).astype(np.float32))
+            partials = {**STAGE_DEFAULTS["bpm"], **STAGE_DEFAULTS["vocals"], "bpm": 128.0, "bpm_confidence": 0.5}
+            if key is None:
+                partials.update(STAGE_DEFAULTS["key"], _key_error="ValueError: no chroma")
+            else:
+                partials.update(key=key, key_raw="D minor", key_confidence=0.2, key_profiles=[])
+            windows.append(WindowResult(index, duration, partials, meter))
+
+        result = merge_windows(windows)
+
+        assert result["key"] == "5A"
+        assert result["stage_status"]["key"]["status"] == "ok"
+
+    def test_cli(self, generated_audio_file, tmp_path):
+        """Verify --retry-failed-stages writes every file of the earlier output once, with failures redone."""
+        paths = [
+            generated_audio_file(camelot="5A", bpm=128, duration=4.0),
+            generated_audio_file(camelot="8B", bpm=120, duration=3.0),
+        ]
+        first = run_cli(["batch", "--engine", "lite", *paths])
+        assert first.returncode == 0, first.stderr
+        records = [json.loads(line) for line in first.stdout.splitlines()]
+        for record in records:
+            if record["path"] == paths[0]:
+                record["result"] = self.with_failed_key(record["result"])
+        previous = tmp_path / "previous.ndjson"
+        previous.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+        retried = run_cli(["batch", "--engine", "lite", "--retry-failed-stages", str(previous)])
+
+        assert retried.returncode == 0, retried.stderr
+        results = {r["path"]: r["result"] for r in map(json.loads, retried.stdout.splitlines())}
+        assert sorted(results) == sorted(paths)
+        assert results[paths[0]]["key"] == "5A"
+        assert run_cli(["batch", "--retry-failed-stages", str(previous), *paths]).returncode != 0
+
+
+class TestBatchCommand:
+    """Test the batch command's NDJSON output."""
+
+    def test_one_line_per_file_and_failures(self, generated_audio_file, tmp_path):
+        """Verify each file gets one line and a broken file is reported without stopping the batch."""
+        good = generated_audio_file(camelot="8B", bpm=120, duration=4.0)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio at all")
+
+        result = run_cli(["batch", "--workers", "2", good, str(broken)])
+
+        assert result.returncode == 1
+        records = {r["path"]: r for r in map(json.loads, result.stdout.splitlines())}
+        assert records[good]["result"]["key"] == "8B"
+        assert records[str(broken)]["result"] is None
+        assert records[str(broken)]["error"]
+
+    def test_shards_then_merge(self, generated_audio_file, tmp_path):
+        """Verify two shards cover the input and merge into one line per file."""
+        paths = [generated_audio_file(camelot="8B", bpm=120, duration=2.0) for _ in range(4)]
+        outputs = []
+        for shard in ("1/2", "2/2"):
+            result = run_cli(["batch", "--workers", "1", "--shard", shard, *paths])
+            assert result.returncode == 0, result.stderr
+            output = tmp_path / f"shard_{shard[0]}.ndjson"
+            output.write_text(result.stdout)
+            outputs.append(str(output))
+
+        merged = run_cli(["merge", *outputs, outputs[0]])
+
+        assert merged.returncode == 0, merged.stderr
+        assert [json.loads(line)["path"] for line in merged.stdout.splitlines()] == sorted(paths)
@@ -114,3 +114,25 @@ class TestBPMWithClickTrack:
         octave_match = abs(detected_bpm - bpm * 2) <= 2 or abs(detected_bpm - bpm / 2) <= 2
 
         assert bpm_match or octave_match, f"Expected ~{bpm} BPM, got {detected_bpm}"
+
+
+class TestOnsetEnvelopeReuse:
+    """Test that a precomputed onset envelope gives the same tempo estimate."""
+
+    def test_precomputed_envelope_matches(self, generated_drum_file):
+        """Verify detect_bpm gives identical results with a shared onset envelope."""
+        from audio_analyzer.main import detect_bpm, load_audio, onset_envelope
+
+        y = load_audio(generated_drum_file(bpm=128, duration=10.0))
+
+        assert detect_bpm(y, onset_env=onset_envelope(y)) == detect_bpm(y)
+
+    def test_without_cross_check(self, generated_drum_file):
+        """Verify skipping the librosa cross-check leaves Essentia's estimate unchanged."""
+        from audio_analyzer.main import detect_bpm, load_audio
+
+        y = load_audio(generated_drum_file(bpm=128, duration=10.0))
+        bpm, confidence, librosa_bpm = detect_bpm(y, cross_check=False)
+
+        assert (bpm, confidence) == detect_bpm(y)[:2]
+        assert librosa_bpm is None
@@ -0,0 +1,189 @@
+"""Tests for the result cache and fingerprint-based duplicate detection."""
+
+import json
+import shutil
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_analyzer import cache as cache_module
+from audio_analyzer import main
+from audio_analyzer.cache import PcmCache, ResultCache, file_digest
+from audio_analyzer.fingerprint import MAX_HAMMING_DISTANCE, compute_fingerprint, hamming_distances
+from audio_analyzer.main import AnalysisOptions
+
+
+def fail_analysis(*args, **kwargs):
+    """Stand-in for analysis or decoding steps that must not run on a cache hit."""
+    raise AssertionError("analyze_signal should not run on a cache hit")
+
+
+@pytest.fixture
+def no_analysis(monkeypatch):
+    """Make any full pipeline run fail."""
+    monkeypatch.setattr(main, "analyze_signal", fail_analysis)
+
+
+class TestResultCache:
+    """Test ResultCache storage semantics."""
+
+    def test_roundtrip(self, tmp_path):
+        """Verify a stored result is returned for its digest."""
+        cache = ResultCache(tmp_path)
+        cache.put("ab" * 32, AnalysisOptions(), {"bpm": 120.0})
+
+        assert cache.get("ab" * 32, AnalysisOptions()) == {"bpm": 120.0}
+        assert cache.get("cd" * 32, AnalysisOptions()) is None
+
+    def test_options_are_part_of_the_key(self, tmp_path):
+        """Verify a result computed with other options is a miss."""
+        cache = ResultCache(tmp_path)
+        cache.put("ab" * 32, AnalysisOptions(), {"bpm": 120.0})
+
+        assert cache.get("ab" * 32, AnalysisOptions(key_vote="exhaustive")) is None
+
+    def test_other_version_is_a_miss(self, tmp_path):
+        """Verify results written by another analyzer version are ignored."""
+        cache = ResultCache(tmp_path)
+        cache.put("ab" * 32, AnalysisOptions(), {"bpm": 120.0})
+        (path,) = (tmp_path / "results" / "ab").iterdir()
+        entry = json.loads(path.read_text())
+        entry["version"] = "0.0.0"
+        path.write_text(json.dumps(entry))
+
+        assert cache.get("ab" * 32, AnalysisOptions()) is None
+
+
+class TestAnalyzeFileWithCache:
+    """Test analyze_file's cache lookups."""
+
+    def test_identical_file_hits(self, generated_audio_file, tmp_path, monkeypatch):
+        """Verify a byte-identical copy reuses the stored result."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+        cache = ResultCache(tmp_path / "cache")
+        first = main.analyze_file(path, cache=cache)
+
+        copy = tmp_path / "copy.wav"
+        shutil.copy(path, copy)
+        monkeypatch.setattr(main, "analyze_signal", fail_analysis)
+
+        assert main.analyze_file(copy, cache=cache) == first
+
+    def test_reencode_reuses_result(self, generated_audio_file, tmp_path, no_analysis):
+        """Verify a FLAC/OGG/MP3 re-encode is matched by fingerprint and reuses the WAV's result."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=25.0)
+        cache = ResultCache(tmp_path / "cache")
+        cache.put(file_digest(path), AnalysisOptions(), {"bpm": 128.0, "key": "5A"}, compute_fingerprint(path))
+
+        audio, sr = sf.read(path)
+        formats = ["FLAC", "OGG", "MP3"]
+        if "MP3" not in sf.available_formats():
+            formats.remove("MP3")  # libsndfile built without an MP3 encoder
+        for fmt in formats:
+            reencoded = tmp_path / f"track.{fmt.lower()}"
+            sf.write(reencoded, audio, sr, format=fmt)
+            assert main.analyze_file(reencoded, cache=cache) == {"bpm": 128.0, "key": "5A"}
+
+
+class TestStageCache:
+    """Test per-stage caching across stage version changes."""
+
+    def test_only_bumped_stage_reruns(self, generated_audio_file, tmp_path, monkeypatch):
+        """Verify a release that bumps one stage's version re-runs only that stage."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+        cache = ResultCache(tmp_path)
+        first = main.analyze_file(path, cache=cache)
+
+        # New release: whole results miss, and only the vocal stage changed
+        monkeypatch.setattr(cache_module, "__version__", "next")
+        monkeypatch.setitem(main.STAGE_VERSIONS, "vocals", main.STAGE_VERSIONS["vocals"] + 1)
+        for stage in ("bpm", "key", "energy"):
+            monkeypatch.setitem(main.STAGES, stage, fail_analysis)
+
+        assert main.analyze_file(path, cache=cache) == first
+
+    def test_key_options_keep_other_stages_cached(self, generated_audio_file, tmp_path, monkeypatch):
+        """Verify changing an option only the key stage reads re-runs only the key stage."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+        cache = ResultCache(tmp_path)
+        first = main.analyze_file(path, cache=cache)
+
+        for stage in ("bpm", "energy", "vocals"):
+            monkeypatch.setitem(main.STAGES, stage, fail_analysis)
+        options = AnalysisOptions(key_profiles=("temperley", "edma"), key_vote="exhaustive")
+        second = main.analyze_file(path, cache=cache, options=options)
+
+        assert not main.failed_stages(second)
+        assert {k: second[k] for k in ("bpm", "energy", "has_vocals")} == {
+            k: first[k] for k in ("bpm", "energy", "has_vocals")
+        }
+
+    def test_all_stages_cached_skips_decoding(self, generated_audio_file, tmp_path, monkeypatch):
+        """Verify the file is not decoded when every stage output is cached."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+        cache = ResultCache(tmp_path)
+        first = main.analyze_file(path, cache=cache)
+
+        monkeypatch.setattr(cache_module, "__version__", "next")
+        monkeypatch.setattr(main, "load_audio", fail_analysis)
+
+        assert main.analyze_file(path, cache=cache) == first
+
+
+class TestPcmCache:
+    """Test the decoded-audio cache."""
+
+    def test_second_load_skips_decoding(self, generated_audio_file, tmp_path, monkeypatch):
+        """Verify a cached file is read back as a memory map without decoding."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=4.0)
+        pcm_cache = PcmCache(tmp_path)
+        first = np.array(pcm_cache.load(path))
+
+        monkeypatch.setattr(cache_module, "load_audio", fail_analysis)
+        second = pcm_cache.load(path)
+
+        assert isinstance(second, np.memmap)
+        np.testing.assert_array_equal(second, first)
+        np.testing.assert_array_equal(first, main.load_audio(path))
+        assert pcm_cache.get(file_digest(path), sr=22050) is None
+
+    def test_analysis_from_cached_audio(self, generated_audio_file, tmp_path):
+        """Verify analyzing cached audio gives the same result as decoding."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+        pcm_cache = PcmCache(tmp_path)
+        main.analyze_file(path, pcm_cache=pcm_cache)
+
+        assert main.analyze_file(path, pcm_cache=pcm_cache) == main.analyze_file(path)
+
+
+class TestFingerprint:
+    """Test fingerprint properties."""
+
+    def test_different_tracks_do_not_match(self, generated_audio_file):
+        """Verify tracks in different keys and tempos are far apart."""
+        a = compute_fingerprint(generated_audio_file(camelot="8B", bpm=120, duration=25.0))
+        b = compute_fingerprint(generated_audio_file(camelot="5A", bpm=140, duration=25.0))
+
+        assert a is not None and b is not None
+        assert hamming_distances(a["bits"], [b["bits"]])[0] > MAX_HAMMING_DISTANCE
+
+    def test_near_match_must_agree_on_middle(self, generated_audio_file, tmp_path, no_analysis):
+        """Verify a track whose opening matches a cached one but whose middle differs is not reused."""
+        intro = sf.read(generated_audio_file(camelot="8B", bpm=120, duration=25.0))[0]
+        other, sr = sf.read(generated_audio_file(camelot="3A", bpm=90, duration=40.0))
+        a, b = tmp_path / "a.wav", tmp_path / "b.wav"
+        sf.write(a, np.concatenate([intro, intro[: 40 * sr - len(intro)]]), sr)
+        sf.write(b, np.concatenate([intro, other[len(intro) :]]), sr)
+        cache = ResultCache(tmp_path / "cache")
+        fingerprint_a = compute_fingerprint(a)
+        cache.put(file_digest(a), AnalysisOptions(), {"bpm": 120.0, "key": "8B"}, fingerprint_a)
+
+        fingerprint_b = compute_fingerprint(b)
+        assert fingerprint_a is not None and fingerprint_b is not None
+        assert hamming_distances(fingerprint_a["bits"], [fingerprint_b["bits"]])[0] <= MAX_HAMMING_DISTANCE
+        assert cache.find_similar(fingerprint_b, AnalysisOptions()) is None
+
+    def test_short_file_has_no_fingerprint(self, generated_audio_file):
+        """Verify clips shorter than the fingerprint excerpt are not fingerprinted."""
+        assert compute_fingerprint(generated_audio_file(camelot="8B", bpm=120, duration=8.0)) is None
@@ -0,0 +1,157 @@
+"""Tests for vectorized multi-clip analysis and template key estimation."""
+
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from audio_analyzer.batch import BatchJob, estimate_peak_memory, plan_jobs, probe_duration, run_batch
+from audio_analyzer.clips import analyze_clips, analyze_padded, pad_clips
+from audio_analyzer.energy import measure_energy
+from audio_analyzer.main import AnalysisOptions, detect_vocals, load_audio, vote_key
+from audio_analyzer.tonal import KEY_TEMPLATES, estimate_keys, template_profiles
+
+
+class TestTemplateKeys:
+    """Test key estimation from chroma vectors."""
+
+    @pytest.mark.parametrize("profile", list(KEY_TEMPLATES))
+    def test_template_matches_its_own_key(self, profile):
+        """Verify each rotated template is recognized as its own key with full confidence."""
+        major, minor = (np.asarray(t) for t in KEY_TEMPLATES[profile])
+        chroma = np.stack([np.roll(major, 7), np.roll(minor, 9)])  # G major, A minor
+
+        [[g_major], [a_minor]] = estimate_keys(chroma, profiles=(profile,))
+
+        assert (g_major["key"], g_major["key_raw"]) == ("9B", "G major")
+        assert (a_minor["key"], a_minor["key_raw"]) == ("8A", "A minor")
+        assert g_major["confidence"] == pytest.approx(1.0)
+
+    def test_silent_chroma_has_zero_confidence(self):
+        """Verify an all-zero chroma vector has no key rather than the first template rotation."""
+        [results] = estimate_keys(np.zeros((1, 12)))
+        assert all(r["key"] is None and r["confidence"] == 0.0 for r in results)
+        assert vote_key(results) == ("8A", "A minor", 0.0)
+
+    def test_template_profiles(self):
+        """Verify the default Essentia profiles select every template and other names must be templates."""
+        assert template_profiles(("edma", "bgate", "temperley")) == tuple(KEY_TEMPLATES)
+        assert template_profiles(["temperley"]) == ("temperley",)
+        with pytest.raises(ValueError, match="edma"):
+            template_profiles(("edma", "temperley"))
+
+
+class TestAnalyzeClips:
+    """Test the padded batch against per-clip analysis."""
+
+    def test_padding_does_not_change_measures(self, generated_audio_file):
+        """Verify energy, loudness and vocals of clips of different lengths match the per-file measures."""
+        signals = [load_audio(generated_audio_file(camelot="8B", bpm=120, duration=d)) for d in (1.0, 3.5, 6.0)]
+        padded, lengths = pad_clips(signals)
+        results = analyze_padded(padded, lengths)
+
+        for y, result in zip(signals, results, strict=True):
+            expected = measure_energy(y)
+            assert abs(result["energy"] - expected["energy"]) <= 1
+            assert result["loudness_lufs"] == pytest.approx(expected["loudness_lufs"], abs=0.05)
+            assert result["rms_db"] == pytest.approx(expected["rms_db"], abs=0.01)
+            assert result["has_vocals"] == detect_vocals(y)
+
+    @pytest.mark.parametrize("camelot", ["8B", "5A", "11B", "2A"])
+    def test_key(self, generated_audio_file, camelot):
+        """Verify the key of chord-progression clips."""
+        [result] = analyze_clips([generated_audio_file(camelot=camelot, bpm=120, duration=6.0)])
+        assert result["key"] == camelot
+
+    @pytest.mark.parametrize("bpm", [100, 128])
+    def test_bpm(self, generated_drum_file, bpm):
+        """Verify the tempo of drum loops."""
+        [result] = analyze_clips([generated_drum_file(bpm=bpm, duration=8.0)])
+        assert abs(result["bpm"] - bpm) <= 2
+        assert result["bpm_confidence"] > 0
+
+    def test_silence_and_broken_files(self, tmp_path, generated_audio_file):
+        """Verify silence gets neutral measures and an undecodable clip fails alone."""
+        import soundfile as sf
+
+        silent = tmp_path / "silent.wav"
+        sf.write(silent, np.zeros(22050, dtype=np.float32), 44100)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+        good = generated_audio_file(camelot="8B", bpm=120, duration=2.0)
+
+        silent_result, broken_result, good_result = analyze_clips([silent, broken, good])
+
+        assert isinstance(broken_result, Exception)
+        assert silent_result["loudness_lufs"] is None
+        assert silent_result["bpm"] == 0.0
+        assert silent_result["has_vocals"] is False
+        assert (silent_result["key"], silent_result["key_confidence"]) == ("8A", 0.0)
+        assert good_result["key"] == "8B"
+
+    def test_failed_stage_falls_back_alone(self, generated_audio_file, monkeypatch):
+        """Verify a stage that raises gives every clip its defaults and error while the other stages complete."""
+        from audio_analyzer import clips
+
+        def broken(padded, lengths, sr):
+            raise RuntimeError("no model")
+
+        monkeypatch.setattr(clips, "clip_vocals", broken)
+        paths = [generated_audio_file(camelot=c, bpm=120, duration=3.0) for c in ("5A", "8B")]
+        results = analyze_clips(paths)
+
+        for result in results:
+            assert result["stage_status"]["vocals"] == {"status": "failed", "error": "RuntimeError: no model"}
+            assert result["stage_status"]["key"]["status"] == "ok"
+        assert [r["key"] for r in results] == ["5A", "8B"]
+
+    def test_options_apply(self, generated_audio_file):
+        """Verify key profiles, exhaustive voting and the lite engine reach the clip path."""
+        path = generated_audio_file(camelot="5A", bpm=120, duration=6.0)
+
+        [single] = analyze_clips([path], options=AnalysisOptions(key_profiles=("temperley",)))
+        assert [r["profile"] for r in single["key_profiles"]] == ["temperley"]
+
+        [exhaustive] = analyze_clips([path], options=AnalysisOptions(key_vote="exhaustive"))
+        assert not any(r["skipped"] for r in exhaustive["key_profiles"])
+
+        [lite] = analyze_clips([path], options=AnalysisOptions(engine="lite"))
+        assert lite["key"] == "5A"
+        assert abs(lite["bpm"] - 120) <= 2
+
+
+class TestClipBatches:
+    """Test grouping of short files into batch jobs."""
+
+    def test_short_files_are_grouped(self, generated_audio_file, tmp_path):
+        """Verify short files run as groups with one record per clip, and longer files run alone."""
+        clips = [generated_audio_file(camelot="8B", bpm=120, duration=d) for d in (1.0, 2.0, 3.0, 1.5, 2.5)]
+        longer = generated_audio_file(camelot="5A", bpm=128, duration=12.0)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+
+        jobs = plan_jobs([*clips, longer], clips_shorter_than=5.0, clip_batch_size=2)
+        durations = sorted([round(probe_duration(p), 1) for p in job.clips] for job in jobs if job.clips)
+        assert jobs[0].clips == ()
+        assert durations == [[1.0, 1.5], [2.0, 2.5], [3.0]]  # Clips of similar length share a group
+
+        [longest_group] = [job for job in jobs if len(job.clips) == 2 and job.duration > 4.0]
+        assert longest_group.peak_memory == 2 * estimate_peak_memory(probe_duration(longest_group.clips[-1]))
+
+        jobs.append(BatchJob(broken, 0.0, clips=(broken,)))
+        records = {r["path"]: r for r in run_batch(jobs, workers=1)}
+
+        assert set(records) == {*clips, longer, str(broken)}
+        assert all(records[p]["result"]["key"] == "8B" for p in clips)
+        assert records[longer]["result"]["key"] == "5A"
+        assert records[str(broken)]["error"]
+
+    def test_essentia_only_key_profiles_are_rejected(self, generated_audio_file):
+        """Verify the batch command rejects key profiles that clip groups cannot apply."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=2.0)
+        cmd = [sys.executable, "-m", "audio_analyzer.main", "batch", "--clips-shorter-than", "5", "--key-profiles"]
+        result = subprocess.run([*cmd, "edma", str(path)], capture_output=True, text=True)
+
+        assert result.returncode == 2
+        assert "--key-profiles" in result.stderr
@@ -0,0 +1,64 @@
+"""Tests for concurrent stage execution within one track."""
+
+import subprocess
+import sys
+import warnings
+
+import pytest
+
+from audio_analyzer.main import STAGES, AnalysisOptions, analyze_signal, load_audio
+
+
+class TestStageExecutors:
+    """Test that every stage executor produces the serial result."""
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_matches_serial(self, generated_audio_file, executor):
+        """Verify concurrent execution returns exactly the serial result."""
+        y = load_audio(generated_audio_file(camelot="5A", bpm=128, duration=8.0))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", ResourceWarning)
+            assert analyze_signal(y, stage_executor=executor) == analyze_signal(y)
+
+    def test_stage_outputs_do_not_overlap(self, generated_audio_file):
+        """Verify each result field is produced by exactly one stage."""
+        y = load_audio(generated_audio_file(camelot="8B", bpm=120, duration=5.0))
+        fields = [field for stage in STAGES.values() for field in stage(y, 44100, AnalysisOptions())]
+
+        assert len(fields) == len(set(fields))
+
+    def test_unknown_executor(self, generated_audio_file):
+        """Verify an unknown executor name is rejected."""
+        y = load_audio(generated_audio_file(camelot="8B", bpm=120, duration=3.0))
+
+        with pytest.raises(ValueError):
+            analyze_signal(y, stage_executor="gpu")
+
+
+class TestNativeThreadLimits:
+    """Test per-worker native thread limits."""
+
+    def test_limit_applies_to_process(self):
+        """Verify the limit reaches the environment, threadpoolctl and scipy.fft."""
+        code = (
+            "import os\n"
+            "from audio_analyzer.threads import fft_workers, limit_native_threads\n"
+            "limit_native_threads(2)\n"
+            "print(os.environ['OMP_NUM_THREADS'], os.environ['OPENBLAS_NUM_THREADS'], fft_workers())\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["2", "2", "2"]
+
+    def test_vocals_independent_of_fft_workers(self, generated_audio_file, monkeypatch):
+        """Verify parallel FFTs give the same vocal decision."""
+        from audio_analyzer import threads
+        from audio_analyzer.main import detect_vocals
+
+        y = load_audio(generated_audio_file(camelot="8B", bpm=120, duration=6.0))
+        serial = detect_vocals(y)
+        monkeypatch.setattr(threads, "_fft_workers", 4)
+
+        assert detect_vocals(y) == serial
@@ -0,0 +1,108 @@
+"""Tests for the streaming energy and loudness meter."""
+
+import numpy as np
+import pytest
+
+from audio_analyzer.energy import EnergyMeter, QuantileSketch, measure_energy
+
+SAMPLE_RATE = 44100
+
+
+def reference_energy_score(y: np.ndarray) -> int:
+    """The original list + np.percentile energy score."""
+    energies = [float(np.sum(y[i : i + 2048].astype(np.float64) ** 2)) for i in range(0, len(y) - 2048, 1024)]
+    p95 = np.percentile(energies, 95)
+    p999 = np.percentile(energies, 99.9)
+    return int(min(1.0, p95 / (p999 + 0.001)) * 100)
+
+
+class TestQuantileSketch:
+    """Test the fixed-memory quantile sketch."""
+
+    @pytest.mark.parametrize("q", [0.1, 0.5, 0.95, 0.999])
+    def test_relative_accuracy(self, q):
+        """Verify quantiles stay within the configured relative error."""
+        values = np.random.default_rng(0).lognormal(mean=0.0, sigma=3.0, size=50_000)
+        sketch = QuantileSketch(relative_accuracy=0.005)
+        sketch.add(values)
+
+        expected = np.percentile(values, q * 100)
+        assert abs(sketch.quantile(q) - expected) / expected < 0.011
+
+    def test_merge_equals_single_sketch(self):
+        """Verify merging two sketches matches adding all values to one."""
+        values = np.random.default_rng(1).uniform(0.0, 10.0, size=10_000)
+        whole = QuantileSketch()
+        whole.add(values)
+        left, right = QuantileSketch(), QuantileSketch()
+        left.add(values[:3000])
+        right.add(values[3000:])
+        left.merge(right)
+
+        assert left.count == whole.count
+        assert left.quantile(0.95) == whole.quantile(0.95)
+
+    def test_empty_sketch_raises(self):
+        """Verify an empty sketch has no quantiles."""
+        with pytest.raises(ValueError):
+            QuantileSketch().quantile(0.5)
+
+
+class TestEnergyMeter:
+    """Test the single-pass energy, loudness and RMS measures."""
+
+    def test_energy_score_matches_percentiles(self):
+        """Verify the sketch-based score stays within 1 of the exact percentile score."""
+        rng = np.random.default_rng(2)
+        y = (rng.standard_normal(SAMPLE_RATE * 20) * np.linspace(0.05, 0.5, SAMPLE_RATE * 20)).astype(np.float32)
+
+        assert abs(measure_energy(y)["energy"] - reference_energy_score(y)) <= 1
+
+    def test_block_size_does_not_change_result(self):
+        """Verify streaming in odd-sized blocks gives the same result as one pass."""
+        y = np.random.default_rng(3).uniform(-0.5, 0.5, SAMPLE_RATE * 10).astype(np.float32)
+        meter = EnergyMeter()
+        for start in range(0, len(y), 777):
+            meter.update(y[start : start + 777])
+
+        assert meter.summary() == measure_energy(y)
+
+    def test_merge_adjacent_meters(self):
+        """Verify meters over consecutive halves merge to (nearly) the whole-signal measures."""
+        y = (np.random.default_rng(4).standard_normal(SAMPLE_RATE * 20) * 0.1).astype(np.float32)
+        first, second = EnergyMeter(), EnergyMeter()
+        first.update(y[: len(y) // 2])
+        second.update(y[len(y) // 2 :])
+        first.merge(second)
+        whole = measure_energy(y)
+
+        merged = first.summary()
+        assert abs(merged["energy"] - whole["energy"]) <= 1
+        assert merged["loudness_lufs"] == pytest.approx(whole["loudness_lufs"], abs=0.05)
+        assert merged["rms_db"] == pytest.approx(whole["rms_db"], abs=0.01)
+
+    def test_full_scale_sine_loudness(self):
+        """Verify a full-scale 997 Hz sine reads -3.01 LUFS (BS.1770 calibration)."""
+        t = np.arange(SAMPLE_RATE * 10) / SAMPLE_RATE
+        y = np.sin(2 * np.pi * 997 * t).astype(np.float32)
+        result = measure_energy(y)
+
+        assert result["loudness_lufs"] == pytest.approx(-3.01, abs=0.05)
+        assert result["rms_db"] == pytest.approx(-3.01, abs=0.05)
+        assert result["loudness_range"] == pytest.approx(0.0, abs=0.2)
+
+    def test_silence(self):
+        """Verify silence has no loudness and a zero energy score."""
+        result = measure_energy(np.zeros(SAMPLE_RATE * 5, dtype=np.float32))
+
+        assert result["loudness_lufs"] is None
+        assert result["loudness_range"] is None
+        assert result["rms_db"] is None
+        assert result["energy"] == 0
+
+    def test_rms_envelope_resolution(self):
+        """Verify one envelope point per complete window."""
+        meter = EnergyMeter(envelope_resolution=0.5)
+        meter.update(np.full(int(SAMPLE_RATE * 2.2), 0.25, dtype=np.float32))
+
+        np.testing.assert_allclose(meter.rms_envelope, [0.25] * 4, rtol=1e-6)
@@ -173,3 +173,41 @@ class TestOutputFormat:
         assert isinstance(data["has_vocals"], bool)
         assert isinstance(data["bpm_confidence"], (int, float))
         assert isinstance(data["key_confidence"], (int, float))
+
+
+class TestStageFailures:
+    """Test that a failing stage is reported without losing the other stages."""
+
+    def test_failed_stage_keeps_defaults_and_reports_error(self, generated_audio_file, monkeypatch, tmp_path):
+        """Verify a raising stage yields its defaults, a failed status and no cache entry."""
+        from audio_analyzer.cache import ResultCache
+        from audio_analyzer.main import STAGES, analyze_file
+
+        def broken_key(y, sr, options):
+            raise RuntimeError("profile table missing")
+
+        monkeypatch.setitem(STAGES, "key", broken_key)
+        path = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+        cache = ResultCache(tmp_path / "cache")
+        result = analyze_file(path, cache=cache)
+
+        assert result["key"] == "8A"
+        assert result["key_confidence"] == 0.0
+        assert abs(result["bpm"] - 120) <= 1
+        assert result["stage_status"]["key"] == {"status": "failed", "error": "RuntimeError: profile table missing"}
+        assert {name: s["status"] for name, s in result["stage_status"].items() if name != "key"} == {
+            "bpm": "ok",
+            "energy": "ok",
+            "vocals": "ok",
+        }
+
+        monkeypatch.undo()
+        assert analyze_file(path, cache=cache)["stage_status"]["key"]["status"] == "ok"
+
+    def test_successful_stages_report_ok(self, generated_audio_file):
+        """Verify every stage of a normal analysis is ok without an error."""
+        result = run_analyzer(generated_audio_file(camelot="8B", bpm=120, duration=4.0))
+
+        assert result.returncode == 0
+        status = json.loads(result.stdout)["stage_status"]
+        assert status == {name: {"status": "ok", "error": None} for name in ("bpm", "key", "energy", "vocals")}
@@ -0,0 +1,163 @@
+"""Tests for the engine and speed-mode evaluation."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from audio_analyzer.evaluate import (
+    REDUCED_SAMPLE_RATE,
+    LabeledTrack,
+    configurations,
+    format_table,
+    mark_pareto_front,
+    parse_key,
+    read_annotations,
+    run_evaluation,
+)
+
+
+def run_cli(args: list[str]) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI with the given arguments."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", *args]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def score(mode: str, cpu: float, bpm: float | None, key: float | None) -> dict:
+    """A minimal score for Pareto tests."""
+    return {"engine": "lite", "mode": mode, "cpu_seconds": cpu, "bpm_accuracy": bpm, "key_accuracy": key}
+
+
+class TestLabels:
+    """Test reading annotated corpora."""
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [("8A", "8A"), ("12b", "12B"), ("A minor", "8A"), ("Bb major", "6B"), ("F#m", "11A"), ("Db", "3B")],
+    )
+    def test_parse_key(self, text, expected):
+        """Verify Camelot notation and key names are accepted."""
+        assert parse_key(text) == expected
+
+    @pytest.mark.parametrize("text", ["13A", "H minor", "C dorian"])
+    def test_invalid_key(self, text):
+        """Verify unknown keys are rejected."""
+        with pytest.raises(ValueError):
+            parse_key(text)
+
+    def test_read_annotations(self, tmp_path):
+        """Verify relative paths resolve against the CSV and blank labels are kept unscored."""
+        annotations = tmp_path / "labels.csv"
+        annotations.write_text("path,bpm,key\nsongs/a.wav,128,A minor\nb.flac,,5A\n")
+
+        assert read_annotations(annotations) == [
+            LabeledTrack(tmp_path / "songs" / "a.wav", 128.0, "8A"),
+            LabeledTrack(tmp_path / "b.flac", None, "5A"),
+        ]
+
+    def test_bad_row_names_its_line(self, tmp_path):
+        """Verify a malformed row reports where it is."""
+        annotations = tmp_path / "labels.csv"
+        annotations.write_text("path,bpm,key\na.wav,fast,8A\n")
+
+        with pytest.raises(ValueError, match="labels.csv:2"):
+            read_annotations(annotations)
+
+
+class TestEvaluation:
+    """Test configurations, scoring and the Pareto front."""
+
+    def test_configurations_skip_unsupported_modes(self):
+        """Verify the reduced rate is lite-only and the librosa toggle standard-only."""
+        configs = {(c.engine, c.mode): c for c in configurations()}
+
+        assert ("lite", "reduced-rate") in configs
+        assert configs["lite", "reduced-rate"].sample_rate == REDUCED_SAMPLE_RATE
+        assert ("standard", "reduced-rate") not in configs
+        assert ("standard", "no-librosa-bpm") in configs
+        assert ("streaming", "no-librosa-bpm") not in configs
+        assert configs["streaming", "excerpt"].options.excerpt_seconds == 15.0
+
+    def test_pareto_front(self):
+        """Verify dominated configurations are unmarked and the rest sorted by cost."""
+        scores = [
+            score("full", 1.0, 1.0, 0.9),
+            score("exhaustive-key", 1.2, 1.0, 0.9),
+            score("excerpt", 0.5, 1.0, 0.7),
+            score("reduced-rate", 0.6, 0.5, 0.7),
+        ]
+
+        front = mark_pareto_front(scores)
+
+        assert [(s["mode"], s["pareto"]) for s in front] == [
+            ("excerpt", True),
+            ("reduced-rate", False),
+            ("full", True),
+            ("exhaustive-key", False),
+        ]
+
+    def test_scores_labeled_tracks(self, generated_audio_file, tmp_path):
+        """Verify accuracy counts correct labels, unlabeled fields are skipped and failures count as wrong."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=10.0)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+        tracks = [LabeledTrack(path, 128.0, "5A"), LabeledTrack(path, None, "8B"), LabeledTrack(broken, 120.0, None)]
+
+        scores = run_evaluation(tracks, configurations(["lite"], ["full", "reduced-rate"]))
+        full, reduced = sorted(scores, key=lambda s: s["mode"])
+
+        assert full["failures"] == 1
+        assert full["bpm_accuracy"] == 0.5
+        assert full["key_accuracy"] == 0.5
+        assert full["cpu_seconds"] > 0
+        assert reduced["sample_rate"] == REDUCED_SAMPLE_RATE
+        assert "full" in format_table([full, reduced])
+
+    def test_flat_keys_score_on_essentia_engines(self, generated_audio_file):
+        """Verify keys Essentia spells with flats (Bb major, Eb minor) are scored correct on the standard engine."""
+        tracks = [
+            LabeledTrack(generated_audio_file(camelot=camelot, bpm=120, duration=10.0), None, camelot)
+            for camelot in ("6B", "2A")
+        ]
+
+        [standard] = run_evaluation(tracks, configurations(["standard"], ["full"]))
+
+        assert standard["failures"] == 0
+        assert standard["key_accuracy"] == 1.0
+
+
+class TestEvaluateCommand:
+    """Test the evaluate command."""
+
+    def test_annotated_corpus_json(self, generated_audio_file, tmp_path):
+        """Verify --json prints one scored configuration per line."""
+        annotations = tmp_path / "labels.csv"
+        annotations.write_text(
+            f"path,bpm,key\n{generated_audio_file(camelot='8B', bpm=120, duration=10.0)},120,C major\n"
+        )
+
+        result = run_cli(
+            [
+                "evaluate",
+                "--no-synthetic",
+                "--annotations",
+                str(annotations),
+                "--engine",
+                "lite",
+                "--mode",
+                "full",
+                "--json",
+            ]
+        )
+
+        assert result.returncode == 0, result.stderr
+        [line] = result.stdout.splitlines()
+        data = json.loads(line)
+        assert (data["engine"], data["mode"], data["pareto"]) == ("lite", "full", True)
+        assert data["bpm_accuracy"] == data["key_accuracy"] == 1.0
+
+    def test_empty_corpus(self):
+        """Verify evaluating nothing is an error."""
+        result = run_cli(["evaluate", "--no-synthetic"])
+        assert result.returncode != 0
@@ -114,3 +114,32 @@ class TestKeyConfidence:
 
         data = json.loads(result.stdout)
         assert data["key_confidence"] >= 0, "Key confidence should be non-negative"
+
+
+class TestAdaptiveKeyVoting:
+    """Test which key profiles run under adaptive and exhaustive voting."""
+
+    def test_agreeing_profiles_skip_the_rest(self, generated_audio_file):
+        """Verify the third profile is skipped once the first two agree."""
+        from audio_analyzer.main import detect_key, load_audio
+
+        y = load_audio(generated_audio_file(camelot="8B", bpm=120, duration=10.0))
+        key, _, _, profiles = detect_key(y)
+
+        assert key == "8B"
+        assert [p["skipped"] for p in profiles] == [False, False, True]
+        assert profiles[2]["key"] is None
+
+        _, _, _, profiles = detect_key(y, adaptive=False)
+        assert not any(p["skipped"] for p in profiles)
+
+    def test_fast_path_and_profile_order(self, generated_audio_file):
+        """Verify a confident first profile is used alone, in the requested order."""
+        from audio_analyzer.main import detect_key, load_audio
+
+        y = load_audio(generated_audio_file(camelot="8B", bpm=120, duration=10.0))
+        key, _, confidence, profiles = detect_key(y, profiles=("temperley", "edma", "bgate"), fast_confidence=0.0)
+
+        assert [p["profile"] for p in profiles] == ["temperley", "edma", "bgate"]
+        assert [p["skipped"] for p in profiles] == [False, True, True]
+        assert confidence == profiles[0]["confidence"]
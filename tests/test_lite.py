@@ -0,0 +1,115 @@
+"""Tests for the NumPy/SciPy-only engine."""
+
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from audio_analyzer.lite import load_audio_lite, run_lite
+from audio_analyzer.main import AnalysisOptions, analyze_file
+
+HEAVY_MODULES = ("essentia", "librosa", "numba")
+LITE = AnalysisOptions(engine="lite")
+
+
+def run_analyzer(file_path: str, *args: str) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI on the given file path."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", "analyze", *args, str(file_path)]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+class TestLiteEngine:
+    """Test the lite engine's estimates and its import footprint."""
+
+    @pytest.mark.parametrize("camelot", ["8B", "5A", "11B", "2A"])
+    def test_key(self, generated_audio_file, camelot):
+        """Verify the key of chord progressions."""
+        result = analyze_file(generated_audio_file(camelot=camelot, bpm=120, duration=10.0), options=LITE)
+        assert result["key"] == camelot
+        assert [r["profile"] for r in result["key_profiles"]] == ["krumhansl", "temperley"]
+
+    @pytest.mark.parametrize("bpm", [96, 128, 140])
+    def test_bpm(self, generated_drum_file, bpm):
+        """Verify the tempo of drum loops."""
+        result = analyze_file(generated_drum_file(bpm=bpm, duration=10.0), options=LITE)
+        assert abs(result["bpm"] - bpm) <= 1
+        assert 0 < result["bpm_confidence"] <= 1
+
+    def test_fast_confidence_skips_second_template(self, generated_audio_file):
+        """Verify adaptive voting applies to the template profiles."""
+        y = load_audio_lite(generated_audio_file(camelot="8B", bpm=120, duration=6.0))
+        [key] = run_lite(y, 44100, ["key"], AnalysisOptions(engine="lite", key_fast_confidence=0.0)).values()
+        assert [r["skipped"] for r in key["key_profiles"]] == [False, True]
+
+    def test_silence(self, tmp_path):
+        """Verify silence gets no tempo, loudness or vocals."""
+        import soundfile as sf
+
+        path = tmp_path / "silence.wav"
+        sf.write(path, np.zeros(44100 * 3, dtype=np.float32), 44100)
+        result = analyze_file(path, options=LITE)
+
+        assert result["bpm"] == 0.0
+        assert result["loudness_lufs"] is None
+        assert result["has_vocals"] is False
+
+    def test_resamples_other_rates(self, tmp_path):
+        """Verify files at other sample rates are decoded to 44.1 kHz mono."""
+        import soundfile as sf
+
+        path = tmp_path / "stereo48k.flac"
+        t = np.arange(48000 * 2) / 48000
+        sf.write(path, np.stack([np.sin(2 * np.pi * 440 * t)] * 2, axis=1) * 0.5, 48000)
+        y = load_audio_lite(path, offset=0.5, duration=1.0)
+
+        assert y.dtype == np.float32
+        assert len(y) == 44100
+        assert np.abs(y).max() == pytest.approx(0.5, abs=0.01)
+
+    def test_cli_schema_without_heavy_imports(self, generated_audio_file):
+        """Verify --engine lite emits the standard JSON fields and never imports Essentia or librosa."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=8.0)
+        check = (
+            "import sys\n"
+            "from audio_analyzer.main import AnalysisOptions, analyze_file\n"
+            f"analyze_file({str(path)!r}, options=AnalysisOptions(engine='lite', excerpt_seconds=5.0))\n"
+            f"print(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r}))\n"
+        )
+        imported = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True)
+        assert imported.stdout.strip() == "[]"
+
+        lite = run_analyzer(path, "--engine", "lite")
+        standard = run_analyzer(path)
+        assert lite.returncode == 0, lite.stderr
+        assert list(json.loads(lite.stdout)) == list(json.loads(standard.stdout))
+        assert json.loads(lite.stdout)["key"] == "5A"
+
+    def test_caches_without_heavy_imports(self, generated_audio_file, tmp_path):
+        """Verify the result, stage, fingerprint and decoded-audio caches keep the lite engine free of librosa."""
+        path = generated_audio_file(camelot="5A", bpm=128, duration=25.0)
+        check = (
+            "import sys\n"
+            "from audio_analyzer.cache import PcmCache, ResultCache\n"
+            "from audio_analyzer.main import AnalysisOptions, analyze_file\n"
+            f"cache, pcm_cache = ResultCache({str(tmp_path / 'cache')!r}), PcmCache({str(tmp_path / 'pcm')!r})\n"
+            f"result = analyze_file({str(path)!r}, cache=cache, options=AnalysisOptions(engine='lite'), "
+            "pcm_cache=pcm_cache)\n"
+            "assert result['key'] == '5A'\n"
+            f"print(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r}))\n"
+        )
+        imported = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True)
+        assert imported.returncode == 0, imported.stderr
+        assert imported.stdout.strip() == "[]"
+        assert (tmp_path / "cache" / "fingerprints.ndjson").exists()
+
+    def test_key_profiles_select_templates(self, generated_audio_file):
+        """Verify --key-profiles chooses among the key templates and rejects Essentia-only profiles."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=6.0)
+        result = analyze_file(path, options=AnalysisOptions(engine="lite", key_profiles=("temperley",)))
+        assert [r["profile"] for r in result["key_profiles"]] == ["temperley"]
+
+        rejected = run_analyzer(path, "--engine", "lite", "--key-profiles", "edma,temperley")
+        assert rejected.returncode == 2
+        assert "edma" in rejected.stderr
@@ -0,0 +1,149 @@
+"""Tests for the Prometheus metrics registry, its exporter and what the pipeline records."""
+
+import asyncio
+import pickle
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+from audio_analyzer.aio import AnalysisLimiter, analyze_file_async
+from audio_analyzer.batch import plan_jobs, run_batch
+from audio_analyzer.cache import ResultCache
+from audio_analyzer.main import AnalysisOptions, analyze_file
+from audio_analyzer.metrics import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    REGISTRY,
+    STAGE_SECONDS,
+    TRACK_FAILURES,
+    TRACKS_ANALYZED,
+    MetricsExporter,
+    MetricsRegistry,
+    count_fallback,
+)
+
+
+def run_cli(args: list[str]) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI with the given arguments."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", *args]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    """Start every test from an empty process registry."""
+    REGISTRY.take()
+    yield
+    REGISTRY.take()
+
+
+class TestRegistry:
+    """Test counting, merging and the text format."""
+
+    def test_render(self):
+        """Verify counters with escaped labels and cumulative histogram buckets."""
+        registry = MetricsRegistry()
+        registry.inc(TRACK_FAILURES, {"exception": 'Bad"Error'})
+        registry.inc(TRACKS_ANALYZED, value=2)
+        for seconds in (0.02, 0.3, 500.0):
+            registry.observe(STAGE_SECONDS, seconds, {"stage": "key"})
+        text = registry.render()
+
+        assert "# TYPE audio_analyzer_stage_duration_seconds histogram" in text
+        assert 'audio_analyzer_track_failures_total{exception="Bad\\"Error"} 1' in text
+        assert "audio_analyzer_tracks_analyzed_total 2" in text
+        assert 'audio_analyzer_stage_duration_seconds_bucket{stage="key",le="0.01"} 0' in text
+        assert 'audio_analyzer_stage_duration_seconds_bucket{stage="key",le="0.5"} 2' in text
+        assert 'audio_analyzer_stage_duration_seconds_bucket{stage="key",le="+Inf"} 3' in text
+        assert 'audio_analyzer_stage_duration_seconds_count{stage="key"} 3' in text
+
+    def test_take_merge_and_pickle(self):
+        """Verify a worker's registry survives pickling and adds up in the parent."""
+        worker = MetricsRegistry()
+        worker.inc(CACHE_HITS, {"kind": "stage"}, 3)
+        worker.observe(STAGE_SECONDS, 1.5, {"stage": "bpm"})
+        parent = MetricsRegistry()
+        parent.observe(STAGE_SECONDS, 0.5, {"stage": "bpm"})
+
+        parent.merge(pickle.loads(pickle.dumps(worker.take())))
+
+        assert worker.value(CACHE_HITS, {"kind": "stage"}) == 0
+        assert parent.value(CACHE_HITS, {"kind": "stage"}) == 3
+        assert parent.value(STAGE_SECONDS, {"stage": "bpm"}) == 2
+
+
+class TestExporter:
+    """Test publishing to a file and over HTTP."""
+
+    def test_file_and_endpoint(self, tmp_path):
+        """Verify the file is written on close and the endpoint serves the current registry."""
+        path = tmp_path / "metrics" / "audio_analyzer.prom"
+        with MetricsExporter(path, port=0) as exporter:
+            count_fallback("energy", ValueError("boom"))
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+                served = response.read().decode()
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+
+        assert 'audio_analyzer_stage_fallbacks_total{exception="ValueError",stage="energy"} 1' in served
+        assert path.read_text() == REGISTRY.render()
+        assert list(path.parent.iterdir()) == [path]
+
+
+class TestPipelineMetrics:
+    """Test what analysis, the cache and batch runs record."""
+
+    def test_cache_hits_and_stage_latencies(self, generated_audio_file, tmp_path):
+        """Verify a miss records stage latencies and the repeat run counts a result hit."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+        cache = ResultCache(tmp_path / "cache")
+        options = AnalysisOptions(engine="lite")
+
+        analyze_file(path, cache=cache, options=options)
+        analyze_file(path, cache=cache, options=options)
+
+        assert REGISTRY.value(CACHE_MISSES, {"kind": "result"}) == 1
+        assert REGISTRY.value(CACHE_MISSES, {"kind": "stage"}) == 4
+        assert REGISTRY.value(CACHE_HITS, {"kind": "result"}) == 1
+        for stage in ("decode", "bpm", "key", "energy", "vocals"):
+            assert REGISTRY.value(STAGE_SECONDS, {"stage": stage}) == 1
+
+    def test_batch_merges_worker_metrics(self, generated_audio_file, tmp_path):
+        """Verify batch counts tracks and failures by type, with the stage latencies measured in its workers."""
+        good = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+
+        records = list(run_batch(plan_jobs([good, broken]), workers=1, options=AnalysisOptions(engine="lite")))
+
+        [failure] = [r for r in records if r["error"]]
+        exception = failure["error"].split(":")[0]
+        assert REGISTRY.value(TRACKS_ANALYZED) == 1
+        assert REGISTRY.value(TRACK_FAILURES, {"exception": exception}) == 1
+        assert REGISTRY.value(STAGE_SECONDS, {"stage": "key"}) == 1
+
+    def test_async_merges_worker_metrics(self, generated_audio_file):
+        """Verify the async API records the stage latencies measured in its process pool."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+
+        async def run():
+            async with AnalysisLimiter(max_concurrency=1, max_workers=1) as limiter:
+                await analyze_file_async(path, limiter=limiter, options=AnalysisOptions(engine="lite"))
+
+        asyncio.run(run())
+
+        assert REGISTRY.value(TRACKS_ANALYZED) == 1
+        for stage in ("decode", "bpm", "key", "energy", "vocals"):
+            assert REGISTRY.value(STAGE_SECONDS, {"stage": stage}) == 1
+
+    def test_batch_cli_metrics_file(self, generated_audio_file, tmp_path):
+        """Verify batch --metrics-file leaves the final metrics behind."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=5.0)
+        metrics = tmp_path / "batch.prom"
+        result = run_cli(["batch", "--engine", "lite", "--metrics-file", str(metrics), str(path)])
+
+        assert result.returncode == 0, result.stderr
+        text = metrics.read_text()
+        assert "audio_analyzer_tracks_analyzed_total 1" in text
+        assert "audio_analyzer_decoded_audio_seconds_count 1" in text
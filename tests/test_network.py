@@ -0,0 +1,96 @@
+"""Tests for the streaming-network engine."""
+
+import json
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+from audio_analyzer.main import AnalysisOptions, analyze_file, load_audio, run_stage_outputs
+from audio_analyzer.network import run_network
+
+
+def run_analyzer(file_path: str, *args: str) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI on the given file path."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", "analyze", *args, str(file_path)]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+class TestStreamingEngine:
+    """Test that the network reproduces the standard engine's stage outputs."""
+
+    def test_matches_standard_engine(self, generated_audio_file):
+        """Verify key and BPM are identical and energy measures agree."""
+        path = generated_audio_file(camelot="7A", bpm=124, duration=20.0)
+        options = AnalysisOptions(key_vote="exhaustive")
+        standard = analyze_file(path, options=options)
+        streaming = analyze_file(path, options=AnalysisOptions(key_vote="exhaustive", engine="streaming"))
+
+        for field in ("bpm", "bpm_confidence", "key", "key_raw", "key_confidence", "key_profiles", "has_vocals"):
+            assert streaming[field] == standard[field], field
+        assert abs(streaming["energy"] - standard["energy"]) <= 1
+        assert streaming["loudness_lufs"] == pytest.approx(standard["loudness_lufs"], abs=0.1)
+        # Essentia's meter computes the range from its own short-term series, not 0.1 LU histogram bins
+        assert streaming["loudness_range"] == pytest.approx(standard["loudness_range"], abs=1.0)
+        assert streaming["rms_db"] == pytest.approx(standard["rms_db"], abs=0.01)
+
+    def test_array_and_file_sources_agree(self, generated_audio_file, tmp_path, monkeypatch):
+        """Verify a decoded signal and its file produce the same outputs, for any subset of stages."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=6.0)
+        options = AnalysisOptions(engine="streaming")
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        monkeypatch.setattr(tempfile, "tempdir", str(scratch))
+
+        from_file = run_network(path, 44100, ["energy", "vocals"], options)
+        from_array = run_stage_outputs(load_audio(path), 44100, ["energy", "vocals"], "serial", options)
+
+        assert from_file == from_array
+        assert set(from_file) == {"energy", "vocals"}
+        assert not any(scratch.iterdir())  # The signal's temporary WAV is removed
+
+    def test_adaptive_vote_marks_skipped_profiles(self, generated_audio_file):
+        """Verify adaptive voting reports profiles after a settled vote as skipped, like the standard engine."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=6.0)
+        [key] = run_network(path, 44100, ["key"], AnalysisOptions(engine="streaming", key_fast_confidence=0.0)).values()
+
+        assert [r["skipped"] for r in key["key_profiles"]] == [False, True, True]
+        assert key["key"] == "8B"
+
+    def test_failed_stage_falls_back_alone(self, generated_audio_file, monkeypatch):
+        """Verify a stage whose outputs cannot be post-processed gets its defaults and error, not the whole track."""
+        from audio_analyzer import network
+
+        def broken(pool):
+            raise RuntimeError("no ticks")
+
+        monkeypatch.setattr(network, "_bpm_output", broken)
+        path = generated_audio_file(camelot="8B", bpm=120, duration=6.0)
+        result = analyze_file(path, options=AnalysisOptions(engine="streaming"))
+
+        assert result["stage_status"]["bpm"] == {"status": "failed", "error": "RuntimeError: no ticks"}
+        assert all(result["stage_status"][name]["status"] == "ok" for name in ("key", "energy", "vocals"))
+        assert result["key"] == "8B"
+
+    def test_silence(self, tmp_path):
+        """Verify silence has no loudness and no vocals."""
+        import soundfile as sf
+
+        path = tmp_path / "silence.wav"
+        sf.write(path, np.zeros(44100 * 3, dtype=np.float32), 44100)
+        outputs = run_network(path, 44100, ["energy", "vocals"], AnalysisOptions(engine="streaming"))
+
+        assert outputs["energy"]["loudness_lufs"] is None
+        assert outputs["energy"]["rms_db"] is None
+        assert outputs["vocals"]["has_vocals"] is False
+
+    def test_cli(self, generated_audio_file):
+        """Verify --engine streaming produces the analyze JSON document."""
+        result = run_analyzer(generated_audio_file(camelot="5A", bpm=128, duration=8.0), "--engine", "streaming")
+
+        assert result.returncode == 0, result.stderr
+        data = json.loads(result.stdout)
+        assert data["key"] == "5A"
+        assert abs(data["bpm"] - 128) <= 1
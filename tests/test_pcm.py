@@ -0,0 +1,71 @@
+"""Tests for the memory-mapped WAV/AIFF fast path."""
+
+import struct
+
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_analyzer.pcm import load_pcm
+
+SAMPLE_RATE = 44100
+
+
+@pytest.fixture
+def stereo_signal():
+    """Three seconds of stereo noise with different channels."""
+    return np.random.default_rng(0).uniform(-0.9, 0.9, (SAMPLE_RATE * 3, 2)).astype(np.float32)
+
+
+class TestLoadPcm:
+    """Test load_pcm against librosa's decode path."""
+
+    @pytest.mark.parametrize(
+        "file_format, subtype",
+        [
+            ("WAV", "PCM_16"),
+            ("WAV", "PCM_24"),
+            ("WAV", "FLOAT"),
+            ("WAV", "PCM_U8"),
+            ("AIFF", "PCM_16"),
+            ("AIFF", "PCM_24"),
+        ],
+    )
+    def test_matches_librosa(self, tmp_path, stereo_signal, file_format, subtype):
+        """Verify mapped samples equal librosa's mono float32 decode, whole and in part."""
+        path = tmp_path / f"audio.{file_format.lower()}"
+        sf.write(path, stereo_signal, SAMPLE_RATE, subtype=subtype, format=file_format)
+
+        expected, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True)
+        np.testing.assert_allclose(load_pcm(path, SAMPLE_RATE), expected, atol=1e-6)
+
+        expected, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True, offset=0.5, duration=1.2)
+        np.testing.assert_allclose(load_pcm(path, SAMPLE_RATE, offset=0.5, duration=1.2), expected, atol=1e-6)
+
+    @pytest.mark.parametrize("placeholder", [0, 0xFFFFFFFF])
+    def test_unset_data_size_reads_to_end_of_file(self, tmp_path, stereo_signal, placeholder):
+        """Verify a streamed WAV whose header leaves the data size unset is read to the end of the file."""
+        path = tmp_path / "audio.wav"
+        sf.write(path, stereo_signal, SAMPLE_RATE, subtype="PCM_16")
+        expected = load_pcm(path, SAMPLE_RATE)
+        data = bytearray(path.read_bytes())
+        position = data.index(b"data")
+        data[position + 4 : position + 8] = struct.pack("<I", placeholder)
+        path.write_bytes(bytes(data))
+
+        np.testing.assert_array_equal(load_pcm(path, SAMPLE_RATE), expected)
+
+    def test_other_sample_rate_falls_back(self, tmp_path, stereo_signal):
+        """Verify files needing resampling are left to the decoder."""
+        path = tmp_path / "audio.wav"
+        sf.write(path, stereo_signal, 48000)
+
+        assert load_pcm(path, SAMPLE_RATE) is None
+
+    def test_compressed_falls_back(self, tmp_path, stereo_signal):
+        """Verify compressed formats are left to the decoder."""
+        path = tmp_path / "audio.flac"
+        sf.write(path, stereo_signal, SAMPLE_RATE)
+
+        assert load_pcm(path, SAMPLE_RATE) is None
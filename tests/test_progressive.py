@@ -0,0 +1,77 @@
+"""Tests for excerpt-first analysis with full-track refinement."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from audio_analyzer.main import AnalysisOptions, stages_to_refine
+
+
+def run_analyzer(file_path: str, *args: str) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI on the given file path."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", "analyze", *args, str(file_path)]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def excerpt_partials(bpm_confidence=0.4, librosa_bpm=120.0, key_confidence=0.8, keys=("8B", "8B")):
+    """Build excerpt stage outputs for refinement tests."""
+    return {
+        "bpm": 120.0,
+        "bpm_confidence": bpm_confidence,
+        "_librosa_bpm": librosa_bpm,
+        "key_confidence": key_confidence,
+        "key_profiles": [{"key": key, "skipped": False} for key in keys] + [{"key": None, "skipped": True}],
+    }
+
+
+class TestStagesToRefine:
+    """Test when excerpt estimates are escalated to the full track."""
+
+    @pytest.mark.parametrize(
+        "partials, expected",
+        [
+            (excerpt_partials(), []),
+            (excerpt_partials(bpm_confidence=0.1), ["bpm"]),
+            (excerpt_partials(librosa_bpm=126.0), ["bpm"]),  # Essentia and librosa disagree
+            (excerpt_partials(librosa_bpm=None), []),
+            (excerpt_partials(key_confidence=0.5), ["key"]),
+            (excerpt_partials(keys=("8B", "7B", "8B")), ["key"]),  # Profiles disagree
+            (excerpt_partials(bpm_confidence=0.0, key_confidence=0.0), ["bpm", "key"]),
+        ],
+    )
+    def test_thresholds_and_disagreement(self, partials, expected):
+        """Verify low confidence or disagreeing estimates trigger refinement."""
+        assert stages_to_refine(partials, AnalysisOptions(excerpt_seconds=30.0)) == expected
+
+
+class TestExcerptAnalysis:
+    """Test the --excerpt CLI option."""
+
+    def test_short_track_is_analyzed_in_full(self, generated_audio_file):
+        """Verify tracks shorter than two excerpts skip the excerpt pass."""
+        result = run_analyzer(generated_audio_file(camelot="8B", bpm=120, duration=10.0), "--excerpt", "10")
+
+        assert result.returncode == 0, result.stderr
+        data = json.loads(result.stdout)
+        assert data["analysis_scope"] == {"bpm": "full", "key": "full", "energy": "full", "vocals": "full"}
+        assert data["key"] == "8B"
+
+    def test_uncertain_stage_is_refined(self, generated_audio_file):
+        """Verify only the uncertain stage (plus the cheap ones) re-runs on the full track."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=24.0)
+        result = run_analyzer(path, "--excerpt", "10", "--refine-key-confidence", "1.0")
+
+        assert result.returncode == 0, result.stderr
+        data = json.loads(result.stdout)
+        assert data["analysis_scope"] == {"bpm": "excerpt", "key": "full", "energy": "full", "vocals": "full"}
+        assert data["key"] == "8B"
+        assert abs(data["bpm"] - 120) <= 1
+
+    def test_full_analysis_has_no_scope(self, generated_audio_file):
+        """Verify the default output is unchanged."""
+        result = run_analyzer(generated_audio_file(camelot="8B", bpm=120, duration=6.0))
+
+        assert result.returncode == 0, result.stderr
+        assert "analysis_scope" not in json.loads(result.stdout)
@@ -0,0 +1,105 @@
+"""Tests for stdin input and the incremental stream command."""
+
+import json
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_analyzer.stream import StreamAnalyzer
+
+
+def run_cli(args: list[str], stdin: bytes) -> subprocess.CompletedProcess:
+    """Run the audio-analyzer CLI with the given arguments and stdin bytes."""
+    cmd = [sys.executable, "-m", "audio_analyzer.main", *args]
+    return subprocess.run(cmd, input=stdin, capture_output=True)
+
+
+class TestAnalyzeStdin:
+    """Test `analyze -`."""
+
+    def test_analyze_from_stdin(self, generated_audio_file):
+        """Verify an encoded file piped to stdin is analyzed."""
+        path = generated_audio_file(camelot="8B", bpm=120, duration=8.0)
+        with open(path, "rb") as f:
+            result = run_cli(["analyze", "-"], f.read())
+
+        assert result.returncode == 0, result.stderr
+        data = json.loads(result.stdout)
+        assert data["key"] == "8B"
+
+
+class TestStreamCommand:
+    """Test the stream command's NDJSON output."""
+
+    def test_raw_pcm_emits_rolling_estimates(self, generated_audio_file):
+        """Verify raw s16le PCM produces one line per interval plus a final line."""
+        audio, sr = sf.read(generated_audio_file(camelot="8B", bpm=120, duration=9.0), dtype="int16")
+        result = run_cli(["stream", "--format", "s16le", "--interval", "4"], audio.tobytes())
+
+        assert result.returncode == 0, result.stderr
+        lines = [json.loads(line) for line in result.stdout.decode().splitlines()]
+        assert [round(line["time"]) for line in lines] == [4, 8, 9]
+        assert lines[-1]["key"] == "8B"
+        assert abs(lines[-1]["bpm"] - 120) <= 2
+
+    def test_raw_pcm_stereo(self, generated_audio_file):
+        """Verify interleaved stereo is downmixed."""
+        audio, sr = sf.read(generated_audio_file(camelot="8B", bpm=120, duration=6.0), dtype="float32")
+        stereo = np.column_stack([audio, audio])
+        result = run_cli(["stream", "--format", "f32le", "--channels", "2", "--interval", "10"], stereo.tobytes())
+
+        assert result.returncode == 0, result.stderr
+        lines = result.stdout.decode().splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["time"] == pytest.approx(6.0, abs=0.01)
+
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_encoded_stream(self, generated_audio_file):
+        """Verify an encoded stream is decoded through ffmpeg."""
+        with open(generated_audio_file(camelot="8B", bpm=120, duration=6.0), "rb") as f:
+            result = run_cli(["stream", "--interval", "3"], f.read())
+
+        assert result.returncode == 0, result.stderr
+        assert len(result.stdout.decode().splitlines()) == 2
+
+    @pytest.mark.parametrize(
+        "args", [["--interval", "0"], ["--window", "-1"], ["--channels", "0"], ["--sample-rate", "0"]]
+    )
+    def test_rejects_non_positive_values(self, args):
+        """Verify zero or negative intervals, windows, channel counts and rates are usage errors."""
+        result = run_cli(["stream", "--format", "s16le", *args], b"")
+
+        assert result.returncode == 2
+        assert b"Invalid value" in result.stderr
+        assert result.stdout == b""
+
+
+class TestStreamAnalyzer:
+    """Test StreamAnalyzer's running state."""
+
+    def test_bpm_follows_tempo_change(self, generated_drum_file):
+        """Verify the windowed BPM follows a tempo change rather than averaging over history."""
+        first, sr = sf.read(generated_drum_file(bpm=100, duration=20.0), dtype="float32")
+        second, _ = sf.read(generated_drum_file(bpm=128, duration=20.0), dtype="float32")
+        analyzer = StreamAnalyzer(sr=sr, window=10.0)
+
+        for block in np.array_split(first, 40):
+            analyzer.update(block)
+        assert abs(analyzer.snapshot()["bpm"] - 100) <= 2
+
+        for block in np.array_split(second, 40):
+            analyzer.update(block)
+        assert abs(analyzer.snapshot()["bpm"] - 128) <= 2
+
+    def test_no_estimates_before_enough_audio(self):
+        """Verify BPM and key are None until there is audio to estimate from."""
+        analyzer = StreamAnalyzer()
+        analyzer.update(np.zeros(1000, dtype=np.float32))
+        snapshot = analyzer.snapshot()
+
+        assert snapshot["bpm"] is None
+        assert snapshot["key"] is None
@@ -2,7 +2,7 @@
 
 import pytest
 
-from audio_analyzer.main import pitch_to_camelot
+from audio_analyzer.main import key_to_camelot, key_vote_decided, pitch_to_camelot, vote_key
 
 
 class TestPitchToCamelot:
@@ -102,3 +102,53 @@ class TestCamelotMappingConsistency:
                 result = pitch_to_camelot(pitch, mode)
                 if result is not None:
                     assert re.match(pattern, result), f"Invalid format: {result}"
+
+
+class TestKeyToCamelot:
+    """Test conversion of Essentia key names, which spell some black keys with flats."""
+
+    def test_flat_names(self):
+        """Verify flat key names map to their own pitch class rather than C."""
+        assert key_to_camelot("Bb", "major") == ("6B", "Bb major")
+        assert key_to_camelot("Eb", "minor")[0] == "2A"
+
+    @pytest.mark.parametrize("sharp, flat", [("C#", "Db"), ("D#", "Eb"), ("F#", "Gb"), ("G#", "Ab"), ("A#", "Bb")])
+    @pytest.mark.parametrize("scale", ["major", "minor"])
+    def test_enharmonic_spellings_agree(self, sharp, flat, scale):
+        """Verify both spellings of a black key give the same Camelot key."""
+        assert key_to_camelot(sharp, scale)[0] == key_to_camelot(flat, scale)[0]
+
+
+def key_result(key, confidence=0.5, skipped=False):
+    """Build a per-profile key result for voting tests."""
+    return {"profile": "p", "key": key, "key_raw": key, "confidence": confidence, "skipped": skipped}
+
+
+class TestKeyVoteDecided:
+    """Test the early-exit rule of adaptive key voting."""
+
+    @pytest.mark.parametrize(
+        "keys, remaining, expected",
+        [
+            (["8B"], 2, False),  # One vote can still be outvoted
+            (["8B", "8B"], 1, True),  # Majority of three is settled
+            (["8B", "9B"], 1, False),  # Third profile breaks the tie
+            (["8B", "9B", "8B"], 0, True),
+            (["8B", "8B"], 2, False),  # 2 vs a possible 2 among four profiles
+            (["8B", "8B", "8B"], 2, True),  # 3 vs at most 2
+        ],
+    )
+    def test_majority_rule(self, keys, remaining, expected):
+        """Verify the vote is settled only when remaining profiles cannot overturn it."""
+        assert key_vote_decided([key_result(k) for k in keys], remaining) is expected
+
+    def test_fast_path_confidence(self):
+        """Verify a confident first profile settles the vote alone."""
+        assert key_vote_decided([key_result("8B", 0.9)], 2, fast_confidence=0.8) is True
+        assert key_vote_decided([key_result("8B", 0.7)], 2, fast_confidence=0.8) is False
+
+    def test_skipped_results_do_not_vote(self):
+        """Verify skipped profiles are ignored by the final vote."""
+        results = [key_result("8B", 0.6), key_result("8B", 0.8), key_result(None, None, skipped=True)]
+
+        assert vote_key(results) == ("8B", "8B", pytest.approx(0.7))
@@ -0,0 +1,108 @@
+"""Tests for watch-folder change detection and ingestion."""
+
+import io
+import json
+import shutil
+import threading
+import time
+
+import pytest
+
+from audio_analyzer.watch import FolderWatcher, watch_folder
+
+
+def wait_for_ready(watcher: FolderWatcher, timeout: float = 5.0) -> list:
+    """Poll the watcher until it reports files or ``timeout`` passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ready = watcher.ready_files(timeout=0.1)
+        if ready:
+            return ready
+    return []
+
+
+@pytest.fixture(params=["inotify", "poll"])
+def make_watcher(request, tmp_path):
+    """Factory for watchers over ``tmp_path`` using inotify or polling."""
+    watchers = []
+
+    def _create(**kwargs) -> FolderWatcher:
+        watcher = FolderWatcher(tmp_path, poll=request.param == "poll", poll_interval=0.1, **kwargs)
+        watchers.append(watcher)
+        return watcher
+
+    yield _create
+    for watcher in watchers:
+        watcher.close()
+
+
+class TestFolderWatcher:
+    """Test when files are reported as ready."""
+
+    def test_new_file_reported_once_after_settling(self, make_watcher, tmp_path):
+        """Verify a written file is reported after the settle time, once, and again when modified."""
+        watcher = make_watcher(settle=0.3)
+        path = tmp_path / "sub" / "track.wav"
+        path.parent.mkdir()
+        time.sleep(0.2)  # Let the new directory be picked up
+        path.write_bytes(b"\0" * 1000)
+
+        assert watcher.ready_files(timeout=0.05) == []
+        assert wait_for_ready(watcher) == [path]
+        assert wait_for_ready(watcher, timeout=0.6) == []
+
+        path.write_bytes(b"\0" * 2000)
+        assert wait_for_ready(watcher) == [path]
+
+    def test_growing_file_waits(self, make_watcher, tmp_path):
+        """Verify a file still being appended to is not reported until it stops changing."""
+        watcher = make_watcher(settle=0.4)
+        path = tmp_path / "track.flac"
+        with open(path, "wb") as f:
+            for _ in range(4):
+                f.write(b"\0" * 1000)
+                f.flush()
+                assert watcher.ready_files(timeout=0.2) == []
+
+        assert wait_for_ready(watcher) == [path]
+
+    def test_existing_and_non_audio_files(self, make_watcher, tmp_path):
+        """Verify existing files are skipped unless requested, and non-audio files are ignored."""
+        (tmp_path / "old.mp3").write_bytes(b"\0")
+        assert wait_for_ready(make_watcher(settle=0.1), timeout=0.5) == []
+        assert wait_for_ready(make_watcher(settle=0.1, include_existing=True)) == [tmp_path / "old.mp3"]
+
+        watcher = make_watcher(settle=0.1)
+        (tmp_path / "notes.txt").write_text("x")
+        (tmp_path / ".partial.wav").write_bytes(b"\0")
+        assert wait_for_ready(watcher, timeout=0.5) == []
+
+
+class TestWatchFolder:
+    """Test end-to-end ingestion."""
+
+    def test_dropped_file_is_analyzed(self, generated_audio_file, tmp_path):
+        """Verify a file copied into the folder produces one NDJSON record."""
+        sink = io.StringIO()
+        stop = threading.Event()
+        records = []
+        thread = threading.Thread(
+            target=watch_folder,
+            args=(tmp_path, sink),
+            kwargs={"settle": 0.2, "stop": stop, "on_record": records.append},
+        )
+        thread.start()
+        try:
+            time.sleep(1.0)
+            shutil.copy(generated_audio_file(camelot="8B", bpm=120, duration=4.0), tmp_path / "dropped.wav")
+            deadline = time.monotonic() + 60
+            while not records and time.monotonic() < deadline:
+                time.sleep(0.1)
+        finally:
+            stop.set()
+            thread.join()
+
+        [line] = sink.getvalue().splitlines()
+        record = json.loads(line)
+        assert record["path"] == str(tmp_path / "dropped.wav")
+        assert record["result"]["key"] == "8B"